@@ -0,0 +1,344 @@
+# archive.py - 하이퍼테이블 Parquet 보관 (월 x 시장 파티션) 및 메모리 맵 조회
+#
+# init_db 의 보존 정책은 3년이 지난 청크를 지우므로, 긴 이력이 필요한 연구 / 백테스트용으로
+# daily_prices / technical_indicators / market_indices / market_stats 를 Parquet 파일로 보관합니다.
+#
+#   python run_update.py archive              # 테이블별 마지막 보관 월부터 증분 보관
+#   python run_update.py archive --full       # 데이터베이스에 남아 있는 전체 기간을 다시 보관
+#
+#   from archive import get_prices
+#   df = get_prices(['005930.KS'], '2015-01-01', '2020-12-31', fields=['close_price'])   # queries.get_prices 와 같은 형식
+#
+# 보관 구조: <ARCHIVE_DIR>/<table>/month=YYYY-MM/market=<market>/data.parquet
+#   daily_prices / technical_indicators : stocks 를 조인한 symbol, market 컬럼 포함 (보관 시점의 종목 정보)
+#   market_indices / market_stats       : 테이블의 market 컬럼
+# 월 파일을 다시 쓸 때는 이미 보관된 행과 합치므로 (같은 키는 데이터베이스 값 우선), 보존 정책으로
+# 데이터베이스에서 지워진 과거 행은 유지됩니다. 월 디렉터리는 임시 디렉터리에 쓴 뒤 교체합니다.
+# ARCHIVE_DIR 이 설정되어 있으면 update 작업 마지막에 증분 보관합니다. pyarrow 가 필요합니다.
+# 증분 보관은 마지막 보관 월부터 다시 쓰며, 그 이전 구간을 바꾼 작업(백필, 지표 전체 재계산, init)은
+# mark_modified() 로 변경 시작일을 기록해 다음 보관이 그 월부터 다시 쓰도록 합니다.
+
+import os
+import json
+import time
+import shutil
+import logging
+from datetime import date, datetime, timedelta
+import pandas as pd
+from sqlalchemy import text
+from models import engine, Base
+from queries import column_dtypes, resolve_fields, to_output
+
+logger = logging.getLogger(__name__)
+
+# Parquet 보관 디렉터리 (비어 있으면 update 작업에서 보관하지 않음)
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')
+
+ARCHIVE_TABLES = ('daily_prices', 'technical_indicators', 'market_indices', 'market_stats')
+_STOCK_TABLES = ('daily_prices', 'technical_indicators')
+_EXCLUDED_COLUMNS = ('created_at', 'updated_at')
+_MANIFEST = '_manifest.json'
+_DATA_FILE = 'data.parquet'
+_UNKNOWN_MARKET = 'UNKNOWN'
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet 보관은 pyarrow 가 필요합니다 (pip install pyarrow)")
+    return pa, pq
+
+
+def _archive_dir(archive_dir):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not archive_dir:
+        raise ValueError("보관 디렉터리가 지정되지 않았습니다 (ARCHIVE_DIR 또는 archive_dir)")
+    return archive_dir
+
+
+def _columns(table_name):
+    """보관 파일의 컬럼 순서 (종목 테이블은 symbol, market 포함)."""
+    columns = [column.name for column in Base.metadata.tables[table_name].columns
+               if column.name not in _EXCLUDED_COLUMNS]
+    if table_name in _STOCK_TABLES:
+        columns = ['symbol', 'market'] + columns
+    return columns
+
+
+def _key_columns(table_name):
+    return [column.name for column in Base.metadata.tables[table_name].primary_key.columns]
+
+
+def _value_columns(table_name):
+    return [c for c in _columns(table_name) if c not in ('symbol', 'market', 'stock_id', 'date')]
+
+
+def _schema(table_name):
+    """날짜는 date32, 나머지는 테이블 컬럼 타입 (값이 모두 NULL 인 월도 같은 스키마로 씀)."""
+    pa, _ = _pyarrow()
+    types = {'float64': pa.float64(), 'Int64': pa.int64(), 'boolean': pa.bool_()}
+    dtypes = column_dtypes(table_name, _value_columns(table_name))
+    fields = []
+    for column in _columns(table_name):
+        if column == 'date':
+            fields.append(pa.field(column, pa.date32()))
+        elif column == 'stock_id':
+            fields.append(pa.field(column, pa.int64()))
+        elif column in ('symbol', 'market'):
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.field(column, types[dtypes[column]]))
+    return pa.schema(fields)
+
+
+def _normalize(table_name, frame):
+    """컬럼 타입을 queries.py 조회 결과와 같은 pandas dtype 으로 맞춥니다."""
+    dtypes = column_dtypes(table_name, [c for c in _value_columns(table_name) if c in frame.columns])
+    frame = frame.astype(dtypes)
+    if 'date' in frame.columns:
+        frame['date'] = pd.to_datetime(frame['date']).astype('datetime64[ns]')
+    if 'stock_id' in frame.columns:
+        frame['stock_id'] = frame['stock_id'].astype('int64')
+    return frame
+
+
+# ---- 보관 ----
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _read_month(conn, table_name, month):
+    """데이터베이스에서 한 달치 행을 읽습니다."""
+    columns = [column.name for column in Base.metadata.tables[table_name].columns
+               if column.name not in _EXCLUDED_COLUMNS]
+    select = ', '.join(f"t.{c}" for c in columns)
+    if table_name in _STOCK_TABLES:
+        query = f"""
+            SELECT s.symbol, s.market, {select}
+            FROM {table_name} t
+            JOIN stocks s ON s.stock_id = t.stock_id
+            WHERE t.date >= :start AND t.date < :end
+        """
+    else:
+        query = f"SELECT {select} FROM {table_name} t WHERE t.date >= :start AND t.date < :end"
+    frame = pd.read_sql_query(text(query), conn, params={'start': month, 'end': _next_month(month)})
+    return _normalize(table_name, frame[_columns(table_name)])
+
+
+def _month_path(archive_dir, table_name, month):
+    return os.path.join(archive_dir, table_name, f"month={month:%Y-%m}")
+
+
+def _write_month(archive_dir, table_name, month, frame):
+    """월 디렉터리를 시장별 파일로 다시 씁니다 (기존 보관 행과 합침). 보관된 행 수를 반환합니다."""
+    pa, pq = _pyarrow()
+    path = _month_path(archive_dir, table_name, month)
+    if os.path.isdir(path):
+        existing = read_archive(table_name, month, _next_month(month) - timedelta(days=1), archive_dir=archive_dir)
+        if not existing.empty:
+            frame = pd.concat([existing, frame], ignore_index=True)
+    frame = frame.drop_duplicates(subset=_key_columns(table_name), keep='last')
+    frame = frame.sort_values(['symbol', 'date'] if table_name in _STOCK_TABLES else ['market', 'date'])
+    frame = frame.assign(date=frame['date'].dt.date)
+
+    schema = _schema(table_name)
+    staging = f"{path}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    for market, rows in frame.groupby(frame['market'].fillna(_UNKNOWN_MARKET), sort=True):
+        market_dir = os.path.join(staging, f"market={market}")
+        os.makedirs(market_dir)
+        pq.write_table(pa.Table.from_pandas(rows, schema=schema, preserve_index=False),
+                       os.path.join(market_dir, _DATA_FILE))
+
+    # 이전 디렉터리를 옆으로 옮긴 뒤 교체
+    replaced = f"{path}.old"
+    shutil.rmtree(replaced, ignore_errors=True)
+    if os.path.isdir(path):
+        os.rename(path, replaced)
+    os.rename(staging, path)
+    shutil.rmtree(replaced, ignore_errors=True)
+    return len(frame)
+
+
+def _load_manifest(archive_dir):
+    path = os.path.join(archive_dir, _MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(archive_dir, manifest):
+    path = os.path.join(archive_dir, _MANIFEST)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _to_date(value):
+    # date.min('0001-01-01') 은 pd.Timestamp 범위를 벗어나므로 ISO 문자열은 직접 변환
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and len(value) == 10:
+        return date.fromisoformat(value)
+    return pd.Timestamp(value).date()
+
+
+def mark_modified(since=None, tables=None, archive_dir=None):
+    """보관 이후 since(None 이면 전체 기간)부터 행이 바뀐 테이블을 _manifest.json 에 기록합니다.
+
+    다음 증분 보관은 마지막 보관 월이 아니라 기록된 날짜의 월부터 다시 씁니다 (백필, 지표 전체 재계산 등).
+    아직 보관한 적이 없으면 다음 보관이 어차피 전체 기간이므로 기록하지 않습니다.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not archive_dir or not os.path.exists(os.path.join(archive_dir, _MANIFEST)):
+        return
+    value = (_to_date(since) or date.min).isoformat()
+    manifest = _load_manifest(archive_dir)
+    for table_name in tables or ARCHIVE_TABLES:
+        entry = manifest.setdefault(table_name, {})
+        if entry.get('modified_since') is None or value < entry['modified_since']:
+            entry['modified_since'] = value
+    _save_manifest(archive_dir, manifest)
+    logger.info(f"보관 후 변경 기록: {', '.join(tables or ARCHIVE_TABLES)} ({since or '전체 기간'}부터)")
+
+
+def _restart_date(entry, since):
+    """증분 보관을 다시 시작할 날짜 (마지막 보관 날짜, 기록된 변경 날짜, since 중 가장 이른 날짜)."""
+    if not entry.get('last_date'):
+        return None
+    dates = [_to_date(entry['last_date']), _to_date(entry.get('modified_since')), _to_date(since)]
+    return min(d for d in dates if d is not None)
+
+
+def export_archive(tables=None, full=False, archive_dir=None, since=None):
+    """테이블을 월 x 시장 Parquet 파일로 보관합니다.
+
+    기본값은 증분 보관으로, 테이블별 마지막 보관 날짜(_manifest.json)와 mark_modified() 로 기록된 변경 날짜,
+    since(이번 실행에서 바뀐 가장 이른 날짜) 중 가장 이른 날짜가 속한 월부터 다시 씁니다.
+    full 이면 데이터베이스에 남아 있는 전체 기간을 다시 씁니다. 실패한 테이블이 없으면 True 를 반환합니다.
+    """
+    _pyarrow()
+    archive_dir = _archive_dir(archive_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = _load_manifest(archive_dir)
+    success = True
+
+    for table_name in tables or ARCHIVE_TABLES:
+        started_at = time.time()
+        try:
+            with engine.connect() as conn:
+                first_date, last_date = conn.execute(text(f"SELECT min(date), max(date) FROM {table_name}")).one()
+                if last_date is None:
+                    logger.info(f"{table_name} 보관할 데이터가 없습니다")
+                    continue
+                first_date, last_date = _to_date(first_date), _to_date(last_date)
+
+                start = first_date
+                restart = _restart_date(manifest.get(table_name, {}), since)
+                if restart is not None and not full:
+                    start = max(first_date, restart)
+
+                rows = 0
+                month = _month_start(start)
+                while month <= last_date:
+                    frame = _read_month(conn, table_name, month)
+                    if not frame.empty:
+                        rows += _write_month(archive_dir, table_name, month, frame)
+                    month = _next_month(month)
+
+            manifest[table_name] = {
+                'last_date': last_date.isoformat(),
+                'exported_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            _save_manifest(archive_dir, manifest)
+            logger.info(f"{table_name} 보관 완료 ({_month_start(start):%Y-%m} ~ {last_date:%Y-%m}, "
+                        f"{rows}행, {time.time() - started_at:.1f}초)")
+        except Exception as e:
+            success = False
+            logger.error(f"{table_name} 보관 오류: {e}")
+
+    return success
+
+
+# ---- 조회 ----
+
+def _month_dirs(archive_dir, table_name, start_date, end_date):
+    root = os.path.join(archive_dir, table_name)
+    if not os.path.isdir(root):
+        return []
+    months = []
+    for name in sorted(os.listdir(root)):
+        if not name.startswith('month=') or name.endswith(('.tmp', '.old')):
+            continue
+        month = datetime.strptime(name[len('month='):], '%Y-%m').date()
+        if start_date is not None and _next_month(month) <= start_date:
+            continue
+        if end_date is not None and month > end_date:
+            continue
+        months.append(os.path.join(root, name))
+    return months
+
+
+def read_archive(table_name, start_date=None, end_date=None, markets=None, symbols=None, columns=None,
+                 archive_dir=None):
+    """보관 파일을 메모리 맵으로 읽어 DataFrame 으로 반환합니다 (기간은 start 이상, end 이하).
+
+    기간 / 시장은 월 / 시장 디렉터리로 먼저 거르고, 파일 안의 날짜 / 종목 조건은 pyarrow 필터로 적용합니다.
+    """
+    pa, pq = _pyarrow()
+    archive_dir = _archive_dir(archive_dir)
+    start_date = None if start_date is None else pd.Timestamp(start_date).date()
+    end_date = None if end_date is None else pd.Timestamp(end_date).date()
+    columns = list(columns) if columns else _columns(table_name)
+
+    filters = []
+    if start_date is not None:
+        filters.append(('date', '>=', start_date))
+    if end_date is not None:
+        filters.append(('date', '<=', end_date))
+    if symbols is not None:
+        filters.append(('symbol', 'in', list(symbols)))
+
+    tables = []
+    for month_dir in _month_dirs(archive_dir, table_name, start_date, end_date):
+        for name in sorted(os.listdir(month_dir)):
+            if markets is not None and name[len('market='):] not in markets:
+                continue
+            tables.append(pq.read_table(os.path.join(month_dir, name, _DATA_FILE), columns=columns,
+                                        filters=filters or None, memory_map=True))
+
+    if tables:
+        frame = pa.concat_tables(tables).to_pandas(date_as_object=False)
+    else:
+        frame = _schema(table_name).empty_table().select(columns).to_pandas(date_as_object=False)
+    return _normalize(table_name, frame)
+
+
+def _panel(table_name, symbols, start_date, end_date, fields, output, markets, archive_dir):
+    fields = resolve_fields(table_name, fields, output)
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    frame = read_archive(table_name, start_date, end_date, markets=markets, symbols=symbols,
+                         columns=['symbol', 'date'] + fields, archive_dir=archive_dir)
+    frame = frame.sort_values(['symbol', 'date'], ignore_index=True).set_index(['symbol', 'date'])
+    return to_output(frame, fields, output)
+
+
+def get_prices(symbols=None, start_date=None, end_date=None, fields=None, output='pandas', markets=None,
+               archive_dir=None):
+    """보관된 일일 가격을 queries.get_prices 와 같은 형식으로 반환합니다. markets 로 시장 파티션을 제한합니다."""
+    return _panel('daily_prices', symbols, start_date, end_date, fields, output, markets, archive_dir)
+
+
+def get_indicators(symbols=None, start_date=None, end_date=None, fields=None, output='pandas', markets=None,
+                   archive_dir=None):
+    """보관된 기술적 지표를 queries.get_indicators 와 같은 형식으로 반환합니다."""
+    return _panel('technical_indicators', symbols, start_date, end_date, fields, output, markets, archive_dir)
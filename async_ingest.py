@@ -0,0 +1,212 @@
+# async_ingest.py - curl_cffi AsyncSession 기반 asyncio 가격 수집 엔진
+#
+# 스레드당 요청 1개 방식 대신 이벤트 루프 하나에서 수백 개의 요청을 동시에 유지합니다.
+# 동시 요청 수는 전역 세마포어(ASYNC_CONCURRENCY), 요청 속도는 전역 토큰 버킷(API_RATE_LIMIT)으로 제한하므로
+# 전종목 수집 시간은 스레드 수가 아니라 요청 제한에 의해 결정됩니다.
+# 응답 파싱은 실행기 스레드에서 수행하고, 파싱된 프레임은 기존 저장 파이프라인(IngestPipeline)으로 넘깁니다.
+# 원본 응답은 데이터 소스와 같은 디스크 캐시(response_cache.py)에 저장합니다.
+
+import os
+import json
+import time
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
+from curl_cffi.requests import AsyncSession
+from metrics import metrics
+from response_cache import response_cache
+from http_client import BROWSER_HEADERS, API_RATE_LIMIT, API_RETRY_DELAY, API_MAX_RETRIES
+from data_importer import normalize_price_frame, _empty_price_frame, _build_jobs
+
+logger = logging.getLogger(__name__)
+
+# 동시에 유지할 최대 요청 수
+ASYNC_CONCURRENCY = int(os.getenv('ASYNC_CONCURRENCY', '200'))
+
+YAHOO_CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart/{symbol}"
+EXCHANGE_TIMEZONE = 'Asia/Seoul'
+
+
+class AsyncTokenBucket:
+    """asyncio 용 전역 요청 제한기 (초당 rate 개)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+def _to_epoch(date_str):
+    return int(pd.Timestamp(date_str, tz=EXCHANGE_TIMEZONE).timestamp())
+
+
+def parse_chart_frame(content):
+    """Yahoo chart API 응답(JSON bytes)을 yfinance 형식(index 'Date', Open/High/Low/Close/Adj Close/Volume) 으로 변환합니다.
+
+    데이터가 없으면 빈 DataFrame 을 반환합니다.
+    """
+    payload = json.loads(content)
+    results = (payload.get('chart') or {}).get('result') or []
+    if not results or not results[0].get('timestamp'):
+        return pd.DataFrame()
+
+    result = results[0]
+    quote = result['indicators']['quote'][0]
+    adjclose = (result['indicators'].get('adjclose') or [{}])[0].get('adjclose')
+    timezone = result.get('meta', {}).get('exchangeTimezoneName') or EXCHANGE_TIMEZONE
+
+    index = pd.to_datetime(np.array(result['timestamp'], dtype='int64'), unit='s', utc=True)
+    df = pd.DataFrame({
+        'Open': quote.get('open'),
+        'High': quote.get('high'),
+        'Low': quote.get('low'),
+        'Close': quote.get('close'),
+        'Adj Close': adjclose if adjclose is not None else quote.get('close'),
+        'Volume': quote.get('volume'),
+    }, index=index.tz_convert(timezone).rename('Date'), dtype='float64')
+
+    return df.dropna(how='all')
+
+
+def parse_chart_response(stock_id, content):
+    """Yahoo chart API 응답(JSON bytes)을 daily_prices 컬럼 구조의 DataFrame 으로 변환합니다."""
+    return _to_price_frame(stock_id, parse_chart_frame(content))
+
+
+def _to_price_frame(stock_id, df):
+    if df.empty:
+        return _empty_price_frame()
+    return normalize_price_frame(stock_id, df)
+
+
+def _parse(stock_id, symbol, content, record):
+    # record(symbol, df) 에는 다른 소스의 get_price_history 와 같은 yfinance 형식 프레임을 넘김 (RecordingSource)
+    df = parse_chart_frame(content)
+    if record is not None:
+        record(symbol, df)
+    return _to_price_frame(stock_id, df)
+
+
+async def _fetch_one(session, limiter, semaphore, stock_id, symbol, start_date, end_date):
+    params = {
+        'period1': _to_epoch(start_date),
+        'period2': _to_epoch(end_date),
+        'interval': '1d',
+        'events': 'div,splits',
+        'includeAdjustedClose': 'true',
+    }
+    url = YAHOO_CHART_URL.format(symbol=symbol)
+
+    async with semaphore:
+        for attempt in range(API_MAX_RETRIES + 1):
+            await limiter.acquire()
+            started_at = time.monotonic()
+            try:
+                response = await session.get(url, params=params)
+            except Exception as e:
+                metrics.observe_http(time.monotonic() - started_at, error=True, retry=attempt > 0)
+                if attempt == API_MAX_RETRIES:
+                    logger.error(f"가격 데이터 가져오기 오류 ({symbol}): {e}")
+                    return None
+                await asyncio.sleep(API_RETRY_DELAY * (attempt + 1))
+                continue
+
+            metrics.observe_http(time.monotonic() - started_at, response.status_code, len(response.content),
+                                 retry=attempt > 0)
+            if response.status_code == 429:
+                logger.warning(f"요청 제한(429) 응답, {API_RETRY_DELAY * (attempt + 1):.0f}초 대기: {symbol}")
+                limiter.pause(API_RETRY_DELAY * (attempt + 1))
+            elif response.status_code >= 500:
+                await asyncio.sleep(API_RETRY_DELAY * (attempt + 1))
+            elif response.status_code == 404:
+                # 없는 종목 (요청 실패가 아님)
+                return b''
+            else:
+                return response.content
+
+    logger.error(f"가격 데이터 가져오기 실패 ({symbol}): 재시도 횟수 초과")
+    return None
+
+
+async def _ingest(jobs, pipeline, concurrency, cache=None, record=None):
+    loop = asyncio.get_running_loop()
+    limiter = AsyncTokenBucket(API_RATE_LIMIT)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with AsyncSession(impersonate="chrome", headers=BROWSER_HEADERS, max_clients=concurrency) as session:
+
+        async def handle(stock_id, symbol, name, start_date, end_date):
+            started_at = time.perf_counter()
+            content = None
+            if cache is not None:
+                # 응답 캐시 파일 입출력도 실행기 스레드에서
+                content = await loop.run_in_executor(None, cache.get, 'yahoo_chart', 'prices', symbol,
+                                                     start_date, end_date)
+            if content is None:
+                content = await _fetch_one(session, limiter, semaphore, stock_id, symbol, start_date, end_date)
+                if content is not None and cache is not None:
+                    await loop.run_in_executor(None, cache.put, 'yahoo_chart', 'prices', symbol,
+                                               start_date, end_date, content)
+            metrics.record('fetch', time.perf_counter() - started_at, symbol)
+            # None 은 수집 실패, 빈 응답은 데이터 없음
+            frame = None if content is None else _empty_price_frame()
+            if content:
+                try:
+                    # JSON/pandas 파싱은 이벤트 루프를 막지 않도록 실행기 스레드에서 수행
+                    frame = await loop.run_in_executor(None, _parse, stock_id, symbol, content, record)
+                except Exception as e:
+                    logger.error(f"데이터 처리 오류 ({symbol}): {e}")
+                    frame = None
+            # 저장 큐가 가득 차면 실행기 스레드에서 대기 (backpressure)
+            await loop.run_in_executor(None, pipeline.put, stock_id, symbol, name, frame)
+
+        await asyncio.gather(*(handle(*job) for job in jobs))
+
+
+def fetch_stock_data_async(start_date, end_date, batch_size=None, incremental=False, concurrency=None, jobs=None,
+                           on_result=None, watermarks=None, cache=response_cache, record=None):
+    """fetch_stock_data 의 asyncio 버전. 수집은 이벤트 루프에서, 저장/지표 계산은 기존 파이프라인에서 수행합니다.
+
+    cache(ResponseCache, None 이면 사용 안 함)에 종목 / 기간별 원본 응답을 저장하고 다시 사용합니다.
+    record(symbol, df) 가 있으면 종목별 가격을 yfinance 형식으로 넘깁니다 (DataSource.record_price_history).
+    """
+    from pipeline import IngestPipeline
+
+    if jobs is None:
+        jobs = _build_jobs(start_date, end_date)
+
+    concurrency = concurrency or ASYNC_CONCURRENCY
+    logger.info(f"총 {len(jobs)}개 종목을 비동기로 수집합니다 (동시 요청: {concurrency}, 초당 제한: {API_RATE_LIMIT})")
+
+    pipeline = IngestPipeline(incremental=incremental, batch_size=batch_size, total=len(jobs),
+                              on_result=on_result, watermarks=watermarks).start()
+    try:
+        asyncio.run(_ingest(jobs, pipeline, concurrency, cache, record))
+    finally:
+        stats = pipeline.close()
+    return stats
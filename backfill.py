@@ -0,0 +1,244 @@
+# backfill.py - 압축된 청크(과거 구간)에 대한 대량 쓰기 처리
+#
+# create_hypertables() 의 압축 정책으로 1개월 이상 지난 청크는 압축됩니다. 압축 청크에 행 단위로
+# upsert 하면 매우 느리거나 (TimescaleDB 버전에 따라) 실패하므로, copy_upsert 는 BACKFILL_MODE 에 따라
+#   direct     : 그대로 씀 (기본값, 압축 청크 확인 안 함)
+#   decompress : 배치가 닿는 압축 청크를 먼저 풀고 씀. 푼 청크는 finish_backfill() 에서 다시 압축
+#   staging    : 압축 청크 구간의 행은 압축되지 않은 <table>_backfill 테이블에 모았다가
+#                finish_backfill() 에서 해당 청크를 한 번씩만 풀어 반영하고 다시 압축
+# staging 모드에서 모아 둔 행은 반영 전까지 조회되지 않으므로, 반영 후 해당 종목의 기술적 지표를 다시 계산합니다.
+# 다시 압축하지 못한 청크(프로세스 중단 등)는 압축 정책이 다음 실행 때 압축합니다.
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import text
+from models import engine, Base
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 압축 청크 쓰기 방식 (direct / decompress / staging)
+BACKFILL_MODE = os.getenv('BACKFILL_MODE', 'direct')
+BACKFILL_MODES = ('direct', 'decompress', 'staging')
+
+# 압축 청크 확인 대상 (시간 컬럼이 date 인 하이퍼테이블)
+HYPERTABLES = ('daily_prices', 'technical_indicators', 'market_indices', 'market_stats')
+
+_decompressed = set()     # 커밋된 트랜잭션에서 푼 청크 (재압축 대상)
+_pending = {}             # 푸는 중인 청크 -> (트랜잭션이 끝나면 set 되는 Event, 스레드 ID)
+_lock = threading.Lock()
+_CLAIMS = 'backfill_decompress_claims'   # transaction() 의 conn.info 키
+_unsupported = False
+
+
+def set_backfill_mode(mode):
+    global BACKFILL_MODE
+    if mode not in BACKFILL_MODES:
+        raise ValueError(f"알 수 없는 백필 방식: {mode}")
+    BACKFILL_MODE = mode
+
+
+def staging_table(table_name):
+    return f"{table_name}_backfill"
+
+
+def compressed_chunks(table_name, start_date, end_date):
+    """start_date ~ end_date 와 겹치는 압축 청크를 [(청크 이름, 시작일, 종료일(미포함)), ...] 로 반환합니다."""
+    global _unsupported
+    if _unsupported or table_name not in HYPERTABLES:
+        return []
+    try:
+        with engine.connect() as conn:
+            # date 시간 컬럼의 청크 경계는 UTC 자정 기준 timestamptz 로 표시됨
+            rows = conn.execute(text("""
+                SELECT format('%I.%I', chunk_schema, chunk_name),
+                       (range_start AT TIME ZONE 'UTC')::date,
+                       (range_end AT TIME ZONE 'UTC')::date
+                FROM timescaledb_information.chunks
+                WHERE hypertable_name = :table
+                  AND is_compressed
+                  AND range_end > CAST(:start AS date)
+                  AND range_start <= CAST(:end AS date)
+                ORDER BY range_start
+            """), {'table': table_name, 'start': start_date, 'end': end_date}).fetchall()
+        return [tuple(row) for row in rows]
+    except Exception as e:
+        # TimescaleDB 가 없는 환경에서는 이후 확인을 생략
+        _unsupported = True
+        logger.warning(f"압축 청크 확인 불가, 백필 모드 없이 진행합니다: {e}")
+        return []
+
+
+def in_chunks(dates, chunks):
+    """dates(Series) 중 chunks 구간에 속하는 행의 마스크를 반환합니다."""
+    dates = pd.to_datetime(dates)
+    mask = pd.Series(False, index=dates.index)
+    for _, start, end in chunks:
+        mask |= (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))
+    return mask
+
+
+@contextmanager
+def transaction():
+    """engine.begin() 과 같은 트랜잭션. 안에서 decompress_chunks() 로 푼 청크는 커밋된 뒤에만 재압축 목록에 기록합니다.
+
+    롤백되면 Postgres 가 압축 해제도 되돌리므로 기록하지 않고, 기다리던 다른 쓰기가 다시 풀 수 있게 합니다.
+    """
+    claimed = []
+    committed = False
+    try:
+        with engine.begin() as conn:
+            conn.info[_CLAIMS] = claimed
+            try:
+                yield conn
+            finally:
+                del conn.info[_CLAIMS]
+        committed = True
+    finally:
+        _release_claims(claimed, committed)
+
+
+def _release_claims(chunk_names, committed):
+    with _lock:
+        for chunk_name in chunk_names:
+            event, _ = _pending.pop(chunk_name)
+            if committed:
+                _decompressed.add(chunk_name)
+            event.set()
+
+
+def _claim(chunk_name):
+    """chunk_name 을 이 스레드의 트랜잭션에서 풀어야 하면 True. 다른 트랜잭션이 푸는 중이면 커밋 / 롤백까지 기다립니다."""
+    while True:
+        with _lock:
+            if chunk_name in _decompressed:
+                return False
+            pending = _pending.get(chunk_name)
+            if pending is None:
+                _pending[chunk_name] = (threading.Event(), threading.get_ident())
+                return True
+            event, owner = pending
+            if owner == threading.get_ident():
+                return False
+        event.wait()
+
+
+def decompress_chunks(conn, chunks):
+    """transaction() 의 conn 에서 청크 압축을 풉니다 (커밋되면 다시 압축할 목록에 기록).
+
+    가격 저장 스레드와 지표 스레드가 같은 청크에 동시에 쓸 수 있으므로, 프로세스에서 처음 요청한 트랜잭션만
+    decompress_chunk 를 호출하고, 다른 쓰기는 그 트랜잭션이 끝날 때까지 기다립니다 (커밋 전에 쓰면 압축된 청크에 씀).
+    chunks 는 시작일 순서이므로 여러 청크를 기다려도 서로 막히지 않습니다.
+    """
+    claimed = conn.info.get(_CLAIMS)
+    if claimed is None:
+        raise RuntimeError("decompress_chunks 는 backfill.transaction() 안에서 호출해야 합니다")
+    for chunk_name, _, _ in chunks:
+        if not _claim(chunk_name):
+            continue
+        claimed.append(chunk_name)
+        started_at = time.time()
+        conn.execute(text(f"SELECT decompress_chunk('{chunk_name}', if_compressed => TRUE)"))
+        logger.info(f"압축 청크 해제: {chunk_name} ({time.time() - started_at:.1f}초)")
+
+
+def track_decompressed(chunk_names):
+    with _lock:
+        _decompressed.update(chunk_names)
+
+
+def decompressed_chunks():
+    with _lock:
+        return sorted(_decompressed)
+
+
+def ensure_staging_table(conn, table_name):
+    """압축되지 않은 백필 테이블을 만듭니다 (기본키 포함, WAL 미기록)."""
+    name = staging_table(table_name)
+    conn.execute(text(
+        f"CREATE UNLOGGED TABLE IF NOT EXISTS {name} "
+        f"(LIKE {table_name} INCLUDING DEFAULTS INCLUDING INDEXES)"
+    ))
+    return name
+
+
+def merge_staged(table_name):
+    """백필 테이블의 행을 대상 하이퍼테이블에 반영합니다. stock_id 별 가장 이른 반영 날짜를 반환합니다.
+
+    백필 테이블에 모을 때(copy_upsert)는 추가 / 갱신 건수를 세지 않으므로, 여기서 대상 테이블 기준으로 셉니다.
+    """
+    name = staging_table(table_name)
+    table = Base.metadata.tables[table_name]
+    key_columns = [column.name for column in table.primary_key.columns]
+    columns = [column.name for column in table.columns]
+    update_columns = [c for c in columns if c not in key_columns and c != 'created_at']
+
+    started_at = time.time()
+    with transaction() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar()
+        if exists is None:
+            return {}
+        start_date, end_date = conn.execute(text(f"SELECT min(date), max(date) FROM {name}")).one()
+        if start_date is None:
+            return {}
+
+        # 압축 청크는 백필 테이블에 모인 전체 기간에 대해 한 번씩만 풂
+        decompress_chunks(conn, compressed_chunks(table_name, start_date, end_date))
+
+        join_condition = ' AND '.join(f"t.{c} = s.{c}" for c in key_columns)
+        staged, existing = conn.execute(text(f"""
+            SELECT count(*), count(t.{key_columns[0]})
+            FROM {name} s LEFT JOIN {table_name} t ON {join_condition}
+        """)).one()
+
+        set_clause = ', '.join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+        current_values = ', '.join(f"t.{c}" for c in update_columns if c != 'updated_at')
+        new_values = ', '.join(f"EXCLUDED.{c}" for c in update_columns if c != 'updated_at')
+        written = conn.execute(text(f"""
+            INSERT INTO {table_name} AS t ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM {name}
+            ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {set_clause}
+            WHERE ({current_values}) IS DISTINCT FROM ({new_values})
+        """)).rowcount
+
+        if written:
+            from bulk_writer import notify_ingest
+            notify_ingest(conn, table_name)
+
+        affected = {}
+        if 'stock_id' in columns:
+            affected = dict(conn.execute(text(f"SELECT stock_id, min(date) FROM {name} GROUP BY stock_id")).fetchall())
+        conn.execute(text(f"TRUNCATE {name}"))
+
+    inserted = staged - existing
+    updated = written - inserted
+    metrics.add_current('rows_written', written)
+    logger.info(f"{table_name} 백필 반영 완료 ({start_date} ~ {end_date}, 추가: {inserted}, 갱신: {updated}, "
+                f"변경없음: {existing - updated}, {time.time() - started_at:.1f}초)")
+    return affected
+
+
+def recompress_chunks():
+    """decompress_chunks() 로 풀었던 청크를 다시 압축합니다."""
+    with _lock:
+        chunk_names = sorted(_decompressed)
+        _decompressed.clear()
+
+    failed = []
+    for chunk_name in chunk_names:
+        try:
+            started_at = time.time()
+            with engine.begin() as conn:
+                conn.execute(text(f"SELECT compress_chunk('{chunk_name}', if_not_compressed => TRUE)"))
+            logger.info(f"청크 재압축: {chunk_name} ({time.time() - started_at:.1f}초)")
+        except Exception as e:
+            failed.append(chunk_name)
+            logger.error(f"청크 재압축 오류 ({chunk_name}): {e}")
+
+    if chunk_names:
+        logger.info(f"청크 재압축 완료 ({len(chunk_names) - len(failed)}/{len(chunk_names)}개)")
+    return not failed
@@ -0,0 +1,161 @@
+# bulk_writer.py - COPY + ON CONFLICT 기반 대량 upsert
+
+import io
+import os
+import logging
+import pandas as pd
+from sqlalchemy import Integer, BigInteger
+from models import engine, Base
+import backfill
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+# 한 번의 COPY / INSERT 로 반영할 최대 행 수
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '50000'))
+
+# 행이 추가/변경되면 커밋 시 이 채널로 테이블 이름을 알림 (queries.py 캐시 무효화)
+INGEST_CHANNEL = 'findb_ingest'
+
+
+def notify_ingest(conn, table_name):
+    """conn 의 트랜잭션이 커밋되면 table_name 이 바뀌었음을 알립니다 (같은 트랜잭션 안의 중복 알림은 하나로 합쳐짐)."""
+    conn.exec_driver_sql(f"NOTIFY {INGEST_CHANNEL}, '{table_name}'")
+
+
+def _prepare_frame(table, df, key_columns):
+    """COPY 가능한 형태로 DataFrame을 정리합니다 (정수 컬럼 타입 보정, 키 중복 제거)."""
+    df = df.drop_duplicates(subset=key_columns, keep='last')
+    for column in df.columns:
+        column_type = table.columns[column].type
+        if isinstance(column_type, (Integer, BigInteger)) and df[column].dtype.kind == 'f':
+            df[column] = df[column].round().astype('Int64')
+    return df
+
+
+def _upsert_batch(conn, table, batch, key_columns, target=None):
+    """한 배치를 임시 테이블로 COPY한 뒤 대상 테이블(target, 기본값은 table)에 upsert 합니다."""
+    stage = f"_stage_{table.name}"
+    target = target or table.name
+    columns = list(batch.columns)
+    update_columns = [c for c in columns if c not in key_columns]
+    has_timestamps = 'created_at' in table.columns and 'updated_at' in table.columns
+
+    conn.exec_driver_sql(
+        f"CREATE TEMP TABLE IF NOT EXISTS {stage} "
+        f"(LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+
+    # 스테이징 버퍼 -> 임시 테이블 (COPY)
+    buffer = io.StringIO()
+    batch.to_csv(buffer, header=False, index=False, na_rep='')
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {stage} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+    staging = target != table.name
+    if not staging:
+        # 이미 존재하는 키 개수 (insert / update 구분용)
+        join_condition = ' AND '.join(f"t.{c} = s.{c}" for c in key_columns)
+        existing = conn.exec_driver_sql(
+            f"SELECT count(*) FROM {stage} s JOIN {target} t ON {join_condition}"
+        ).scalar()
+
+    insert_columns = columns + (['created_at', 'updated_at'] if has_timestamps else [])
+    select_columns = columns + (['now()', 'now()'] if has_timestamps else [])
+
+    if update_columns:
+        set_clause = ', '.join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+        if has_timestamps:
+            set_clause += ', updated_at = now()'
+        current_values = ', '.join(f"t.{c}" for c in update_columns)
+        new_values = ', '.join(f"EXCLUDED.{c}" for c in update_columns)
+        conflict_action = (
+            f"DO UPDATE SET {set_clause} "
+            f"WHERE ({current_values}) IS DISTINCT FROM ({new_values})"
+        )
+    else:
+        conflict_action = "DO NOTHING"
+
+    written = conn.exec_driver_sql(f"""
+        WITH upserted AS (
+            INSERT INTO {target} AS t ({', '.join(insert_columns)})
+            SELECT {', '.join(select_columns)} FROM {stage}
+            ON CONFLICT ({', '.join(key_columns)}) {conflict_action}
+            RETURNING 1
+        )
+        SELECT count(*) FROM upserted
+    """).scalar()
+
+    if staging:
+        # 백필 테이블에 모은 행은 대상 테이블에 아직 없으므로 추가 / 갱신으로 세지 않음
+        # (backfill.merge_staged 가 반영할 때 대상 테이블 기준으로 셈)
+        logger.debug(f"{table.name} 백필 테이블에 {len(batch)}행 보관")
+        return {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+    if written:
+        # 종목별 최신 상태도 같은 트랜잭션에서 갱신
+        snapshot.update_from_stage(conn, table.name, stage, columns)
+        notify_ingest(conn, table.name)
+
+    inserted = len(batch) - existing
+    updated = written - inserted
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'skipped': existing - updated,
+    }
+
+
+def copy_upsert(table_name, df, key_columns, batch_size=None):
+    """DataFrame을 COPY로 적재하고 INSERT ... ON CONFLICT 로 대상 테이블에 반영합니다.
+
+    배치마다 하나의 트랜잭션을 사용하며, 값이 바뀌지 않은 기존 행은 갱신하지 않습니다.
+    반환값은 inserted / updated / skipped 행 수입니다 (staging 백필 모드로 백필 테이블에 모은 행은 제외).
+    """
+    stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    if df is None or df.empty:
+        return stats
+
+    table = Base.metadata.tables[table_name]
+    batch_size = batch_size or BULK_BATCH_SIZE
+    df = _prepare_frame(table, df, key_columns)
+
+    for offset in range(0, len(df), batch_size):
+        batch = df.iloc[offset:offset + batch_size]
+        for batch_stats in _write_batch(table, batch, key_columns):
+            for key, value in batch_stats.items():
+                stats[key] += value
+
+    return stats
+
+
+def _write_batch(table, batch, key_columns):
+    """BACKFILL_MODE 에 따라 압축 청크 구간의 행을 처리하며 한 배치를 씁니다 (backfill.py)."""
+    chunks = []
+    if backfill.BACKFILL_MODE != 'direct' and 'date' in key_columns:
+        chunks = backfill.compressed_chunks(table.name, batch['date'].min(), batch['date'].max())
+
+    if chunks and backfill.BACKFILL_MODE == 'staging':
+        # 압축 청크 구간의 행만 백필 테이블로 (임시 테이블을 다시 쓰므로 각각 별도 트랜잭션)
+        staged = backfill.in_chunks(batch['date'], chunks).to_numpy()
+        results = []
+        if not staged.all():
+            with engine.begin() as conn:
+                results.append(_upsert_batch(conn, table, batch[~staged], key_columns))
+        if staged.any():
+            with engine.begin() as conn:
+                target = backfill.ensure_staging_table(conn, table.name)
+                results.append(_upsert_batch(conn, table, batch[staged], key_columns, target=target))
+        return results
+
+    with backfill.transaction() as conn:
+        if chunks:
+            backfill.decompress_chunks(conn, chunks)
+        return [_upsert_batch(conn, table, batch, key_columns)]
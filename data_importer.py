@@ -11,44 +11,56 @@ import concurrent.futures
 from tqdm import tqdm
 from pykrx import stock
 import time
-from curl_cffi import requests
 import random
+from bulk_writer import copy_upsert
+import backfill
+from symbol_master import sync_stocks
+from data_sources import default_source
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# pykrx를 사용하여 한국 주식 종목 목록 가져오기
-def get_korean_stock_symbols():
+# daily_prices 적재 컬럼 순서
+PRICE_COLUMNS = [
+    'stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price',
+    'adjusted_close', 'volume', 'change', 'change_rate'
+]
+
+# technical_indicators 적재 컬럼
+INDICATOR_FLOAT_COLUMNS = [
+    'ma5', 'ma10', 'ma20', 'ma60', 'ma120',
+    'bb_upper', 'bb_middle', 'bb_lower', 'bb_width',
+    'rsi', 'macd', 'macd_signal', 'macd_hist',
+    'volume_ma20', 'volume_ratio'
+]
+INDICATOR_BOOL_COLUMNS = [
+    'is_doji', 'is_hammer', 'golden_cross', 'death_cross',
+    'bb_upper_touch', 'bb_lower_touch'
+]
+
+# 증분 계산 시 새 날짜 이전에 읽어올 워밍업 봉 수.
+# MA120은 119개 이전 봉이 필요하고, RSI(alpha=1/14)와 MACD(span 26/12/9)의 EMA는
+# 시작점 차이가 (1 - alpha)^n 으로 감쇠합니다. MACD 오차는 가격 수준에 비례해
+# 250봉이면 고가·고변동 종목(약 100만원)에서 1e-5 까지 남으므로, 400봉으로 전체 재계산 대비
+# 상대 오차 |Δ| <= 1e-6 * max(1, |값|) 이내로 맞춥니다 (100만원대 실측 약 1e-9).
+INDICATOR_WARMUP_BARS = 400
+
+# 기술적 지표 계산 입력 가격의 부동소수점 타입 (float32 이면 로드 메모리 절반, 결과는 float64 대비 약간 다를 수 있음)
+INDICATOR_DTYPE = os.getenv('INDICATOR_DTYPE', 'float64')
+
+# yf.download 한 번에 묶어 요청할 종목 수 (1 이면 종목별 개별 요청)
+DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', '50'))
+
+# 한국 주식 종목 목록 가져오기 (기본 소스는 pykrx 전종목 일괄 조회, 거래일별 디스크 캐시)
+def get_korean_stock_symbols(source=None):
+    source = source or default_source
     try:
-        today = datetime.now().strftime('%Y%m%d')
+        symbols = source.get_symbols()
         
-        # KOSPI 종목 가져오기
-        kospi_tickers = stock.get_market_ticker_list(today, market="KOSPI")
-        kospi_symbols = []
-        
-        for ticker in kospi_tickers:
-            name = stock.get_market_ticker_name(ticker)
-            kospi_symbols.append({
-                'symbol': f'{ticker}.KS',
-                'krx_code': ticker,
-                'name': name,
-                'market': 'KOSPI'
-            })
-        
-        # KOSDAQ 종목 가져오기
-        kosdaq_tickers = stock.get_market_ticker_list(today, market="KOSDAQ")
-        kosdaq_symbols = []
-        
-        for ticker in kosdaq_tickers:
-            name = stock.get_market_ticker_name(ticker)
-            kosdaq_symbols.append({
-                'symbol': f'{ticker}.KQ',
-                'krx_code': ticker,
-                'name': name,
-                'market': 'KOSDAQ'
-            })
-        
-        logger.info(f"종목 정보 가져오기 완료: KOSPI {len(kospi_symbols)}개, KOSDAQ {len(kosdaq_symbols)}개")
-        return kospi_symbols + kosdaq_symbols
+        kospi_count = sum(1 for s in symbols if s['market'] == 'KOSPI')
+        kosdaq_count = sum(1 for s in symbols if s['market'] == 'KOSDAQ')
+        logger.info(f"종목 정보 가져오기 완료: KOSPI {kospi_count}개, KOSDAQ {kosdaq_count}개")
+        return symbols
     except Exception as e:
         logger.error(f"종목 정보 가져오기 오류: {e}")
         # 샘플 데이터 반환
@@ -58,191 +70,146 @@ def get_korean_stock_symbols():
             {'symbol': '035420.KS', 'krx_code': '035420', 'name': 'NAVER', 'market': 'KOSPI'}
         ]
 
-# 주식 기본 정보 저장
-def save_stock_info(symbols):
-    session = Session()
+# 주식 기본 정보 저장 (stocks 테이블과 비교하여 신규/변경 종목만 반영, 신규 종목 프로필은 소스에서 조회)
+def save_stock_info(symbols, source=None):
+    source = source or default_source
     try:
-        for symbol_info in tqdm(symbols, desc="종목 정보 저장"):
-            symbol = symbol_info['symbol']
-            krx_code = symbol_info['krx_code']
-            name = symbol_info['name']
-            market = symbol_info['market']
-            
-            # 이미 있는지 확인
-            existing_stock = session.query(Stock).filter_by(symbol=symbol).first()
-            
-            if existing_stock:
-                continue
-            
-            # 야후 파이낸스에서 추가 정보 가져오기
-            try:
-                stock_info = yf.Ticker(symbol).info
-                sector = stock_info.get('sector', '')
-                industry = stock_info.get('industry', '')
-                description = stock_info.get('longBusinessSummary', '')
-            except Exception as e:
-                sector = ''
-                industry = ''
-                description = ''
-            
-            # 데이터베이스에 저장
-            new_stock = Stock(
-                symbol=symbol,
-                krx_code=krx_code,
-                name=name,
-                market=market,
-                sector=sector,
-                industry=industry,
-                description=description,
-                is_active=True
-            )
-            
-            session.add(new_stock)
-        
-        session.commit()
+        sync_stocks(symbols, fetch_profile=source.get_profile)
         logger.info(f"종목 정보 저장 완료")
+        return True
     except Exception as e:
-        session.rollback()
         logger.error(f"종목 정보 저장 오류: {e}")
-    finally:
-        session.close()
+        return False
 
-def fetch_stock_price(stock_id, symbol, start_date, end_date):
+# 종목 가격 데이터 가져오기 (데이터가 없으면 빈 DataFrame, 요청/처리 실패 시 None)
+def fetch_stock_price(stock_id, symbol, start_date, end_date, source=None):
+    source = source or default_source
     try:
-        # curl_cffi를 사용하여 브라우저 TLS 환경 모방
-        session = requests.Session(impersonate="chrome")
+        # 기본 소스(yfinance)는 공유 세션 (curl_cffi 브라우저 TLS 모방 + 전역 요청 제한) 사용
+        df = source.get_price_history([symbol], start_date, end_date)[symbol]
         
-        # 추가적인 헤더 설정
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        if df is None:
+            logger.error(f"가격 데이터 가져오기 실패: {symbol}")
+            return None
         
-        # yfinance에 세션 주입
-        ticker = yf.Ticker(symbol, session=session)
-        df = ticker.history(start=start_date, end=end_date, auto_adjust=False)
-        
-        if df is None or df.empty:
+        if df.empty:
             logger.warning(f"가격 데이터가 없습니다: {symbol}")
-            return []
-
-        # 1행짜리 Series인 경우 DataFrame으로 변환
-        if isinstance(df, pd.Series):
-            df = df.to_frame().T
+            return _empty_price_frame()
 
         # 데이터 처리 성공
         logger.info(f"가격 데이터 가져오기 성공: {symbol}")
         
     except Exception as e:
         logger.error(f"가격 데이터 가져오기 오류 ({symbol}): {e}")
-        return []
+        return None
     
     # 데이터 처리
     try:
-        # Series인 경우 DataFrame으로 변환
-        if isinstance(df, pd.Series):
-            df = df.to_frame().T
-
-        df.reset_index(inplace=True)
-        
-        # 필요한 열 확인
-        required_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            return []
-        
-        # 열 이름 변경
-        rename_map = {
-            'Date': 'date',
-            'Open': 'open_price',
-            'High': 'high_price',
-            'Low': 'low_price',
-            'Close': 'close_price',
-            'Volume': 'volume'
-        }
-        
-        if 'Adj Close' in df.columns:
-            rename_map['Adj Close'] = 'adjusted_close'
-        
-        df.rename(columns=rename_map, inplace=True)
-        
-        if 'adjusted_close' not in df.columns:
-            df['adjusted_close'] = df['close_price']
-        
-        # 변화율 계산
-        df['change'] = df['adjusted_close'].diff()
-        df['change_rate'] = df['adjusted_close'].pct_change() * 100
-        
-        df.fillna(0, inplace=True)
-        
-        # 결과 포맷팅
-        result = []
-        for _, row in df.iterrows():
-            try:
-                if isinstance(row['date'], pd.Timestamp):
-                    date_value = row['date'].date()
-                else:
-                    continue
-                
-                daily_price = {
-                    'stock_id': stock_id,
-                    'date': date_value,
-                    'open_price': float(row['open_price']),
-                    'high_price': float(row['high_price']),
-                    'low_price': float(row['low_price']),
-                    'close_price': float(row['close_price']),
-                    'adjusted_close': float(row['adjusted_close']),
-                    'volume': int(row['volume']),
-                    'change': float(row['change']),
-                    'change_rate': float(row['change_rate'])
-                }
-                result.append(daily_price)
-            except Exception as e:
-                continue
-        
-        return result
+        return normalize_price_frame(stock_id, df)
     except Exception as e:
         logger.error(f"데이터 처리 오류 ({symbol}): {e}")
-        return []
+        return None
 
-# 시장 지수 데이터 가져오기 및 저장 (오류 수정)
-def fetch_and_save_market_indices(db, start_date, end_date):
-    indices = {
-        'KOSPI': '^KS11',
-        'KOSDAQ': '^KQ11'
+# 데이터 소스 결과(yfinance 형식)를 daily_prices 컬럼 구조의 DataFrame으로 변환
+def normalize_price_frame(stock_id, df):
+    # Series인 경우 DataFrame으로 변환
+    if isinstance(df, pd.Series):
+        df = df.to_frame().T
+
+    df = df.reset_index()
+    
+    # 필요한 열 확인
+    required_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    
+    if missing_columns:
+        return _empty_price_frame()
+    
+    # 열 이름 변경
+    rename_map = {
+        'Date': 'date',
+        'Open': 'open_price',
+        'High': 'high_price',
+        'Low': 'low_price',
+        'Close': 'close_price',
+        'Volume': 'volume'
     }
     
+    if 'Adj Close' in df.columns:
+        rename_map['Adj Close'] = 'adjusted_close'
+    
+    df = df.rename(columns=rename_map)
+    
+    if 'adjusted_close' not in df.columns:
+        df['adjusted_close'] = df['close_price']
+    
+    # 변화율 계산
+    df['change'] = df['adjusted_close'].diff()
+    df['change_rate'] = df['adjusted_close'].pct_change() * 100
+    
+    df = df.replace([np.inf, -np.inf], np.nan).fillna(0)
+    
+    # 날짜는 거래소 현지 날짜 기준
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    df['stock_id'] = stock_id
+    df['volume'] = df['volume'].astype('int64')
+    
+    return df[PRICE_COLUMNS]
+
+def _empty_price_frame():
+    return pd.DataFrame(columns=PRICE_COLUMNS)
+
+# 여러 종목 가격 데이터 일괄 가져오기 (기본 소스는 yf.download 멀티 티커)
+# stocks: [(stock_id, symbol), ...] -> {stock_id: DataFrame}  (요청/처리 실패 종목은 None)
+def fetch_stock_prices_batch(stocks, start_date, end_date, threads=True, source=None):
+    source = source or default_source
+    symbols = [symbol for _, symbol in stocks]
+    
     try:
-        for market_name, symbol in indices.items():
-            logger.info(f"{market_name} 지수 데이터 가져오는 중...")
+        if source.supports_threads:
+            frames = source.get_price_history(symbols, start_date, end_date, threads=threads)
+        else:
+            frames = source.get_price_history(symbols, start_date, end_date)
+    except Exception as e:
+        logger.error(f"가격 데이터 일괄 가져오기 오류 ({len(symbols)}개 종목): {e}")
+        return {stock_id: None for stock_id, _ in stocks}
+    
+    result = {}
+    for stock_id, symbol in stocks:
+        try:
+            frame = frames.get(symbol, pd.DataFrame())
+            if frame is None:
+                logger.error(f"가격 데이터 가져오기 실패: {symbol}")
+                result[stock_id] = None
+                continue
+            if frame.empty:
+                logger.warning(f"가격 데이터가 없습니다: {symbol}")
+                result[stock_id] = _empty_price_frame()
+                continue
             
-            # curl_cffi 세션을 사용하여 데이터 가져오기
-            session = requests.Session(impersonate="chrome")
-            session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            })
+            result[stock_id] = normalize_price_frame(stock_id, frame)
+        except Exception as e:
+            logger.error(f"데이터 처리 오류 ({symbol}): {e}")
+            result[stock_id] = None
+    
+    fetched = sum(frame is not None and not frame.empty for frame in result.values())
+    logger.info(f"가격 데이터 일괄 가져오기 완료: {fetched}/{len(stocks)}개 종목")
+    return result
+
+# 시장 지수 데이터 가져오기 및 저장 (오류 수정)
+def fetch_and_save_market_indices(db, start_date, end_date, source=None):
+    source = source or default_source
+    
+    try:
+        for market_name in ('KOSPI', 'KOSDAQ'):
+            logger.info(f"{market_name} 지수 데이터 가져오는 중...")
             
-            # yfinance download에 세션 주입
-            df = yf.download(symbol, start=start_date, end=end_date, progress=False, auto_adjust=False, session=session)
+            df = source.get_index_history(market_name, start_date, end_date)
             
-            if df.empty:
+            if df is None or df.empty:
                 logger.warning(f"{market_name} 지수 데이터가 없습니다.")
                 continue
             
-            # MultiIndex 컬럼 처리 (yfinance 최신 버전 대응)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.droplevel(1)
-            
             # Series인 경우 DataFrame으로 변환
             if isinstance(df, pd.Series):
                 df = df.to_frame().T
@@ -313,6 +280,8 @@ def fetch_and_save_market_indices(db, start_date, end_date):
                     logger.error(f"시장 지수 행 처리 오류: {e}")
                     continue
             
+            metrics.add_current('rows_fetched', len(df))
+            metrics.add_current('rows_written', len(df))
             logger.info(f"{market_name} 지수 데이터 저장 완료")
         
         db.commit()
@@ -322,360 +291,488 @@ def fetch_and_save_market_indices(db, start_date, end_date):
         logger.error(f"시장 지수 데이터 저장 오류: {e}")
         return False
 
-# 주가 데이터 저장
-def save_price_data(stock_id, price_data):
-    session = Session()
+# 주가 데이터 저장 (COPY -> 임시 테이블 -> ON CONFLICT upsert)
+def save_price_data(stock_id, price_data, batch_size=None):
     try:
-        for data in price_data:
-            existing_price = session.query(DailyPrice).filter_by(
-                stock_id=stock_id,
-                date=data['date']
-            ).first()
-            
-            if existing_price:
-                for key, value in data.items():
-                    if key != 'stock_id' and key != 'date':
-                        setattr(existing_price, key, value)
-            else:
-                new_price = DailyPrice(**data)
-                session.add(new_price)
+        if not isinstance(price_data, pd.DataFrame):
+            price_data = pd.DataFrame(price_data, columns=PRICE_COLUMNS)
         
-        session.commit()
-        return True
+        price_data = price_data.assign(stock_id=stock_id)[PRICE_COLUMNS]
+        return copy_upsert('daily_prices', price_data, ['stock_id', 'date'], batch_size=batch_size)
     except Exception as e:
-        session.rollback()
         logger.error(f"가격 데이터 저장 오류: {e}")
         return False
+
+# 기술적 지표 계산에 사용할 가격 컬럼 로드 (ORM 객체 / 행별 dict 없이 커서에서 미리 할당한 NumPy 구조 배열로 바로 채움)
+# since 가 주어지면 그 이전 INDICATOR_WARMUP_BARS 개 봉부터 읽음 (워밍업 시작일 조회도 같은 쿼리에서 처리)
+def load_indicator_inputs(stock_id, since=None, dtype=None):
+    dtype = np.dtype(dtype or INDICATOR_DTYPE)
+    sql = """
+        SELECT date, open_price, high_price, low_price, adjusted_close, volume
+        FROM daily_prices
+        WHERE stock_id = %s
+    """
+    params = [stock_id]
+    if since is not None:
+        sql += """
+          AND date >= coalesce((
+              SELECT date FROM daily_prices
+              WHERE stock_id = %s AND date < %s
+              ORDER BY date DESC OFFSET %s LIMIT 1
+          ), '-infinity'::date)
+        """
+        params += [stock_id, since, INDICATOR_WARMUP_BARS - 1]
+    sql += " ORDER BY date"
+    
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            # 행 수만큼 미리 할당한 배열에 커서의 행을 바로 채움 (NULL 은 NaN)
+            return np.fromiter(cursor, count=cursor.rowcount, dtype=[
+                ('date', 'datetime64[D]'), ('open', dtype), ('high', dtype), ('low', dtype),
+                ('close', dtype), ('volume', dtype)
+            ])
+        finally:
+            cursor.close()
     finally:
-        session.close()
+        conn.close()
 
 # 기술적 지표 계산 및 저장
-def calculate_and_save_technical_indicators(stock_id):
-    session = Session()
+# since 가 주어지면 그 이전 INDICATOR_WARMUP_BARS 개 봉만 워밍업으로 읽어 since 이후 날짜만 계산/저장
+def calculate_and_save_technical_indicators(stock_id, batch_size=None, since=None):
     try:
-        price_data = session.query(DailyPrice).filter_by(stock_id=stock_id).order_by(DailyPrice.date).all()
+        prices = load_indicator_inputs(stock_id, since=since)
         
-        if not price_data:
+        if len(prices) == 0:
             return False
         
-        # 데이터프레임으로 변환
-        df = pd.DataFrame([{
-            'date': p.date,
-            'open': p.open_price,
-            'high': p.high_price,
-            'low': p.low_price,
-            'close': p.adjusted_close,
-            'volume': p.volume
-        } for p in price_data])
-        
-        # 이동평균선 계산
-        df['ma5'] = df['close'].rolling(window=5).mean()
-        df['ma10'] = df['close'].rolling(window=10).mean()
-        df['ma20'] = df['close'].rolling(window=20).mean()
-        df['ma60'] = df['close'].rolling(window=60).mean()
-        df['ma120'] = df['close'].rolling(window=120).mean()
-        
-        # 볼린저 밴드
-        bb_indicator = BollingerBands(close=df['close'], window=20, window_dev=2)
-        df['bb_upper'] = bb_indicator.bollinger_hband()
-        df['bb_middle'] = bb_indicator.bollinger_mavg()
-        df['bb_lower'] = bb_indicator.bollinger_lband()
-        df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
-        
-        # RSI
-        rsi_indicator = RSIIndicator(close=df['close'], window=14)
-        df['rsi'] = rsi_indicator.rsi()
-        
-        # MACD
-        macd_indicator = MACD(close=df['close'], window_slow=26, window_fast=12, window_sign=9)
-        df['macd'] = macd_indicator.macd()
-        df['macd_signal'] = macd_indicator.macd_signal()
-        df['macd_hist'] = macd_indicator.macd_diff()
-        
-        # 볼륨 관련
-        df['volume_ma20'] = df['volume'].rolling(window=20).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma20'] * 100
+        # 데이터프레임으로 변환 (close 는 수정 종가)
+        df = pd.DataFrame({name: prices[name] for name in prices.dtype.names})
         
-        # 캔들 패턴
-        df['body_size'] = abs(df['close'] - df['open'])
-        df['shadow_upper'] = df['high'] - df[['open', 'close']].max(axis=1)
-        df['shadow_lower'] = df[['open', 'close']].min(axis=1) - df['low']
-        df['is_doji'] = (df['body_size'] / (df['high'] - df['low'] + 0.001) < 0.1)
-        df['is_hammer'] = ((df['shadow_lower'] > 2 * df['body_size']) & 
-                          (df['shadow_upper'] < df['body_size']) & 
-                          (df['body_size'] > 0))
+        df = compute_technical_indicators(df)
         
-        # 시그널
-        df['ma5_prev'] = df['ma5'].shift(1)
-        df['ma20_prev'] = df['ma20'].shift(1)
-        df['golden_cross'] = (df['ma5'] > df['ma20']) & (df['ma5_prev'] <= df['ma20_prev'])
-        df['death_cross'] = (df['ma5'] < df['ma20']) & (df['ma5_prev'] >= df['ma20_prev'])
+        if since is not None:
+            df = df[df['date'] >= pd.Timestamp(since)]
         
-        # 볼린저 밴드 터치
-        df['bb_upper_touch'] = (df['high'] >= df['bb_upper'])
-        df['bb_lower_touch'] = (df['low'] <= df['bb_lower'])
-        
-        df.fillna(0, inplace=True)
-        
-        # 기존 지표 삭제
-        session.query(TechnicalIndicator).filter_by(stock_id=stock_id).delete()
-        
-        # 새 지표 저장
-        for _, row in df.iterrows():
-            if pd.isna(row['date']):
-                continue
-                
-            new_indicator = TechnicalIndicator(
-                stock_id=stock_id,
-                date=row['date'],
-                ma5=row['ma5'],
-                ma10=row['ma10'],
-                ma20=row['ma20'],
-                ma60=row['ma60'],
-                ma120=row['ma120'],
-                bb_upper=row['bb_upper'],
-                bb_middle=row['bb_middle'],
-                bb_lower=row['bb_lower'],
-                bb_width=row['bb_width'],
-                rsi=row['rsi'],
-                macd=row['macd'],
-                macd_signal=row['macd_signal'],
-                macd_hist=row['macd_hist'],
-                volume_ma20=row['volume_ma20'],
-                volume_ratio=row['volume_ratio'],
-                is_doji=row['is_doji'],
-                is_hammer=row['is_hammer'],
-                golden_cross=row['golden_cross'],
-                death_cross=row['death_cross'],
-                bb_upper_touch=row['bb_upper_touch'],
-                bb_lower_touch=row['bb_lower_touch']
-            )
-            session.add(new_indicator)
-        
-        session.commit()
-        return True
+        stats = save_technical_indicators(stock_id, df, batch_size=batch_size)
+        logger.debug(f"기술적 지표 저장 (종목 ID: {stock_id}) - "
+                    f"추가: {stats['inserted']}, 갱신: {stats['updated']}, 변경없음: {stats['skipped']}")
+        return stats
     except Exception as e:
-        session.rollback()
         logger.error(f"기술적 지표 계산 오류 (종목 ID: {stock_id}): {e}")
         return False
-    finally:
-        session.close()
 
-# 시장 통계 계산 및 저장
-def calculate_market_stats(db):
+# 기술적 지표 계산 (date, open, high, low, close, volume 컬럼의 DataFrame 입력)
+def compute_technical_indicators(df):
+    # 이동평균선 계산
+    df['ma5'] = df['close'].rolling(window=5).mean()
+    df['ma10'] = df['close'].rolling(window=10).mean()
+    df['ma20'] = df['close'].rolling(window=20).mean()
+    df['ma60'] = df['close'].rolling(window=60).mean()
+    df['ma120'] = df['close'].rolling(window=120).mean()
+    
+    # 볼린저 밴드
+    bb_indicator = BollingerBands(close=df['close'], window=20, window_dev=2)
+    df['bb_upper'] = bb_indicator.bollinger_hband()
+    df['bb_middle'] = bb_indicator.bollinger_mavg()
+    df['bb_lower'] = bb_indicator.bollinger_lband()
+    df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
+    
+    # RSI
+    rsi_indicator = RSIIndicator(close=df['close'], window=14)
+    df['rsi'] = rsi_indicator.rsi()
+    
+    # MACD
+    macd_indicator = MACD(close=df['close'], window_slow=26, window_fast=12, window_sign=9)
+    df['macd'] = macd_indicator.macd()
+    df['macd_signal'] = macd_indicator.macd_signal()
+    df['macd_hist'] = macd_indicator.macd_diff()
+    
+    # 볼륨 관련
+    df['volume_ma20'] = df['volume'].rolling(window=20).mean()
+    df['volume_ratio'] = df['volume'] / df['volume_ma20'] * 100
+    
+    # 캔들 패턴
+    df['body_size'] = abs(df['close'] - df['open'])
+    df['shadow_upper'] = df['high'] - df[['open', 'close']].max(axis=1)
+    df['shadow_lower'] = df[['open', 'close']].min(axis=1) - df['low']
+    df['is_doji'] = (df['body_size'] / (df['high'] - df['low'] + 0.001) < 0.1)
+    df['is_hammer'] = ((df['shadow_lower'] > 2 * df['body_size']) & 
+                      (df['shadow_upper'] < df['body_size']) & 
+                      (df['body_size'] > 0))
+    
+    # 시그널
+    df['ma5_prev'] = df['ma5'].shift(1)
+    df['ma20_prev'] = df['ma20'].shift(1)
+    df['golden_cross'] = (df['ma5'] > df['ma20']) & (df['ma5_prev'] <= df['ma20_prev'])
+    df['death_cross'] = (df['ma5'] < df['ma20']) & (df['ma5_prev'] >= df['ma20_prev'])
+    
+    # 볼린저 밴드 터치
+    df['bb_upper_touch'] = (df['high'] >= df['bb_upper'])
+    df['bb_lower_touch'] = (df['low'] <= df['bb_lower'])
+    
+    df.fillna(0, inplace=True)
+    return df
+
+# 기술적 지표 저장 (삭제 없이 값이 바뀐 행만 upsert)
+def save_technical_indicators(stock_id, df, batch_size=None):
+    columns = {'date': df['date'].to_numpy()}
+    for column in INDICATOR_FLOAT_COLUMNS:
+        columns[column] = df[column].to_numpy(dtype=np.float64)
+    for column in INDICATOR_BOOL_COLUMNS:
+        columns[column] = df[column].to_numpy(dtype=bool)
+    
+    frame = pd.DataFrame(columns)
+    frame.insert(0, 'stock_id', stock_id)
+    return copy_upsert('technical_indicators', frame, ['stock_id', 'date'], batch_size=batch_size)
+
+# 시장 통계 계산 및 저장 (daily_prices x stocks 집계 한 번 + market_stats upsert)
+def calculate_market_stats(db, start_date=None, end_date=None):
     try:
-        # 모든 날짜 가져오기
-        dates = [date[0] for date in db.query(DailyPrice.date).distinct().all()]
-        
-        for date in tqdm(dates, desc="시장 통계 계산"):
-            # KOSPI 통계
-            kospi_stats = calculate_market_stat_for_date(db, date, 'KOSPI')
-            # KOSDAQ 통계
-            kosdaq_stats = calculate_market_stat_for_date(db, date, 'KOSDAQ')
-            
-            # 전체 시장 통계
-            total_stats = {
-                'date': date,
-                'market': 'ALL',
-                'rising_stocks': kospi_stats['rising_stocks'] + kosdaq_stats['rising_stocks'],
-                'falling_stocks': kospi_stats['falling_stocks'] + kosdaq_stats['falling_stocks'],
-                'unchanged_stocks': kospi_stats['unchanged_stocks'] + kosdaq_stats['unchanged_stocks'],
-                'total_stocks': kospi_stats['total_stocks'] + kosdaq_stats['total_stocks'],
-                'total_volume': kospi_stats['total_volume'] + kosdaq_stats['total_volume'],
-                'total_value': kospi_stats['total_value'] + kosdaq_stats['total_value']
-            }
-            
-            # 저장
-            save_market_stat(db, kospi_stats)
-            save_market_stat(db, kosdaq_stats)
-            save_market_stat(db, total_stats)
+        conditions = ["s.market IN ('KOSPI', 'KOSDAQ')"]
+        params = {}
+        if start_date is not None:
+            conditions.append("p.date >= :start_date")
+            params['start_date'] = start_date
+        if end_date is not None:
+            conditions.append("p.date <= :end_date")
+            params['end_date'] = end_date
+        
+        # 시장별 + 전체(ALL, ROLLUP) 통계를 한 번에 집계하여 저장
+        result = db.execute(text(f"""
+            INSERT INTO market_stats (
+                market, date, rising_stocks, falling_stocks, unchanged_stocks,
+                total_stocks, total_volume, total_value, created_at, updated_at
+            )
+            SELECT
+                CASE WHEN GROUPING(s.market) = 1 THEN 'ALL' ELSE s.market END,
+                p.date,
+                count(*) FILTER (WHERE p.change > 0),
+                count(*) FILTER (WHERE p.change < 0),
+                count(*) FILTER (WHERE p.change = 0),
+                count(*),
+                coalesce(sum(p.volume), 0),
+                coalesce(sum(p.volume::float8 * p.close_price), 0),
+                now(),
+                now()
+            FROM daily_prices p
+            JOIN stocks s ON s.stock_id = p.stock_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY p.date, ROLLUP (s.market)
+            ON CONFLICT (market, date) DO UPDATE SET
+                rising_stocks = EXCLUDED.rising_stocks,
+                falling_stocks = EXCLUDED.falling_stocks,
+                unchanged_stocks = EXCLUDED.unchanged_stocks,
+                total_stocks = EXCLUDED.total_stocks,
+                total_volume = EXCLUDED.total_volume,
+                total_value = EXCLUDED.total_value,
+                updated_at = now()
+        """), params)
         
         db.commit()
-        logger.info("시장 통계 계산 및 저장 완료")
+        metrics.add_current('rows_written', result.rowcount)
+        logger.info(f"시장 통계 계산 및 저장 완료 ({result.rowcount}행)")
         return True
     except Exception as e:
         db.rollback()
         logger.error(f"시장 통계 계산 오류: {e}")
         return False
 
-# 특정 날짜, 특정 시장에 대한 통계 계산
-def calculate_market_stat_for_date(db, date, market):
-    stocks = db.query(Stock).filter_by(market=market).all()
-    stock_ids = [stock.stock_id for stock in stocks]
+# 주식 데이터 가져오기 (수집 / 저장 / 지표 계산 단계 분리 파이프라인)
+# chunk_size > 1 이면 같은 기간을 요청하는 종목들을 chunk_size 개씩 묶어 yf.download 한 번으로 받음
+# 실제 동시 요청 수는 http_client.concurrency 가 지연시간/429 비율에 따라 max_workers 이하로 조절
+# jobs 를 주면 해당 작업만, on_result(stock_id, status) 로 종목별 최종 결과를 받음
+def fetch_stock_data(start_date, end_date, max_workers=None, batch_size=None, incremental=False, chunk_size=None, source=None,
+                     jobs=None, on_result=None, watermarks=None):
+    from pipeline import IngestPipeline
     
-    prices = db.query(DailyPrice).filter(
-        DailyPrice.stock_id.in_(stock_ids),
-        DailyPrice.date == date
-    ).all()
+    if jobs is None:
+        jobs = _build_jobs(start_date, end_date)
     
-    # 통계 계산
-    rising_stocks = sum(1 for p in prices if p.change > 0)
-    falling_stocks = sum(1 for p in prices if p.change < 0)
-    unchanged_stocks = sum(1 for p in prices if p.change == 0)
-    total_stocks = len(prices)
-    total_volume = sum(p.volume for p in prices)
-    total_value = sum(p.volume * p.close_price for p in prices)
+    logger.info(f"총 {len(jobs)}개 종목을 처리합니다 (다운로드 묶음 크기: {chunk_size or DOWNLOAD_CHUNK_SIZE})")
     
-    return {
-        'date': date,
-        'market': market,
-        'rising_stocks': rising_stocks,
-        'falling_stocks': falling_stocks,
-        'unchanged_stocks': unchanged_stocks,
-        'total_stocks': total_stocks,
-        'total_volume': total_volume,
-        'total_value': total_value
-    }
+    pipeline = IngestPipeline(incremental=incremental, batch_size=batch_size, total=len(jobs), on_result=on_result,
+                              watermarks=watermarks).start()
+    try:
+        pipeline.fetch(jobs, chunk_size=chunk_size, fetch_workers=max_workers, source=source)
+    finally:
+        stats = pipeline.close()
+    return stats
 
-# 시장 통계 저장
-def save_market_stat(db, stat_data):
-    existing_stat = db.query(MarketStat).filter_by(
-        market=stat_data['market'],
-        date=stat_data['date']
-    ).first()
-    
-    if existing_stat:
-        for key, value in stat_data.items():
-            if key != 'market' and key != 'date':
-                setattr(existing_stat, key, value)
-    else:
-        new_stat = MarketStat(**stat_data)
-        db.add(new_stat)
+# 전체 종목(exclude 제외)의 수집 작업 목록 [(stock_id, symbol, name, start_date, end_date), ...]
+def _build_jobs(start_date, end_date, exclude=None):
+    session = Session()
+    try:
+        stocks = session.query(Stock.stock_id, Stock.symbol, Stock.name).order_by(Stock.stock_id).all()
+    finally:
+        session.close()
+    exclude = exclude or set()
+    return [(stock_id, symbol, name, start_date, end_date)
+            for stock_id, symbol, name in stocks if stock_id not in exclude]
 
-# 주식 데이터 가져오기 (병렬 처리 - Jupyter 노트북 방식)
-def fetch_stock_data(start_date, end_date, max_workers=5):  # 최적화된 워커 수
+# 가격 수집 방식 선택 (use_async 이면 asyncio 수집 엔진 사용, yfinance 소스에서만 지원)
+def _fetch_prices(start_date, end_date, incremental=False, use_async=False, source=None, jobs=None, on_result=None,
+                  watermarks=None):
+    source = source or default_source
+    if use_async:
+        if source.supports_async:
+            from async_ingest import fetch_stock_data_async
+            return fetch_stock_data_async(start_date, end_date, incremental=incremental, jobs=jobs, on_result=on_result,
+                                          watermarks=watermarks, cache=source.cache,
+                                          record=source.record_price_history)
+        logger.warning(f"비동기 수집은 yfinance 소스만 지원합니다. {source.name} 소스는 파이프라인으로 수집합니다.")
+    return fetch_stock_data(start_date, end_date, incremental=incremental, source=source, jobs=jobs, on_result=on_result,
+                            watermarks=watermarks)
+
+# 종목별 마지막 저장 날짜 {stock_id: date} (한 번의 그룹 쿼리)
+def get_price_watermarks():
     session = Session()
     try:
-        # 모든 종목 가져오기
-        stocks = session.query(Stock).all()
-        
-        logger.info(f"총 {len(stocks)}개 종목을 병렬 처리합니다")
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            
-            for stock in stocks:
-                futures.append(
-                    executor.submit(
-                        process_stock_data,
-                        stock.stock_id,
-                        stock.symbol,
-                        stock.name,
-                        start_date,
-                        end_date
-                    )
-                )
-            
-            # 결과 처리
-            success_count = 0
-            failure_count = 0
-            
-            for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="종목 데이터 처리"):
-                try:
-                    result = future.result()
-                    if "처리 완료" in result:
-                        success_count += 1
-                        logger.debug(f"종목 처리 완료: {result}")
-                    else:
-                        failure_count += 1
-                        logger.warning(f"종목 처리 실패: {result}")
-                except Exception as e:
-                    failure_count += 1
-                    logger.error(f"종목 처리 오류: {e}")
-        
-        logger.info(f"모든 종목 데이터 처리 완료 - 성공: {success_count}, 실패: {failure_count}")
-        
+        return dict(
+            session.query(DailyPrice.stock_id, func.max(DailyPrice.date))
+            .group_by(DailyPrice.stock_id)
+            .all()
+        )
     finally:
         session.close()
 
-# 단일 종목 데이터 처리
-def process_stock_data(stock_id, symbol, name, start_date, end_date):
-    logger.debug(f"종목 처리 시작: {name} ({symbol})")
-    
-    # 주가 데이터 가져오기
-    price_data = fetch_stock_price(stock_id, symbol, start_date, end_date)
-    
-    if not price_data:
-        logger.warning(f"가격 데이터 없음: {name} ({symbol})")
-        return f"{name}: 데이터 없음"
-    
-    # 주가 데이터 저장
-    save_result = save_price_data(stock_id, price_data)
+# 종목별 마지막 저장 날짜 이후만 받는 증분 수집 작업 목록
+# 변동값(전일 대비) 계산을 위해 마지막 저장 날짜부터 받아오고, 저장 전에 그 날짜 이하는 잘라냄 (IngestPipeline watermarks)
+# 저장된 가격이 없는 종목은 fallback_start 부터, 이미 최신인 종목(다음 영업일이 end_date 이후)은 제외
+def _build_incremental_jobs(end_date, fallback_start):
+    watermarks = get_price_watermarks()
+    end = np.datetime64(end_date, 'D')
     
-    if not save_result:
-        logger.error(f"가격 데이터 저장 실패: {name} ({symbol})")
-        return f"{name}: 저장 실패"
+    jobs = []
+    up_to_date = 0
+    for stock_id, symbol, name, _, _ in _build_jobs(fallback_start, end_date):
+        watermark = watermarks.get(stock_id)
+        if watermark is None:
+            jobs.append((stock_id, symbol, name, fallback_start, end_date))
+        elif np.busday_offset(np.datetime64(watermark, 'D'), 1, roll='forward') >= end:
+            up_to_date += 1
+        else:
+            jobs.append((stock_id, symbol, name, watermark.strftime('%Y-%m-%d'), end_date))
     
-    # 기술적 지표 계산 및 저장
-    indicator_result = calculate_and_save_technical_indicators(stock_id)
-    
-    if not indicator_result:
-        logger.warning(f"기술적 지표 계산 실패: {name} ({symbol})")
+    ranges = len({(job[3], job[4]) for job in jobs})
+    logger.info(f"증분 수집 대상: {len(jobs)}개 종목 ({ranges}개 기간 묶음), 최신 상태로 건너뜀: {up_to_date}개")
+    return jobs, watermarks
+
+# 같은 기간을 요청하는 작업끼리 묶어 chunk_size 단위로 분할
+def _group_jobs_by_range(jobs, chunk_size):
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job[3], job[4]), []).append(job)
     
-    return f"{name}: 처리 완료 ({len(price_data)}개 데이터)"
+    for group in groups.values():
+        for offset in range(0, len(group), chunk_size):
+            yield group[offset:offset + chunk_size]
 
-# 초기 데이터베이스 구축
-def build_initial_database(db, years=1, test_mode=False):
+# 초기 데이터베이스 구축 (단계별 / 종목별 진행 상태를 기록, resume 이면 미완료 실행을 이어서 수행)
+def build_initial_database(db, years=1, test_mode=False, use_async=False, source=None, resume=False):
+    from run_state import RunState
+    
     today = datetime.now().date()
     start_date = (today - timedelta(days=365 * years)).strftime('%Y-%m-%d')
     end_date = today.strftime('%Y-%m-%d')
     
-    logger.info(f"초기 데이터베이스 구축 시작 (기간: {start_date} ~ {end_date})")
-    
-    # 종목 정보 저장
-    symbols = get_korean_stock_symbols()
+    # 재개 시에는 이전 실행의 수집 기간을 그대로 사용
+    run = RunState.start('test' if test_mode else 'init', start_date, end_date, resume=resume)
+    start_date, end_date = run.start_date, run.end_date
     
-    # 테스트 모드인 경우 소량 종목만 처리
-    if test_mode:
-        logger.info("테스트 모드: 상위 5개 종목만 처리합니다.")
-        symbols = symbols[:5]  # 20개 → 5개로 줄임
+    source = source or default_source
+    logger.info(f"초기 데이터베이스 구축 시작 (기간: {start_date} ~ {end_date}, 데이터 소스: {source.name})")
     
-    save_stock_info(symbols)
+    # 종목 정보 저장
+    def save_symbols():
+        symbols = get_korean_stock_symbols(source)
+        
+        # 테스트 모드인 경우 소량 종목만 처리
+        if test_mode:
+            logger.info("테스트 모드: 상위 5개 종목만 처리합니다.")
+            symbols = symbols[:5]  # 20개 → 5개로 줄임
+        
+        return save_stock_info(symbols, source)
     
-    # 주가 데이터 가져오기
-    fetch_stock_data(start_date, end_date)
+    # 주가 데이터 가져오기 (완료된 종목은 건너뜀)
+    def fetch_prices():
+        done = run.completed_stocks()
+        jobs = _build_jobs(start_date, end_date, exclude=done)
+        if done:
+            logger.info(f"[재개] 완료된 종목 {len(done)}개 건너뜀, 남은 종목 {len(jobs)}개")
+        
+        _fetch_prices(start_date, end_date, use_async=use_async, source=source, jobs=jobs, on_result=run.mark_stock)
+        run.flush()
+        
+        summary = run.stock_summary()
+        unfinished = len(jobs) - (len(run.completed_stocks()) - len(done)) - summary.get('empty', 0)
+        logger.info(f"종목별 진행 상태 - 완료: {summary.get('done', 0)}, 데이터 없음: {summary.get('empty', 0)}, "
+                    f"실패/미처리: {unfinished}")
+        return unfinished == 0
     
-    # 시장 지수 가져오기
-    fetch_and_save_market_indices(db, start_date, end_date)
+    steps = [
+        ('symbols', save_symbols),
+        ('prices', fetch_prices),
+        # 시장 지수 가져오기
+        ('market_indices', lambda: fetch_and_save_market_indices(db, start_date, end_date, source)),
+        # 시장 통계 계산
+        ('market_stats', lambda: calculate_market_stats(db)),
+    ]
     
-    # 시장 통계 계산
-    calculate_market_stats(db)
+    # 뒤 단계는 앞 단계 결과에 의존하므로 (예: 시장 통계는 전체 가격 필요) 실패한 단계에서 멈춤
+    success = True
+    for stage, step in steps:
+        with metrics.stage(stage):
+            success = run.run_stage(stage, step)
+        if not success:
+            break
     
-    logger.info("초기 데이터베이스 구축 완료")
+    run.finish(success)
+    logger.info("초기 데이터베이스 구축 완료" if success else "초기 데이터베이스 구축 미완료 (실패한 단계/종목은 --resume 으로 재시도)")
+    return success
 
-# 일일 데이터 업데이트
-def update_daily_data(db, days=2):
+# 일일 데이터 업데이트 (종목별 마지막 저장 날짜 이후만 수집, 누락된 기간은 자동으로 채움)
+# days 는 저장된 가격이 없는 신규 종목과 시장 지수의 기본 수집 기간. 실제 수집 시작일(가장 이른 날짜)을 반환
+def update_daily_data(db, days=2, use_async=False, source=None):
     today = datetime.now().date()
-    start_date = (today - timedelta(days=days)).strftime('%Y-%m-%d')
+    fallback_start = (today - timedelta(days=days)).strftime('%Y-%m-%d')
     end_date = today.strftime('%Y-%m-%d')
     
-    logger.info(f"일일 데이터 업데이트 시작 (기간: {start_date} ~ {end_date})")
+    source = source or default_source
+    logger.info(f"일일 데이터 업데이트 시작 (종료일: {end_date}, 데이터 소스: {source.name})")
     
     # 종목 정보 업데이트
-    symbols = get_korean_stock_symbols()
-    save_stock_info(symbols)
+    with metrics.stage('symbols'):
+        symbols = get_korean_stock_symbols(source)
+        save_stock_info(symbols, source)
     
-    # 주가 데이터 업데이트
-    fetch_stock_data(start_date, end_date)
+    # 주가 데이터 업데이트 (기술적 지표는 새 날짜만 증분 계산)
+    with metrics.stage('prices'):
+        jobs, watermarks = _build_incremental_jobs(end_date, fallback_start)
+        if jobs:
+            _fetch_prices(fallback_start, end_date, incremental=True, use_async=use_async, source=source,
+                          jobs=jobs, watermarks=watermarks)
     
-    # 시장 지수 업데이트
-    fetch_and_save_market_indices(db, start_date, end_date)
+    # 시장 지수 업데이트 (시장별 마지막 저장 날짜 중 가장 이른 날짜부터)
+    last_dates = db.query(func.max(MarketIndex.date).label('last_date')).group_by(MarketIndex.market).subquery()
+    index_start = db.query(func.min(last_dates.c.last_date)).scalar()
+    with metrics.stage('market_indices'):
+        fetch_and_save_market_indices(db, index_start.strftime('%Y-%m-%d') if index_start else fallback_start,
+                                      end_date, source)
     
-    logger.info("일일 데이터 업데이트 완료")
+    start_date = min([job[3] for job in jobs] + [fallback_start])
+    logger.info(f"일일 데이터 업데이트 완료 (수집 시작일: {start_date})")
+    return datetime.strptime(start_date, '%Y-%m-%d').date()
 
-# 전체 기술적 지표 재계산
-def update_full_technical_indicators(db):
-    logger.info("기술적 지표 전체 재계산 시작")
+# 전체 기술적 지표 재계산 (workers > 1 이면 종목 묶음 단위로 멀티 프로세스 실행)
+# stock_ids 를 주면 해당 종목만 재계산 (기본값: 전체 종목)
+def update_full_technical_indicators(db, workers=1, chunk_size=None, stock_ids=None):
+    logger.info(f"기술적 지표 전체 재계산 시작 (프로세스: {workers})")
     
-    stocks = db.query(Stock).all()
+    if stock_ids is None:
+        stock_ids = [row.stock_id for row in db.query(Stock.stock_id).order_by(Stock.stock_id)]
+    else:
+        stock_ids = sorted(stock_ids)
+    totals = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    failures = []
     
-    for stock in tqdm(stocks, desc="기술적 지표 재계산"):
-        calculate_and_save_technical_indicators(stock.stock_id)
+    if workers <= 1:
+        result = _recompute_indicator_chunk(stock_ids, show_progress=True)
+        chunk_results = [result]
+    else:
+        # 워커당 여러 묶음을 주어 종목별 이력 길이 차이로 인한 쏠림을 줄임
+        chunk_size = chunk_size or max(1, -(-len(stock_ids) // (workers * 4)))
+        chunks = [stock_ids[i:i + chunk_size] for i in range(0, len(stock_ids), chunk_size)]
+        chunk_results = []
+        
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_indicator_worker) as executor:
+            futures = {executor.submit(_recompute_indicator_chunk, chunk): chunk for chunk in chunks}
+            for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="기술적 지표 재계산"):
+                try:
+                    chunk_results.append(future.result())
+                except Exception as e:
+                    # 묶음 전체를 실패로 기록 (결과에도 포함하여 호출자가 확인할 수 있게 함)
+                    chunk = futures[future]
+                    logger.error(f"기술적 지표 재계산 프로세스 오류 (종목 ID {chunk[0]}~{chunk[-1]}, {len(chunk)}개): {e}")
+                    result = _new_chunk_result(chunk)
+                    result['failures'] = list(chunk)
+                    chunk_results.append(result)
+    
+    for result in chunk_results:
+        backfill.track_decompressed(result['decompressed_chunks'])
+        for key in totals:
+            totals[key] += result[key]
+        failures.extend(result['failures'])
+        logger.debug(f"기술적 지표 묶음 완료 (종목 ID {result['first_stock_id']}~{result['last_stock_id']}): "
+                     f"{result['stocks']}개 종목, {result['elapsed']:.1f}초, 실패 {len(result['failures'])}개")
+    
+    if failures:
+        logger.warning(f"기술적 지표 계산 실패 종목 ID: {failures}")
+    
+    logger.info(f"기술적 지표 전체 재계산 완료 - "
+                f"추가: {totals['inserted']}, 갱신: {totals['updated']}, 변경없음: {totals['skipped']}, 실패: {len(failures)}")
+    return chunk_results
+
+# 워커 프로세스 초기화: 부모에게서 복사된 커넥션 풀을 버리고 프로세스 전용 엔진 연결을 사용
+def _init_indicator_worker():
+    engine.dispose(close=False)
+
+# 종목 묶음 결과 (재계산 전 초기값)
+def _new_chunk_result(stock_ids):
+    return {
+        'first_stock_id': stock_ids[0] if stock_ids else None,
+        'last_stock_id': stock_ids[-1] if stock_ids else None,
+        'stocks': len(stock_ids),
+        'inserted': 0,
+        'updated': 0,
+        'skipped': 0,
+        'failures': [],
+        'elapsed': 0.0,
+        'decompressed_chunks': []
+    }
+
+# 종목 묶음의 기술적 지표 재계산 (묶음별 소요 시간과 실패 종목을 반환)
+def _recompute_indicator_chunk(stock_ids, show_progress=False):
+    started_at = time.time()
+    result = _new_chunk_result(stock_ids)
+    
+    for stock_id in tqdm(stock_ids, desc="기술적 지표 재계산", disable=not show_progress):
+        stats = calculate_and_save_technical_indicators(stock_id)
+        if stats:
+            for key, value in stats.items():
+                result[key] += value
+        else:
+            result['failures'].append(stock_id)
     
-    logger.info("기술적 지표 전체 재계산 완료")
+    result['elapsed'] = time.time() - started_at
+    # 워커 프로세스에서 푼 압축 청크는 부모 프로세스가 다시 압축
+    result['decompressed_chunks'] = backfill.decompressed_chunks()
+    return result
 
-# 시장 통계 재계산
-def update_market_stats(db):
+# 시장 통계 재계산 (기간 미지정 시 전체 기간)
+def update_market_stats(db, start_date=None, end_date=None):
     logger.info("시장 통계 재계산 시작")
-    calculate_market_stats(db)
-    logger.info("시장 통계 재계산 완료")
\ No newline at end of file
+    calculate_market_stats(db, start_date=start_date, end_date=end_date)
+    logger.info("시장 통계 재계산 완료")
+
+# 백필 마무리 (staging 모드로 모아 둔 과거 구간 반영 + 압축을 풀었던 청크 재압축)
+# 반영한 가격의 가장 이른 날짜를 반환 (시장 통계 등 가격 기반 집계를 그 날짜부터 다시 계산해야 함)
+def finish_backfill():
+    logger.info(f"백필 마무리 시작 (방식: {backfill.BACKFILL_MODE})")
+    since = None
+    try:
+        affected = backfill.merge_staged('daily_prices')
+        
+        # 반영 전 계산된 지표는 과거 가격이 빠진 상태였으므로 반영한 날짜부터 다시 계산
+        for stock_id, stock_since in tqdm(affected.items(), desc="백필 종목 지표 재계산", disable=not affected):
+            calculate_and_save_technical_indicators(stock_id, since=stock_since)
+        
+        backfill.merge_staged('technical_indicators')
+        since = min(affected.values(), default=None)
+    except Exception as e:
+        logger.error(f"백필 마무리 오류: {e}")
+    finally:
+        backfill.recompress_chunks()
+    return since
\ No newline at end of file
@@ -0,0 +1,350 @@
+# data_sources.py - 시장 데이터 소스 계층 (yfinance / pykrx / 로컬 재생)
+#
+# 모든 소스는 같은 형식을 반환합니다.
+#   get_symbols()                      -> [{'symbol', 'krx_code', 'name', 'market', ...}, ...]
+#   get_price_history(symbols, s, e)   -> {symbol: DataFrame}  (index 'Date', 컬럼 Open/High/Low/Close/Adj Close/Volume)
+#   get_index_history(market, s, e)    -> DataFrame            (index 'Date', 컬럼 Open/High/Low/Close/Volume)
+#   get_profile(symbol)                -> {'sector', 'industry', 'description'}
+# 기간은 yfinance 와 같이 start 이상, end 미만입니다.
+# 가격 조회 결과가 빈 DataFrame 이면 해당 기간 데이터가 없는 것이고, None 이면 조회에 실패한 것(재시도 대상)입니다.
+#
+# yfinance / pykrx 응답은 소스 / 종목 / 기간별로 디스크에 캐시합니다 (response_cache.py, 종목 목록은 symbol_master 의 거래일 캐시).
+#
+# ReplaySource 는 디스크의 CSV/Parquet 파일을 재생하므로 네트워크 없이 저장/계산 단계를 측정할 수 있고,
+# RecordingSource 는 다른 소스의 응답을 같은 형식으로 기록합니다.
+#
+#   <root>/symbols.csv
+#   <root>/prices/<symbol>.csv | .parquet
+#   <root>/indices/<market>.csv | .parquet
+
+import os
+import logging
+import threading
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+from pykrx import stock
+from http_client import get_http_session, concurrency
+from symbol_master import get_symbol_master
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+class DataSource:
+    """시장 데이터 소스 인터페이스.
+
+    네트워크 소스는 _fetch_price_history / _fetch_index_history / _fetch_profile 을 구현하며,
+    cache(ResponseCache) 가 있으면 get_* 가 저장된 응답을 먼저 사용하고 받은 응답을 저장합니다.
+
+    수집 방식은 소스 타입 대신 다음 속성으로 선택합니다 (RecordingSource 는 감싼 소스의 값을 그대로 사용).
+      supports_threads : get_price_history(..., threads=) 로 묶음 다운로드 스레드 수를 받음
+      supports_async   : --async 수집 엔진(async_ingest.py, Yahoo chart API)으로 가격을 받을 수 있음
+    """
+
+    name = 'base'
+    cache = None
+    supports_threads = False
+    supports_async = False
+
+    def get_symbols(self, trading_date=None):
+        raise NotImplementedError
+
+    def get_price_history(self, symbols, start_date, end_date, **kwargs):
+        if self.cache is None:
+            return self._fetch_price_history(symbols, start_date, end_date, **kwargs)
+
+        result = {}
+        missing = []
+        for symbol in symbols:
+            df = self.cache.get(self.name, 'prices', symbol, start_date, end_date)
+            if df is None:
+                missing.append(symbol)
+            else:
+                result[symbol] = df
+        if missing:
+            fetched = self._fetch_price_history(missing, start_date, end_date, **kwargs)
+            for symbol, df in fetched.items():
+                self.cache.put(self.name, 'prices', symbol, start_date, end_date, df)
+            result.update(fetched)
+        return result
+
+    def get_index_history(self, market, start_date, end_date):
+        if self.cache is None:
+            return self._fetch_index_history(market, start_date, end_date)
+        df = self.cache.get(self.name, 'index', market, start_date, end_date)
+        if df is None:
+            df = self._fetch_index_history(market, start_date, end_date)
+            self.cache.put(self.name, 'index', market, start_date, end_date, df)
+        return df
+
+    def get_profile(self, symbol):
+        if self.cache is None:
+            return self._fetch_profile(symbol)
+        profile = self.cache.get(self.name, 'profile', symbol)
+        if profile is None:
+            profile = self._fetch_profile(symbol)
+            # 빈 프로필(조회 실패 포함)은 저장하지 않음
+            if any(profile.values()):
+                self.cache.put(self.name, 'profile', symbol, None, None, profile)
+        return profile
+
+    def _fetch_price_history(self, symbols, start_date, end_date, **kwargs):
+        raise NotImplementedError
+
+    def _fetch_index_history(self, market, start_date, end_date):
+        raise NotImplementedError
+
+    def _fetch_profile(self, symbol):
+        return {}
+
+    def record_price_history(self, symbol, df):
+        """소스를 거치지 않고 받은 가격(--async 수집 엔진)을 알립니다. 기록하는 소스만 구현합니다."""
+
+
+class YFinanceSource(DataSource):
+    """야후 파이낸스 (종목 목록은 KRX 종목 마스터 사용)."""
+
+    name = 'yfinance'
+    supports_threads = True
+    supports_async = True
+    INDEX_SYMBOLS = {'KOSPI': '^KS11', 'KOSDAQ': '^KQ11'}
+    MISSING_ERRORS = ('YFTickerMissingError', 'YFPricesMissingError', 'YFTzMissingError')
+
+    def get_symbols(self, trading_date=None):
+        return get_symbol_master(trading_date)
+
+    def _fetch_price_history(self, symbols, start_date, end_date, threads=True):
+        if len(symbols) == 1:
+            # 단일 종목은 Ticker.history (스레드에서 동시에 호출 가능)
+            ticker = yf.Ticker(symbols[0], session=get_http_session())
+            try:
+                with concurrency.slot():
+                    df = ticker.history(start=start_date, end=end_date, auto_adjust=False, raise_errors=True)
+            except YFTickerMissingError:
+                # 상장폐지 / 기간 내 데이터 없음 (요청 실패가 아님)
+                return {symbols[0]: pd.DataFrame()}
+            if isinstance(df, pd.Series):
+                df = df.to_frame().T
+            return {symbols[0]: df}
+
+        # 여러 종목은 yf.download 한 번으로 (ticker, field) MultiIndex 컬럼으로 받음
+        # 묶음도 동시성 슬롯 하나를 차지하며, 내부 요청의 지연 / 429 는 공유 세션이 concurrency 에 기록
+        with concurrency.slot():
+            df = yf.download(symbols, start=start_date, end=end_date, group_by='ticker',
+                             auto_adjust=False, progress=False, threads=threads, session=get_http_session())
+
+        # yf.download 는 종목별 오류를 예외 대신 shared._ERRORS 에 남김 (데이터 없음 오류는 실패로 보지 않음)
+        errors = dict(getattr(yf.shared, '_ERRORS', None) or {})
+
+        result = {}
+        for symbol in symbols:
+            error = errors.get(symbol.upper())
+            if error and not error.startswith(self.MISSING_ERRORS):
+                result[symbol] = None
+                continue
+            if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex) \
+                    or symbol not in df.columns.get_level_values(0):
+                result[symbol] = pd.DataFrame()
+                continue
+            # 다른 종목 때문에 생긴 빈 날짜 제거
+            result[symbol] = df[symbol].dropna(how='all')
+        return result
+
+    def _fetch_index_history(self, market, start_date, end_date):
+        df = yf.download(self.INDEX_SYMBOLS[market], start=start_date, end=end_date,
+                         progress=False, auto_adjust=False, session=get_http_session())
+
+        # MultiIndex 컬럼 처리 (yfinance 최신 버전 대응)
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.droplevel(1)
+        return df
+
+    def _fetch_profile(self, symbol):
+        try:
+            stock_info = yf.Ticker(symbol, session=get_http_session()).info
+            return {
+                'sector': stock_info.get('sector', ''),
+                'industry': stock_info.get('industry', ''),
+                'description': stock_info.get('longBusinessSummary', '')
+            }
+        except Exception:
+            return {'sector': '', 'industry': '', 'description': ''}
+
+
+class PykrxSource(DataSource):
+    """KRX (pykrx). 수정주가 기준 OHLCV 를 사용하므로 Adj Close 는 Close 와 같습니다."""
+
+    name = 'pykrx'
+    INDEX_CODES = {'KOSPI': '1001', 'KOSDAQ': '2001'}
+    COLUMN_MAP = {'시가': 'Open', '고가': 'High', '저가': 'Low', '종가': 'Close', '거래량': 'Volume'}
+
+    def get_symbols(self, trading_date=None):
+        return get_symbol_master(trading_date)
+
+    @staticmethod
+    def _krx_range(start_date, end_date):
+        # pykrx 는 종료일을 포함하므로 하루 앞당김
+        start = pd.Timestamp(start_date).strftime('%Y%m%d')
+        end = (pd.Timestamp(end_date) - pd.Timedelta(days=1)).strftime('%Y%m%d')
+        return start, end
+
+    def _to_ohlcv(self, df):
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = df.rename(columns=self.COLUMN_MAP)[['Open', 'High', 'Low', 'Close', 'Volume']]
+        df['Adj Close'] = df['Close']
+        df.index.name = 'Date'
+        return df
+
+    def _fetch_price_history(self, symbols, start_date, end_date):
+        start, end = self._krx_range(start_date, end_date)
+        result = {}
+        for symbol in symbols:
+            ticker = symbol.split('.')[0]
+            with concurrency.slot():
+                df = stock.get_market_ohlcv(start, end, ticker, adjusted=True)
+            result[symbol] = self._to_ohlcv(df)
+        return result
+
+    def _fetch_index_history(self, market, start_date, end_date):
+        start, end = self._krx_range(start_date, end_date)
+        df = stock.get_index_ohlcv(start, end, self.INDEX_CODES[market])
+        return self._to_ohlcv(df).drop(columns=['Adj Close'], errors='ignore')
+
+
+def _read_frame(path):
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+        if 'Date' in df.columns:
+            df = df.set_index('Date')
+    else:
+        df = pd.read_csv(path, index_col='Date')
+    df.index = pd.to_datetime(df.index, utc=False)
+    return df
+
+
+def _slice_range(df, start_date, end_date):
+    if df.empty:
+        return df
+    # 기록된 시간대와 무관하게 현지 날짜 기준으로 비교
+    index = df.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    dates = index.normalize()
+    keep = (dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date))
+    return df[keep]
+
+
+class ReplaySource(DataSource):
+    """디스크에 기록된 CSV / Parquet 파일을 재생하는 오프라인 소스."""
+
+    name = 'replay'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _find(self, folder, name):
+        for extension in ('.parquet', '.csv'):
+            path = os.path.join(self.root, folder, f"{name}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get_symbols(self, trading_date=None):
+        df = pd.read_csv(os.path.join(self.root, 'symbols.csv'), dtype=str).fillna('')
+        return df.to_dict('records')
+
+    def get_price_history(self, symbols, start_date, end_date):
+        result = {}
+        for symbol in symbols:
+            path = self._find('prices', symbol)
+            result[symbol] = _slice_range(_read_frame(path), start_date, end_date) if path else pd.DataFrame()
+        return result
+
+    def get_index_history(self, market, start_date, end_date):
+        path = self._find('indices', market)
+        return _slice_range(_read_frame(path), start_date, end_date) if path else pd.DataFrame()
+
+    def get_profile(self, symbol):
+        return {}
+
+
+class RecordingSource(DataSource):
+    """다른 소스의 응답을 ReplaySource 형식으로 기록합니다 (같은 파일은 덮어씀)."""
+
+    def __init__(self, inner, root):
+        self.inner = inner
+        self.root = root
+        self.name = f"{inner.name}+record"
+        self._lock = threading.Lock()
+        for folder in ('prices', 'indices'):
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    # 수집 방식 / 응답 캐시는 감싼 소스를 따름 (기록 여부와 무관하게 평소 실행과 같은 경로로 받음)
+    @property
+    def supports_threads(self):
+        return self.inner.supports_threads
+
+    @property
+    def supports_async(self):
+        return self.inner.supports_async
+
+    @property
+    def cache(self):
+        return self.inner.cache
+
+    def _write(self, folder, name, df):
+        if df is None or df.empty:
+            return
+        df.to_csv(os.path.join(self.root, folder, f"{name}.csv"), index_label='Date')
+
+    def record_price_history(self, symbol, df):
+        self._write('prices', symbol, df)
+
+    def get_symbols(self, trading_date=None):
+        symbols = self.inner.get_symbols(trading_date)
+        with self._lock:
+            pd.DataFrame(symbols).to_csv(os.path.join(self.root, 'symbols.csv'), index=False)
+        return symbols
+
+    def get_price_history(self, symbols, start_date, end_date, **kwargs):
+        result = self.inner.get_price_history(symbols, start_date, end_date, **kwargs)
+        for symbol, df in result.items():
+            self._write('prices', symbol, df)
+        return result
+
+    def get_index_history(self, market, start_date, end_date):
+        df = self.inner.get_index_history(market, start_date, end_date)
+        self._write('indices', market, df)
+        return df
+
+    def get_profile(self, symbol):
+        return self.inner.get_profile(symbol)
+
+
+def get_data_source(name='yfinance', replay_dir=None, record_dir=None, use_cache=True):
+    """이름으로 데이터 소스를 만듭니다 (record_dir 이 있으면 응답을 기록, use_cache 면 네트워크 응답을 디스크 캐시)."""
+    if name == 'yfinance':
+        source = YFinanceSource()
+    elif name == 'pykrx':
+        source = PykrxSource()
+    elif name == 'replay':
+        if not replay_dir:
+            raise ValueError("replay 소스에는 replay_dir 이 필요합니다")
+        source = ReplaySource(replay_dir)
+    else:
+        raise ValueError(f"알 수 없는 데이터 소스: {name}")
+
+    if use_cache and name != 'replay':
+        source.cache = response_cache
+
+    if record_dir:
+        source = RecordingSource(source, record_dir)
+    return source
+
+
+default_source = YFinanceSource()
+default_source.cache = response_cache
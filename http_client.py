@@ -0,0 +1,198 @@
+# http_client.py - 공유 HTTP 세션, 토큰 버킷 요청 제한, 적응형 동시성 제어
+
+import os
+import time
+import logging
+import threading
+import statistics
+from collections import deque
+from contextlib import contextmanager
+from curl_cffi import requests
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# API 설정 (README / .env.example 참고)
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', '4'))
+API_RATE_LIMIT = float(os.getenv('API_RATE_LIMIT', '10'))     # 초당 최대 요청 수
+API_RETRY_DELAY = float(os.getenv('API_RETRY_DELAY', '15'))   # 429 / 오류 시 재시도 대기 (초)
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '3'))
+
+# 브라우저 요청 헤더
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰을 채우는 전역 요청 제한기 (스레드 안전)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                else:
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """모든 요청을 seconds 동안 멈춥니다 (429 응답 시)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """관측된 지연시간과 429/오류 비율에 따라 동시 요청 수를 조절합니다 (AIMD).
+
+    window 개 응답마다 평가하여
+    - 429 가 있으면 동시성을 절반으로 줄이고,
+    - 오류 비율이 error_threshold 를 넘거나 중앙 지연시간이 기준의 2배를 넘으면 1 줄이고,
+    - 그 외에는 max_limit 까지 1 늘립니다.
+    기준 지연시간은 최근 baseline_windows 번 평가한 중앙 지연시간의 최솟값입니다 (고정 최솟값을 쓰면 한 번 빨랐던
+    구간이 계속 기준으로 남아, 서버 / 네트워크 지연이 전반적으로 늘어난 뒤에는 동시성을 계속 줄이게 됨).
+    """
+
+    def __init__(self, min_limit=1, max_limit=MAX_WORKERS, initial=None, window=20, error_threshold=0.1,
+                 baseline_windows=10):
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = min(self.max_limit, max(self.min_limit, initial or self.max_limit))
+        self.window = window
+        self.error_threshold = error_threshold
+        self._active = 0
+        self._latencies = []
+        self._errors = 0
+        self._throttled = 0
+        self._recent_medians = deque(maxlen=baseline_windows)
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def record(self, latency, status_code=None, error=False):
+        with self._condition:
+            self._latencies.append(latency)
+            if status_code == 429:
+                self._throttled += 1
+            elif error or (status_code is not None and status_code >= 500):
+                self._errors += 1
+
+            if len(self._latencies) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        observed = len(self._latencies)
+        median_latency = statistics.median(self._latencies)
+        error_rate = (self._errors + self._throttled) / observed
+        previous = self.limit
+
+        self._recent_medians.append(median_latency)
+        baseline_latency = min(self._recent_medians)
+
+        if self._throttled:
+            self.limit = max(self.min_limit, self.limit // 2)
+        elif error_rate > self.error_threshold or median_latency > 2 * baseline_latency:
+            self.limit = max(self.min_limit, self.limit - 1)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        if self.limit != previous:
+            logger.info(f"동시 요청 수 조정: {previous} -> {self.limit} "
+                        f"(중앙 지연 {median_latency:.2f}초, 오류율 {error_rate:.0%}, 429 {self._throttled}회)")
+
+        self._latencies = []
+        self._errors = 0
+        self._throttled = 0
+        self._condition.notify_all()
+
+
+rate_limiter = TokenBucket(API_RATE_LIMIT)
+concurrency = AdaptiveConcurrency()
+
+
+class RateLimitedSession(requests.Session):
+    """모든 요청을 전역 토큰 버킷으로 제한하고, 429/5xx 는 대기 후 재시도하는 curl_cffi 세션."""
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(API_MAX_RETRIES + 1):
+            rate_limiter.acquire()
+            started_at = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except Exception:
+                latency = time.monotonic() - started_at
+                concurrency.record(latency, error=True)
+                metrics.observe_http(latency, error=True, retry=attempt > 0)
+                if attempt == API_MAX_RETRIES:
+                    raise
+                time.sleep(API_RETRY_DELAY * (attempt + 1))
+                continue
+
+            latency = time.monotonic() - started_at
+            concurrency.record(latency, response.status_code)
+            metrics.observe_http(latency, response.status_code, len(response.content), retry=attempt > 0)
+
+            if response.status_code == 429:
+                logger.warning(f"요청 제한(429) 응답, {API_RETRY_DELAY * (attempt + 1):.0f}초 대기: {url}")
+                rate_limiter.pause(API_RETRY_DELAY * (attempt + 1))
+            elif response.status_code >= 500:
+                time.sleep(API_RETRY_DELAY * (attempt + 1))
+            else:
+                return response
+
+            if attempt == API_MAX_RETRIES:
+                return response
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """프로세스 전체에서 공유하는 HTTP 세션을 반환합니다.
+
+    yfinance 는 내부적으로 세션을 싱글톤으로 보관하므로 호출마다 새 세션을 만들지 않고
+    하나를 재사용합니다. curl_cffi 세션은 스레드별 curl 핸들을 사용하므로 각 워커
+    스레드의 연결과 TLS 상태가 재사용됩니다.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # curl_cffi를 사용하여 브라우저 TLS 환경 모방
+            _session = RateLimitedSession(impersonate="chrome")
+            _session.headers.update(BROWSER_HEADERS)
+        return _session
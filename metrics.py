@@ -0,0 +1,320 @@
+# metrics.py - 실행 단계별 계측 (소요 시간, 행 수, HTTP 요청, DB 시간) 및 JSON / Prometheus 보고서
+#
+# 프로세스 전역 metrics 객체에 기록합니다.
+#   - metrics.stage(name)            : 순차 단계의 경과 시간 (run_update 의 종목 저장 / 가격 수집 / 지수 / 통계 등)
+#   - metrics.timer(name, symbol)    : 파이프라인 스레드의 작업 단위 시간 (종목별 수집 / 묶음 저장 / 지표 계산)
+#   - metrics.add(name, key, value)  : 단계별 카운터 (rows_fetched, rows_written ...)
+#   - metrics.observe_http(...)      : HTTP 요청 수 / 응답 바이트 / 지연시간 히스토그램 / 재시도
+# DB 시간은 install_db_timing() 이 교체한 psycopg2 커서가 execute / COPY 시간을 측정하여
+# 현재 스레드가 실행 중인 단계에 더합니다. python_seconds 는 단계 시간에서 DB 시간을 뺀 값입니다.
+# 멀티 프로세스 지표 재계산(--workers)의 자식 프로세스 DB 시간은 포함되지 않습니다.
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import psycopg2.extensions
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 실행 보고서 경로 (비어 있으면 저장하지 않음)
+RUN_REPORT_PATH = os.getenv('RUN_REPORT_PATH', '')
+# node-exporter textfile collector 가 읽는 .prom 파일 경로 (비어 있으면 저장하지 않음)
+PROMETHEUS_TEXTFILE = os.getenv('PROMETHEUS_TEXTFILE', '')
+
+# HTTP 지연시간 히스토그램 구간 (초)
+HTTP_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 보고서에 포함할 느린 종목 수
+SLOWEST_SYMBOLS = 20
+
+
+def _new_stage():
+    return {
+        'wall_seconds': 0.0,
+        'busy_seconds': 0.0,
+        'calls': 0,
+        'db_seconds': 0.0,
+        'sql_statements': 0,
+        'rows_fetched': 0,
+        'rows_written': 0,
+    }
+
+
+class RunMetrics:
+    """한 번의 실행에 대한 단계별 / 종목별 / HTTP 계측값 (스레드 안전)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self, task=None):
+        with self._lock:
+            self.task = task
+            self.started_at = time.time()
+            self.finished_at = None
+            self.success = None
+            self.stages = {}
+            self.symbols = {}
+            self.sql_statements = 0
+            self.http = {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'bytes': 0,
+                'latency_sum': 0.0,
+                'status': {},
+                'buckets': [0] * (len(HTTP_LATENCY_BUCKETS) + 1),
+            }
+
+    # ---- 단계 ----
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _new_stage()
+        return stage
+
+    def current_stage(self):
+        return getattr(self._local, 'stage', None)
+
+    @contextmanager
+    def _in_stage(self, name):
+        previous = self.current_stage()
+        self._local.stage = name
+        try:
+            yield
+        finally:
+            self._local.stage = previous
+
+    @contextmanager
+    def stage(self, name):
+        """순차 실행 단계의 경과 시간을 기록합니다."""
+        started_at = time.perf_counter()
+        try:
+            with self._in_stage(name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                self._stage(name)['wall_seconds'] += elapsed
+
+    @contextmanager
+    def timer(self, name, symbol=None):
+        """동시에 실행되는 작업 단위 시간을 단계(및 종목)별로 누적합니다."""
+        started_at = time.perf_counter()
+        try:
+            with self._in_stage(name):
+                yield
+        finally:
+            self.record(name, time.perf_counter() - started_at, symbol)
+
+    def record(self, name, seconds, symbol=None):
+        """이미 측정한 작업 시간을 단계(및 종목)별로 누적합니다 (asyncio 코루틴 등)."""
+        with self._lock:
+            stage = self._stage(name)
+            stage['busy_seconds'] += seconds
+            stage['calls'] += 1
+            if symbol is not None:
+                timings = self.symbols.setdefault(symbol, {})
+                timings[name] = timings.get(name, 0.0) + seconds
+
+    def add(self, name, key, value=1):
+        with self._lock:
+            self._stage(name)[key] += value
+
+    def add_current(self, key, value=1):
+        """현재 스레드가 실행 중인 단계의 카운터를 늘립니다."""
+        self.add(self.current_stage() or 'other', key, value)
+
+    # ---- DB / HTTP ----
+
+    def observe_db(self, seconds):
+        name = self.current_stage() or 'other'
+        with self._lock:
+            stage = self._stage(name)
+            stage['db_seconds'] += seconds
+            stage['sql_statements'] += 1
+            self.sql_statements += 1
+
+    def observe_http(self, latency, status_code=None, nbytes=0, error=False, retry=False):
+        with self._lock:
+            http = self.http
+            http['requests'] += 1
+            http['bytes'] += nbytes
+            http['latency_sum'] += latency
+            if error:
+                http['errors'] += 1
+            if retry:
+                http['retries'] += 1
+            status = str(status_code) if status_code is not None else 'error'
+            http['status'][status] = http['status'].get(status, 0) + 1
+
+            for i, bound in enumerate(HTTP_LATENCY_BUCKETS):
+                if latency <= bound:
+                    http['buckets'][i] += 1
+                    break
+            else:
+                http['buckets'][-1] += 1
+
+    # ---- 보고서 ----
+
+    def finish(self, success=True):
+        self.finished_at = time.time()
+        self.success = success
+
+    def report(self):
+        with self._lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                stage = dict(stage)
+                elapsed = stage['wall_seconds'] or stage['busy_seconds']
+                stage['python_seconds'] = max(0.0, elapsed - stage['db_seconds'])
+                stages[name] = {key: round(value, 4) if isinstance(value, float) else value
+                                for key, value in stage.items()}
+
+            slowest = sorted(self.symbols.items(), key=lambda item: sum(item[1].values()), reverse=True)
+            http = dict(self.http)
+            http['latency_buckets'] = {
+                **{str(bound): count for bound, count in zip(HTTP_LATENCY_BUCKETS, http.pop('buckets'))},
+                '+Inf': self.http['buckets'][-1]
+            }
+
+            finished_at = self.finished_at or time.time()
+            return {
+                'task': self.task,
+                'host': socket.gethostname(),
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+                'duration_seconds': round(finished_at - self.started_at, 3),
+                'success': self.success,
+                'sql_statements': self.sql_statements,
+                'stages': stages,
+                'http': http,
+                'slowest_symbols': [
+                    {'symbol': symbol, **{name: round(seconds, 4) for name, seconds in timings.items()}}
+                    for symbol, timings in slowest[:SLOWEST_SYMBOLS]
+                ],
+                'symbols': {
+                    symbol: {name: round(seconds, 4) for name, seconds in timings.items()}
+                    for symbol, timings in self.symbols.items()
+                },
+            }
+
+    def write_json(self, path):
+        _atomic_write(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+        logger.info(f"실행 보고서 저장: {path}")
+
+    def write_prometheus(self, path):
+        _atomic_write(path, format_prometheus(self.report()))
+        logger.info(f"Prometheus 지표 저장: {path}")
+
+
+def _atomic_write(path, content):
+    # textfile collector 가 쓰는 중인 파일을 읽지 않도록 임시 파일에 쓰고 교체
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def format_prometheus(report):
+    """실행 보고서를 Prometheus text exposition 형식으로 변환합니다 (종목별 값은 제외)."""
+    task = report['task'] or 'unknown'
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP findb_{name} {help_text}")
+        lines.append(f"# TYPE findb_{name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{val}"' for key, val in {'task': task, **labels}.items())
+            lines.append(f"findb_{name}{{{label_text}}} {value}")
+
+    finished_at = datetime.fromisoformat(report['finished_at']).timestamp()
+    metric('run_duration_seconds', 'gauge', 'Total run duration.', [({}, report['duration_seconds'])])
+    metric('run_success', 'gauge', '1 if the last run finished without error.', [({}, int(bool(report['success'])))])
+    metric('run_last_finished_timestamp_seconds', 'gauge', 'Unix time the last run finished.', [({}, finished_at)])
+    metric('run_sql_statements', 'gauge', 'SQL statements executed by the run.', [({}, report['sql_statements'])])
+
+    stage_metrics = [
+        ('stage_wall_seconds', 'wall_seconds', 'Wall time of sequential stages.'),
+        ('stage_busy_seconds', 'busy_seconds', 'Summed work time of concurrent stage tasks.'),
+        ('stage_db_seconds', 'db_seconds', 'Time spent in database calls per stage.'),
+        ('stage_python_seconds', 'python_seconds', 'Stage time not spent in database calls.'),
+        ('stage_sql_statements', 'sql_statements', 'SQL statements executed per stage.'),
+        ('stage_rows_fetched', 'rows_fetched', 'Rows fetched from the data source per stage.'),
+        ('stage_rows_written', 'rows_written', 'Rows written to the database per stage.'),
+    ]
+    for name, key, help_text in stage_metrics:
+        metric(name, 'gauge', help_text,
+               [({'stage': stage}, values[key]) for stage, values in report['stages'].items()])
+
+    http = report['http']
+    metric('http_requests', 'gauge', 'HTTP requests by status code.',
+           [({'status': status}, count) for status, count in sorted(http['status'].items())])
+    metric('http_retries', 'gauge', 'HTTP requests that were retried.', [({}, http['retries'])])
+    metric('http_response_bytes', 'gauge', 'HTTP response body bytes received.', [({}, http['bytes'])])
+
+    lines.append("# HELP findb_http_request_duration_seconds HTTP request latency.")
+    lines.append("# TYPE findb_http_request_duration_seconds histogram")
+    cumulative = 0
+    for bound, count in http['latency_buckets'].items():
+        cumulative += count
+        lines.append(f'findb_http_request_duration_seconds_bucket{{task="{task}",le="{bound}"}} {cumulative}')
+    lines.append(f'findb_http_request_duration_seconds_sum{{task="{task}"}} {round(http["latency_sum"], 4)}')
+    lines.append(f'findb_http_request_duration_seconds_count{{task="{task}"}} {http["requests"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """execute / executemany / COPY 시간을 metrics 에 기록하는 psycopg2 커서."""
+
+    def execute(self, query, vars=None):
+        started_at = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.observe_db(time.perf_counter() - started_at)
+
+    def executemany(self, query, vars_list):
+        started_at = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.observe_db(time.perf_counter() - started_at)
+
+    def copy_expert(self, sql, file, size=8192):
+        started_at = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            metrics.observe_db(time.perf_counter() - started_at)
+
+
+_db_timing_engines = set()
+
+
+def install_db_timing(engine):
+    """engine 의 커넥션이 TimedCursor 를 기본 커서로 사용하도록 합니다 (기존 풀 커넥션은 폐기)."""
+    if id(engine) in _db_timing_engines:
+        return
+    _db_timing_engines.add(id(engine))
+
+    @event.listens_for(engine, 'connect')
+    def _use_timed_cursor(dbapi_connection, connection_record):
+        dbapi_connection.cursor_factory = TimedCursor
+
+    engine.dispose()
+
+
+metrics = RunMetrics()
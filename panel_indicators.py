@@ -0,0 +1,374 @@
+# panel_indicators.py - 전종목 패널(날짜 x 종목) 기반 기술적 지표 계산 엔진
+#
+# 전체 재구축/백필용. daily_prices 를 한 번의 쿼리로 읽어 2차원 NumPy 배열로 만들고,
+# calculate_and_save_technical_indicators 와 같은 지표를 종목(열) 방향 벡터 연산으로 계산합니다.
+#
+# 거래정지/신규상장 등으로 빠진 봉은 mask 로 표시합니다. 계산 시에는 종목별 유효 봉을 위로 모은
+# (compact) 배열을 사용하므로 종목별 pandas 계산과 같은 봉 순서로 계산됩니다.
+# 결과는 종목별 계산과 상대 오차 1e-6 이내로 일치합니다 (누적합 기반 이동평균/표준편차의 부동소수점 차이).
+#
+# 전체 재구축은 서버 측 커서로 종목 순서대로 읽어 STREAM_MEMORY_MB 예산에 맞는 종목 묶음 단위로
+# 계산/저장하므로 메모리 사용량이 daily_prices 크기에 비례해 늘지 않습니다 (iter_price_panels).
+
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from models import engine
+from bulk_writer import copy_upsert, BULK_BATCH_SIZE
+from data_importer import INDICATOR_FLOAT_COLUMNS, INDICATOR_BOOL_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# 전체 재구축 시 한 번에 계산할 종목 묶음의 메모리 예산 (MB, 0 이면 전체 패널을 한 번에 로드)
+STREAM_MEMORY_MB = int(os.getenv('STREAM_MEMORY_MB', '1024'))
+# 서버 측 커서에서 한 번에 가져올 행 수
+STREAM_FETCH_ROWS = int(os.getenv('STREAM_FETCH_ROWS', '50000'))
+# 패널 한 칸(날짜 x 종목)당 최대 메모리 사용량 (바이트, 가격 패널 + compact 배열 + 지표 배열 + 적재용 DataFrame 실측 기준)
+PANEL_BYTES_PER_CELL = 600
+
+
+class PricePanel:
+    """날짜 x 종목 가격 패널. 값이 없는 칸은 NaN 이고 mask 가 False 입니다."""
+
+    def __init__(self, dates, stock_ids, open_, high, low, close, volume, mask):
+        self.dates = dates            # (T,) datetime64[D]
+        self.stock_ids = stock_ids    # (N,) int64
+        self.open = open_             # (T, N) float64
+        self.high = high
+        self.low = low
+        self.close = close            # adjusted_close
+        self.volume = volume
+        self.mask = mask              # (T, N) bool
+
+    @property
+    def shape(self):
+        return self.mask.shape
+
+
+_PRICE_QUERY = """
+    SELECT stock_id, date, open_price, high_price, low_price, adjusted_close, volume
+    FROM daily_prices
+"""
+_PRICE_RECORD = np.dtype([
+    ('stock_id', np.int64), ('date', 'datetime64[D]'), ('open', np.float64), ('high', np.float64),
+    ('low', np.float64), ('close', np.float64), ('volume', np.float64)
+])
+
+
+def _to_records(rows):
+    # 행 수만큼 미리 할당한 구조 배열에 바로 채움 (NULL 은 NaN)
+    return np.fromiter(rows, count=len(rows), dtype=_PRICE_RECORD)
+
+
+def _panel_from_records(records):
+    """(stock_id, date, open, high, low, close, volume) 레코드 배열로 PricePanel 을 만듭니다."""
+    if len(records) == 0:
+        empty = np.empty((0, 0))
+        return PricePanel(np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64),
+                          empty, empty, empty, empty, empty, np.empty((0, 0), dtype=bool))
+
+    dates, date_index = np.unique(records['date'], return_inverse=True)
+    ids, stock_index = np.unique(records['stock_id'], return_inverse=True)
+    shape = (len(dates), len(ids))
+
+    def to_panel(values):
+        panel = np.full(shape, np.nan)
+        panel[date_index, stock_index] = values
+        return panel
+
+    mask = np.zeros(shape, dtype=bool)
+    mask[date_index, stock_index] = True
+
+    return PricePanel(dates, ids, to_panel(records['open']), to_panel(records['high']), to_panel(records['low']),
+                      to_panel(records['close']), to_panel(records['volume']), mask)
+
+
+def load_price_panel(stock_ids=None):
+    """daily_prices 를 한 번의 쿼리로 읽어 PricePanel 을 만듭니다."""
+    sql = _PRICE_QUERY
+    params = None
+    if stock_ids is not None:
+        sql += " WHERE stock_id = ANY(%s)"
+        params = (list(stock_ids),)
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+    return _panel_from_records(_to_records(rows))
+
+
+def iter_price_panels(stock_ids=None, memory_mb=None):
+    """daily_prices 를 서버 측 커서로 종목 순서대로 읽어, 메모리 예산에 맞는 종목 묶음별 PricePanel 을 차례로 반환합니다.
+
+    묶음의 패널 칸 수(날짜 x 종목)가 memory_mb 로 계산에 쓸 수 있는 칸 수를 넘으면 직전 종목까지를 한 묶음으로 내보냅니다.
+    종목 하나의 이력은 나누지 않으므로, 종목 하나가 예산보다 크면 그 종목만으로 한 묶음이 됩니다.
+    """
+    memory_mb = STREAM_MEMORY_MB if memory_mb is None else memory_mb
+    max_cells = max(1, memory_mb * 1024 * 1024 // PANEL_BYTES_PER_CELL)
+    fetch_rows = min(STREAM_FETCH_ROWS, max_cells)
+
+    sql = _PRICE_QUERY
+    params = None
+    if stock_ids is not None:
+        sql += " WHERE stock_id = ANY(%s)"
+        params = (list(stock_ids),)
+    sql += " ORDER BY stock_id, date"
+
+    conn = engine.raw_connection()
+    try:
+        # 이름 있는 커서 = 서버 측 커서 (결과를 fetch_rows 행씩 가져옴)
+        cursor = conn.cursor(name='price_panel_stream')
+        cursor.itersize = fetch_rows
+        cursor.execute(sql, params)
+
+        pending = []          # 아직 내보내지 않은 레코드 배열
+        pending_dates = np.array([], dtype='datetime64[D]')
+        pending_stocks = 0
+        last_stock_id = None
+        while True:
+            rows = cursor.fetchmany(fetch_rows)
+            if not rows:
+                break
+            records = _to_records(rows)
+            pending.append(records)
+            pending_dates = np.union1d(pending_dates, records['date'])
+            pending_stocks += len(np.unique(records['stock_id'])) - int(records['stock_id'][0] == last_stock_id)
+            last_stock_id = records['stock_id'][-1]
+            if len(pending_dates) * pending_stocks <= max_cells:
+                continue
+
+            # 마지막 종목은 다음 배치에 이어질 수 있으므로 남겨 둠 (종목이 하나뿐이면 계속 모음)
+            records = np.concatenate(pending)
+            last_start = np.searchsorted(records['stock_id'], last_stock_id)
+            pending = [records]
+            if last_start == 0:
+                continue
+            panel = _panel_from_records(records[:last_start])
+            pending = [records[last_start:].copy()]
+            del records
+            yield panel
+            del panel
+            pending_dates = np.unique(pending[0]['date'])
+            pending_stocks = 1
+
+        if pending:
+            yield _panel_from_records(np.concatenate(pending))
+        cursor.close()
+    finally:
+        conn.close()
+
+
+# ---- 열 방향 벡터 연산 (입력은 유효 봉이 위로 모인 배열, 아래쪽은 NaN 패딩) ----
+#
+# 봉 안의 값이 NULL(NaN)인 경우(예: adjusted_close 누락)는 종목별 pandas / ta 계산과 같게 처리합니다.
+#   - 이동평균 / 표준편차: NaN 이 포함된 창만 NaN 이고, NaN 이 창을 벗어나면 다시 계산됨
+#     (NaN 을 0 으로 바꿔 누적하고, 창마다 NaN 개수를 따로 누적해 확인하므로 이후 행에 번지지 않음)
+#   - 지수이동평균: pandas ewm(adjust=False) 처럼 NaN 봉은 건너뛰고 이전 값의 가중치만 줄임
+# 입력에서 NaN 봉을 지우거나 앞 값으로 채우지 않는 것은 종목별 엔진과 결과를 맞추기 위해서입니다.
+
+def _window_sums(values, nan, window):
+    """창 크기 window 의 합 (len - window + 1 행). nan 은 NaN 위치로, NaN 이 포함된 창은 NaN."""
+    c = np.cumsum(values, axis=0)
+    sums = c[window - 1:].copy()
+    sums[1:] -= c[:-window]
+    n = np.cumsum(nan, axis=0, dtype=np.int64)
+    counts = n[window - 1:].copy()
+    counts[1:] -= n[:-window]
+    sums[counts > 0] = np.nan
+    return sums
+
+
+def _centered(x):
+    # 누적합 오차를 줄이기 위해 종목별 첫 유효 값을 빼고 계산 (NaN 은 0 으로 누적하고 위치를 따로 반환)
+    nan = np.isnan(x)
+    first = np.argmax(~nan, axis=0)
+    base = np.nan_to_num(np.take_along_axis(x, np.expand_dims(first, 0), axis=0)[0])
+    return np.where(nan, 0.0, x - base), nan, base
+
+
+def _rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    d, nan, base = _centered(x)
+    out[window - 1:] = _window_sums(d, nan, window) / window + base
+    return out
+
+
+def _rolling_std(x, window):
+    """모표준편차 (ddof=0, ta BollingerBands 와 동일)."""
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    d, nan, _ = _centered(x)
+    mean = _window_sums(d, nan, window) / window
+    out[window - 1:] = np.sqrt(np.maximum(_window_sums(d * d, nan, window) / window - mean * mean, 0.0))
+    return out
+
+
+def _ewm(x, alpha, min_periods):
+    """pandas ewm(adjust=False, ignore_na=False) 와 같은 지수이동평균.
+
+    첫 유효 값부터 시작하며, NaN 봉은 건너뛰고 (이전 값의 가중치만 1 - alpha 배로 줄임)
+    유효 값이 min_periods 개가 되기 전까지는 NaN 입니다.
+    """
+    out = np.full_like(x, np.nan)
+    if len(x) == 0:
+        return out
+    y = x[0].copy()
+    weight = np.ones_like(y)
+    observations = (~np.isnan(y)).astype(np.int64)
+    out[0] = np.where(observations >= min_periods, y, np.nan)
+    for t in range(1, len(x)):
+        value = x[t]
+        observed = ~np.isnan(value)
+        started = ~np.isnan(y)
+        observations += observed
+        weight = np.where(started, weight * (1 - alpha), weight)
+        update = started & observed
+        mixed = (weight * y + alpha * value) / (weight + alpha)
+        y = np.where(update, mixed, np.where(started, y, value))
+        weight = np.where(update, 1.0, weight)
+        out[t] = np.where(observations >= min_periods, y, np.nan)
+    return out
+
+
+def _shift(x, periods=1):
+    out = np.full_like(x, np.nan)
+    out[periods:] = x[:-periods]
+    return out
+
+
+def compute_panel_indicators(open_, high, low, close, volume):
+    """compact 배열(행: 종목별 봉 순서, 열: 종목)에 대해 모든 기술적 지표를 계산합니다."""
+    result = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 이동평균선
+        for window in (5, 10, 20, 60, 120):
+            result[f'ma{window}'] = _rolling_mean(close, window)
+
+        # 볼린저 밴드
+        middle = result['ma20']
+        std = _rolling_std(close, 20)
+        result['bb_upper'] = middle + 2 * std
+        result['bb_middle'] = middle
+        result['bb_lower'] = middle - 2 * std
+        result['bb_width'] = (result['bb_upper'] - result['bb_lower']) / middle
+
+        # RSI (alpha = 1/14)
+        diff = np.full_like(close, np.nan)
+        diff[1:] = close[1:] - close[:-1]
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+        ema_up = _ewm(up, 1 / 14, 14)
+        ema_down = _ewm(down, 1 / 14, 14)
+        result['rsi'] = np.where(ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down)))
+
+        # MACD (12, 26, 9)
+        ema_fast = _ewm(close, 2 / (12 + 1), 12)
+        ema_slow = _ewm(close, 2 / (26 + 1), 26)
+        macd = ema_fast - ema_slow
+        signal = _ewm(macd, 2 / (9 + 1), 9)   # MACD 가 NaN 인 앞 25개 봉은 건너뜀
+        result['macd'] = macd
+        result['macd_signal'] = signal
+        result['macd_hist'] = macd - signal
+
+        # 볼륨 관련
+        result['volume_ma20'] = _rolling_mean(volume, 20)
+        result['volume_ratio'] = volume / result['volume_ma20'] * 100
+
+        # 캔들 패턴
+        body = np.abs(close - open_)
+        shadow_upper = high - np.fmax(open_, close)
+        shadow_lower = np.fmin(open_, close) - low
+        result['is_doji'] = body / (high - low + 0.001) < 0.1
+        result['is_hammer'] = (shadow_lower > 2 * body) & (shadow_upper < body) & (body > 0)
+
+        # 시그널
+        ma5_prev = _shift(result['ma5'])
+        ma20_prev = _shift(result['ma20'])
+        result['golden_cross'] = (result['ma5'] > result['ma20']) & (ma5_prev <= ma20_prev)
+        result['death_cross'] = (result['ma5'] < result['ma20']) & (ma5_prev >= ma20_prev)
+
+        # 볼린저 밴드 터치
+        result['bb_upper_touch'] = high >= result['bb_upper']
+        result['bb_lower_touch'] = low <= result['bb_lower']
+
+    for column in INDICATOR_FLOAT_COLUMNS:
+        result[column] = np.nan_to_num(result[column], nan=0.0, posinf=np.inf, neginf=-np.inf)
+    return result
+
+
+def _compact(panel_values, order):
+    return np.take_along_axis(panel_values, order, axis=0)
+
+
+def compute_indicator_frame(panel, since=None):
+    """PricePanel 의 모든 종목 지표를 계산하여 technical_indicators 적재용 long 형식 DataFrame 으로 반환합니다."""
+    if panel.mask.size == 0:
+        return pd.DataFrame()
+
+    # 종목별 유효 봉을 위로 모음 (안정 정렬이므로 날짜 순서 유지)
+    order = np.argsort(~panel.mask, axis=0, kind='stable')
+    valid = _compact(panel.mask, order)
+    dates = _compact(np.broadcast_to(panel.dates[:, None], panel.shape), order)
+
+    indicators = compute_panel_indicators(
+        _compact(panel.open, order),
+        _compact(panel.high, order),
+        _compact(panel.low, order),
+        _compact(panel.close, order),
+        _compact(panel.volume, order)
+    )
+
+    if since is not None:
+        valid = valid & (dates >= np.datetime64(since, 'D'))
+
+    frame = {
+        'stock_id': np.broadcast_to(panel.stock_ids[None, :], panel.shape)[valid],
+        'date': dates[valid],
+    }
+    for column in INDICATOR_FLOAT_COLUMNS + INDICATOR_BOOL_COLUMNS:
+        frame[column] = indicators[column][valid]
+    return pd.DataFrame(frame)
+
+
+def rebuild_technical_indicators_panel(stock_ids=None, since=None, batch_size=None, memory_mb=None):
+    """패널 엔진으로 기술적 지표를 재계산하여 저장합니다 (전체 재구축 / 백필용).
+
+    stock_ids 로 대상 종목을, since 로 저장할 시작 날짜를 제한할 수 있습니다 (계산은 전체 이력 사용).
+    memory_mb(기본값 STREAM_MEMORY_MB) 예산에 맞는 종목 묶음 단위로 읽기 / 계산 / 저장을 반복하므로
+    메모리 사용량이 테이블 크기와 무관하게 일정합니다. 0 이면 전체 패널을 한 번에 로드합니다.
+    """
+    memory_mb = STREAM_MEMORY_MB if memory_mb is None else memory_mb
+    started_at = time.time()
+    if memory_mb > 0:
+        panels = iter_price_panels(stock_ids, memory_mb=memory_mb)
+    else:
+        panels = iter([load_price_panel(stock_ids)])
+
+    stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    groups = 0
+    for panel in panels:
+        group_started_at = time.time()
+        frame = compute_indicator_frame(panel, since=since)
+        group_stats = copy_upsert('technical_indicators', frame, ['stock_id', 'date'],
+                                  batch_size=batch_size or BULK_BATCH_SIZE)
+        for key, value in group_stats.items():
+            stats[key] += value
+        groups += 1
+        logger.info(f"패널 기술적 지표 묶음 {groups} 완료: {panel.shape[0]}일 x {panel.shape[1]}종목, "
+                    f"{len(frame)}행 ({time.time() - group_started_at:.1f}초)")
+        del panel, frame
+
+    logger.info(f"패널 기술적 지표 저장 완료 ({groups}개 묶음, {time.time() - started_at:.1f}초) - "
+                f"추가: {stats['inserted']}, 갱신: {stats['updated']}, 변경없음: {stats['skipped']}")
+    return stats
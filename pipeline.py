@@ -0,0 +1,263 @@
+# pipeline.py - 수집 / 저장 / 지표 계산 단계 분리 파이프라인
+#
+#   fetch 스레드 --(price_queue)--> writer 스레드 --(indicator_queue)--> indicator 스레드
+#
+# 각 단계는 자체 동시성 설정을 가지며, 큐 크기 제한으로 느린 단계가 앞 단계를 멈추게 합니다 (backpressure).
+# writer 는 여러 종목의 프레임을 모아 한 번의 COPY upsert 로 저장합니다.
+
+import os
+import time
+import queue
+import logging
+import threading
+import pandas as pd
+from tqdm import tqdm
+from bulk_writer import copy_upsert, BULK_BATCH_SIZE
+from http_client import concurrency, MAX_WORKERS
+from metrics import metrics
+from data_importer import (
+    PRICE_COLUMNS,
+    DOWNLOAD_CHUNK_SIZE,
+    fetch_stock_price,
+    fetch_stock_prices_batch,
+    calculate_and_save_technical_indicators,
+    _group_jobs_by_range
+)
+
+logger = logging.getLogger(__name__)
+
+# 단계별 동시성 / 큐 설정
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', str(MAX_WORKERS)))
+WRITE_WORKERS = int(os.getenv('WRITE_WORKERS', '2'))
+INDICATOR_WORKERS = int(os.getenv('INDICATOR_WORKERS', '4'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '200'))
+# writer 가 한 번에 모아서 저장할 최소 행 수와, 그만큼 모이지 않았을 때 기다리는 최대 시간(초)
+WRITE_COALESCE_ROWS = int(os.getenv('WRITE_COALESCE_ROWS', str(BULK_BATCH_SIZE)))
+WRITE_FLUSH_INTERVAL = float(os.getenv('WRITE_FLUSH_INTERVAL', '1.0'))
+
+_STOP = object()
+
+
+class IngestPipeline:
+    """가격 프레임을 받아 묶음 저장 후 기술적 지표를 계산하는 단계별 파이프라인."""
+
+    def __init__(self, incremental=False, batch_size=None, write_workers=None,
+                 indicator_workers=None, queue_size=None, total=None, on_result=None, watermarks=None):
+        self.incremental = incremental
+        # 종목별 마지막 저장 날짜 {stock_id: date}. 이 날짜 이하의 행은 저장하지 않음
+        # (변동값 계산을 위해 마지막 날짜부터 받아온 뒤 잘라냄)
+        self.watermarks = watermarks or {}
+        # 종목별 최종 결과 콜백 on_result(stock_id, status), status: done / empty / failed
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.write_workers = write_workers or WRITE_WORKERS
+        self.indicator_workers = indicator_workers or INDICATOR_WORKERS
+        queue_size = queue_size or PIPELINE_QUEUE_SIZE
+
+        self.price_queue = queue.Queue(maxsize=queue_size)
+        self.indicator_queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._progress = tqdm(total=total, desc="종목 데이터 처리")
+        self.stats = {
+            'fetched': 0,
+            'empty': 0,
+            'fetch_failures': 0,
+            'up_to_date': 0,
+            'rows_written': 0,
+            'write_batches': 0,
+            'write_failures': 0,
+            'indicators_ok': 0,
+            'indicator_failures': 0,
+        }
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _result(self, stock_id, status):
+        if self.on_result is not None:
+            self.on_result(stock_id, status)
+
+    # ---- 단계 시작 / 종료 ----
+
+    def start(self):
+        self._started_at = time.time()
+        self._writers = [
+            threading.Thread(target=self._writer_loop, name=f"writer-{i}", daemon=True)
+            for i in range(self.write_workers)
+        ]
+        self._indicators = [
+            threading.Thread(target=self._indicator_loop, name=f"indicator-{i}", daemon=True)
+            for i in range(self.indicator_workers)
+        ]
+        for thread in self._writers + self._indicators:
+            thread.start()
+        return self
+
+    def put(self, stock_id, symbol, name, frame):
+        """가져온 가격 프레임을 저장 단계로 넘깁니다 (큐가 가득 차면 대기). frame 이 None 이면 수집 실패입니다."""
+        if frame is None:
+            self._count('fetch_failures')
+            self._result(stock_id, 'failed')
+            self._progress.update(1)
+            return
+        watermark = self.watermarks.get(stock_id)
+        if watermark is not None and not frame.empty:
+            frame = frame[frame['date'] > watermark]
+            if frame.empty:
+                self._count('up_to_date')
+                self._result(stock_id, 'done')
+                self._progress.update(1)
+                return
+        if frame.empty:
+            logger.warning(f"가격 데이터 없음: {name} ({symbol})")
+            self._count('empty')
+            self._result(stock_id, 'empty')
+            self._progress.update(1)
+            return
+        self._count('fetched')
+        metrics.add('fetch', 'rows_fetched', len(frame))
+        self.price_queue.put((stock_id, symbol, name, frame))
+
+    def close(self):
+        """남은 데이터를 모두 저장/계산하고 단계별 통계를 반환합니다."""
+        for _ in self._writers:
+            self.price_queue.put(_STOP)
+        for thread in self._writers:
+            thread.join()
+        for _ in self._indicators:
+            self.indicator_queue.put(_STOP)
+        for thread in self._indicators:
+            thread.join()
+        self._progress.close()
+
+        elapsed = time.time() - self._started_at
+        self.stats['elapsed'] = elapsed
+        logger.info(
+            f"파이프라인 완료 - 수집: {self.stats['fetched']}, 데이터 없음: {self.stats['empty']}, "
+            f"수집 실패: {self.stats['fetch_failures']}, 새 데이터 없음: {self.stats['up_to_date']}, "
+            f"저장 실패: {self.stats['write_failures']}, 지표 실패: {self.stats['indicator_failures']}"
+        )
+        logger.info(
+            f"가격 데이터 {self.stats['rows_written']}행 저장 ({self.stats['write_batches']}회 묶음 저장, "
+            f"{elapsed:.1f}초, {self.stats['rows_written'] / max(elapsed, 1e-9):.0f}행/초)"
+        )
+        return self.stats
+
+    # ---- fetch 단계 ----
+
+    def fetch(self, jobs, chunk_size=None, fetch_workers=None, source=None):
+        """jobs: [(stock_id, symbol, name, start_date, end_date), ...] 를 source 에서 가져와 저장 단계로 넘깁니다."""
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+
+        if chunk_size > 1:
+            # yf.download 는 전역 상태를 사용하므로 묶음 다운로드는 순차로 (묶음 내부는 현재 동시성 한도만큼 yfinance 스레드 사용,
+            # 묶음마다 YFinanceSource 가 concurrency 슬롯을 잡고 받음)
+            for chunk in _group_jobs_by_range(jobs, chunk_size):
+                chunk_start, chunk_end = chunk[0][3], chunk[0][4]
+                with metrics.timer('fetch'):
+                    frames = fetch_stock_prices_batch(
+                        [(stock_id, symbol) for stock_id, symbol, _, _, _ in chunk],
+                        chunk_start, chunk_end, threads=concurrency.limit, source=source
+                    )
+                for stock_id, symbol, name, _, _ in chunk:
+                    self.put(stock_id, symbol, name, frames[stock_id])
+            return
+
+        job_queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+
+        def fetch_loop():
+            while True:
+                try:
+                    stock_id, symbol, name, start_date, end_date = job_queue.get_nowait()
+                except queue.Empty:
+                    return
+                with metrics.timer('fetch', symbol):
+                    frame = fetch_stock_price(stock_id, symbol, start_date, end_date, source)
+                self.put(stock_id, symbol, name, frame)
+
+        fetchers = [
+            threading.Thread(target=fetch_loop, name=f"fetch-{i}", daemon=True)
+            for i in range(fetch_workers or FETCH_WORKERS)
+        ]
+        for thread in fetchers:
+            thread.start()
+        for thread in fetchers:
+            thread.join()
+
+    # ---- write 단계 ----
+
+    def _writer_loop(self):
+        pending = []
+        pending_rows = 0
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self.price_queue.get(timeout=WRITE_FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                pending.append(item)
+                pending_rows += len(item[3])
+
+            # 충분히 모였거나, 더 들어오는 데이터가 없거나, 종료 시 묶음 저장
+            if pending and (pending_rows >= WRITE_COALESCE_ROWS or item is None or stopping):
+                self._flush(pending)
+                pending = []
+                pending_rows = 0
+
+    def _flush(self, pending):
+        try:
+            with metrics.timer('write'):
+                frames = [frame.assign(stock_id=stock_id)[PRICE_COLUMNS] for stock_id, _, _, frame in pending]
+                result = copy_upsert('daily_prices', pd.concat(frames, ignore_index=True),
+                                     ['stock_id', 'date'], batch_size=self.batch_size)
+            metrics.add('write', 'rows_written', result['inserted'] + result['updated'])
+        except Exception as e:
+            logger.error(f"가격 데이터 묶음 저장 오류 ({len(pending)}개 종목): {e}")
+            self._count('write_failures', len(pending))
+            for stock_id, _, _, _ in pending:
+                self._result(stock_id, 'failed')
+            self._progress.update(len(pending))
+            return
+
+        self._count('rows_written', sum(len(frame) for _, _, _, frame in pending))
+        self._count('write_batches')
+
+        for stock_id, symbol, name, frame in pending:
+            since = frame['date'].min() if self.incremental else None
+            self.indicator_queue.put((stock_id, symbol, name, since))
+
+    # ---- indicator 단계 ----
+
+    def _indicator_loop(self):
+        while True:
+            item = self.indicator_queue.get()
+            if item is _STOP:
+                return
+
+            stock_id, symbol, name, since = item
+            try:
+                with metrics.timer('indicators', symbol):
+                    result = calculate_and_save_technical_indicators(stock_id, batch_size=self.batch_size, since=since)
+                if result:
+                    metrics.add('indicators', 'rows_written', result['inserted'] + result['updated'])
+            except Exception as e:
+                logger.error(f"기술적 지표 계산 오류: {name} ({symbol}): {e}")
+                result = False
+
+            if result:
+                self._count('indicators_ok')
+                self._result(stock_id, 'done')
+            else:
+                logger.warning(f"기술적 지표 계산 실패: {name} ({symbol})")
+                self._count('indicator_failures')
+                self._result(stock_id, 'failed')
+            self._progress.update(1)
@@ -0,0 +1,249 @@
+# queries.py - 가격 / 기술적 지표 조회 API (ORM 객체 없이 COPY 로 읽어 컬럼 배열 / DataFrame / Arrow 로 반환)
+#
+#   from queries import get_prices, get_indicators
+#
+#   df = get_prices(['005930.KS', '000660.KS'], '2024-01-01', '2024-12-31', fields=['close_price', 'volume'])
+#   close = df['close_price'].unstack('symbol')          # 날짜 x 종목 패널
+#   arrays = get_indicators(None, '2024-06-01', fields=['rsi'], output='numpy')   # 전 종목
+#
+# 기간은 start 이상, end 이하(포함)이며 None 이면 제한하지 않습니다. symbols 가 None 이면 전 종목입니다.
+# output: 'pandas' -> (symbol, date) MultiIndex DataFrame
+#         'numpy'  -> {'symbol': ndarray, 'date': ndarray, field: ndarray, ...}
+#         'arrow'  -> pyarrow.Table (pyarrow 필요)
+#
+# 결과는 프로세스 내 LRU 캐시(QUERY_CACHE_SIZE 개)에 보관합니다. copy_upsert 가 행을 추가/변경하면
+# 커밋 시 NOTIFY 를 보내므로(bulk_writer.INGEST_CHANNEL), 다른 프로세스의 수집도 다음 조회 때 해당 테이블 캐시를 비웁니다.
+
+import io
+import os
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+from models import engine, Base
+from bulk_writer import INGEST_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# 캐시에 보관할 조회 결과 수 (0 이면 캐시 사용 안 함)
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '128'))
+
+OUTPUTS = ('pandas', 'numpy', 'arrow')
+_EXCLUDED_COLUMNS = ('stock_id', 'date', 'created_at', 'updated_at')
+
+
+def _fields(table_name):
+    return [column.name for column in Base.metadata.tables[table_name].columns
+            if column.name not in _EXCLUDED_COLUMNS]
+
+
+PRICE_FIELDS = _fields('daily_prices')
+INDICATOR_FIELDS = _fields('technical_indicators')
+
+
+class QueryCache:
+    """테이블별 무효화를 지원하는 LRU 캐시 (스레드 안전).
+
+    수집 알림을 받는 전용 커넥션(LISTEN)을 조회 때마다 확인하며, 알림 커넥션을 만들 수 없거나 끊기면
+    최신 데이터가 반영되었는지 알 수 없으므로 캐시를 비우고 사용하지 않습니다.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._disabled = maxsize <= 0
+
+    def _listen(self):
+        # 풀에서 분리한 전용 커넥션 (반납되지 않고 알림을 계속 받음)
+        connection = engine.raw_connection()
+        listener = connection.dbapi_connection
+        connection.detach()
+        listener.autocommit = True
+        cursor = listener.cursor()
+        cursor.execute(f"LISTEN {INGEST_CHANNEL}")
+        cursor.close()
+        return listener
+
+    def _poll(self):
+        # 잠금을 잡은 상태에서 호출. 받은 알림의 테이블 캐시를 비움
+        try:
+            if self._listener is None:
+                self._listener = self._listen()
+            self._listener.poll()
+        except Exception as e:
+            logger.warning(f"수집 알림 커넥션 오류, 조회 캐시를 사용하지 않습니다: {e}")
+            self._entries.clear()
+            self._disabled = True
+            return
+
+        tables = set()
+        while self._listener.notifies:
+            tables.add(self._listener.notifies.pop().payload)
+        if tables:
+            for key in [key for key in self._entries if key[0] in tables]:
+                del self._entries[key]
+            logger.debug(f"조회 캐시 무효화: {', '.join(sorted(tables))}")
+
+    def get(self, key):
+        with self._lock:
+            if self._disabled:
+                return None
+            self._poll()
+            frame = self._entries.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        with self._lock:
+            if self._disabled:
+                return
+            self._entries[key] = frame
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table_name=None):
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == table_name]:
+                del self._entries[key]
+
+
+cache = QueryCache(QUERY_CACHE_SIZE)
+
+
+def _normalize_date(value):
+    return None if value is None else pd.Timestamp(value).date()
+
+
+def column_dtypes(table_name, fields):
+    """컬럼별 pandas dtype (결측값을 허용하는 float64 / Int64 / boolean)."""
+    table = Base.metadata.tables[table_name]
+    dtypes = {}
+    for field in fields:
+        python_type = table.columns[field].type.python_type
+        dtypes[field] = 'float64' if python_type is float else 'Int64' if python_type is int else 'boolean'
+    return dtypes
+
+
+def _read_frame(table_name, symbols, start_date, end_date, fields):
+    """COPY (SELECT ...) TO STDOUT 으로 읽어 DataFrame 을 만듭니다."""
+    conditions = []
+    params = []
+    if symbols is not None:
+        conditions.append("s.symbol = ANY(%s)")
+        params.append(list(symbols))
+    if start_date is not None:
+        conditions.append("t.date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("t.date <= %s")
+        params.append(end_date)
+
+    query = f"""
+        SELECT s.symbol, t.date{''.join(f', t.{field}' for field in fields)}
+        FROM {table_name} t
+        JOIN stocks s ON s.stock_id = t.stock_id
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY s.symbol, t.date
+    """
+
+    buffer = io.StringIO()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+    buffer.seek(0)
+
+    dtypes = {'symbol': str, **column_dtypes(table_name, fields)}
+    columns = ['symbol', 'date'] + fields
+    if buffer.getvalue():
+        frame = pd.read_csv(buffer, names=columns, dtype=dtypes, parse_dates=['date'],
+                            true_values=['t'], false_values=['f'])
+    else:
+        frame = pd.DataFrame({column: pd.Series(dtype=dtypes.get(column, 'datetime64[ns]')) for column in columns})
+    return frame.set_index(['symbol', 'date'])
+
+
+def resolve_fields(table_name, fields, output):
+    """조회할 컬럼 목록 (기본값은 전체) 을 확인하여 반환합니다."""
+    allowed = PRICE_FIELDS if table_name == 'daily_prices' else INDICATOR_FIELDS
+    fields = list(fields) if fields else allowed
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"알 수 없는 컬럼: {unknown} (사용 가능: {allowed})")
+    if output not in OUTPUTS:
+        raise ValueError(f"알 수 없는 출력 형식: {output} (사용 가능: {OUTPUTS})")
+    return fields
+
+
+def _query(table_name, symbols, start_date, end_date, fields, output):
+    fields = resolve_fields(table_name, fields, output)
+
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    key = (table_name, None if symbols is None else tuple(sorted(set(symbols))),
+           _normalize_date(start_date), _normalize_date(end_date), tuple(fields))
+
+    frame = cache.get(key)
+    if frame is None:
+        frame = _read_frame(table_name, key[1], key[2], key[3], fields)
+        cache.put(key, frame)
+
+    # 캐시된 결과가 호출자 쪽에서 변경되지 않도록 복사본을 반환
+    return to_output(frame, fields, output, copy=True)
+
+
+def to_output(frame, fields, output, copy=False):
+    """(symbol, date) 인덱스 DataFrame 을 output 형식으로 변환합니다."""
+    if output == 'pandas':
+        return frame.copy() if copy else frame
+    if output == 'numpy':
+        arrays = {
+            'symbol': frame.index.get_level_values('symbol').to_numpy(),
+            'date': frame.index.get_level_values('date').to_numpy(),
+        }
+        for field in fields:
+            column = frame[field]
+            if column.dtype == 'float64':
+                arrays[field] = column.to_numpy(copy=True)
+            elif column.hasnans:
+                # 결측값이 있는 정수 / 불리언 컬럼은 float (NaN) 으로
+                arrays[field] = column.to_numpy(dtype='float64', na_value=float('nan'))
+            else:
+                arrays[field] = column.to_numpy(dtype=column.dtype.numpy_dtype)
+        return arrays
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("output='arrow' 는 pyarrow 가 필요합니다 (pip install pyarrow)")
+    return pa.Table.from_pandas(frame.reset_index(), preserve_index=False)
+
+
+def get_prices(symbols=None, start_date=None, end_date=None, fields=None, output='pandas'):
+    """종목별 일일 가격을 조회합니다. fields 기본값은 전체 가격 컬럼 (PRICE_FIELDS)."""
+    return _query('daily_prices', symbols, start_date, end_date, fields, output)
+
+
+def get_indicators(symbols=None, start_date=None, end_date=None, fields=None, output='pandas'):
+    """종목별 기술적 지표를 조회합니다. fields 기본값은 전체 지표 컬럼 (INDICATOR_FIELDS)."""
+    return _query('technical_indicators', symbols, start_date, end_date, fields, output)
@@ -0,0 +1,188 @@
+# response_cache.py - 데이터 소스 응답 디스크 캐시 (소스 / 종목 / 기간 키, TTL, 크기 제한 LRU)
+#
+# 중단된 실행을 다시 시작하거나 같은 기간을 다시 받는 경우(지표 단계 재실행, 디버깅) 네트워크 요청 없이
+# 저장된 응답을 사용합니다. DataSource.get_price_history / get_index_history / get_profile 과
+# --async 수집 엔진(async_ingest.py, Yahoo chart API 원본 응답)이 사용합니다.
+#   - 키: (소스, 종류, 종목, 시작일, 종료일) 의 SHA-256. 파일은 <RESPONSE_CACHE_DIR>/<해시 앞 2자리>/<해시>.pkl
+#   - TTL: 기간이 오늘(거래소 현지 날짜)을 포함하거나 오늘에서 끝나면 RESPONSE_CACHE_LIVE_TTL,
+#          지난 기간이면 RESPONSE_CACHE_TTL (수정주가는 배당 / 분할로 과거 값도 바뀌므로 만료시킴)
+#   - 전체 크기가 RESPONSE_CACHE_MB 를 넘으면 가장 오래 사용하지 않은 파일부터 삭제 (적중 시 파일 수정 시각 갱신)
+#   - 조회 실패(None) 응답은 저장하지 않습니다.
+
+import os
+import time
+import pickle
+import hashlib
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 응답 캐시 디렉터리
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', os.path.join('cache', 'responses'))
+# 응답 캐시 최대 크기 (MB, 0 이면 사용 안 함)
+RESPONSE_CACHE_MB = int(os.getenv('RESPONSE_CACHE_MB', '1024'))
+# 지난 기간 응답의 유효 시간 (초)
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', str(7 * 24 * 3600)))
+# 오늘을 포함하거나 오늘에서 끝나는 기간 응답의 유효 시간 (초)
+RESPONSE_CACHE_LIVE_TTL = int(os.getenv('RESPONSE_CACHE_LIVE_TTL', '900'))
+
+EXCHANGE_TIMEZONE = 'Asia/Seoul'
+
+
+def includes_today(end_date):
+    """기간(종료일 미포함)이 거래소 현지 기준 오늘을 포함하거나 오늘에서 끝나는지.
+
+    init / update 는 종료일을 오늘로 요청하므로 (오늘 봉 미포함), 종료일이 오늘이어도 아직 확정되지 않은
+    최근 구간으로 봅니다 (장 마감 전에 받은 응답에는 전일 / 당일 값이 빠지거나 바뀔 수 있음).
+    """
+    if end_date is None:
+        return False
+    today = pd.Timestamp.now(tz=EXCHANGE_TIMEZONE).date()
+    return pd.Timestamp(end_date).date() >= today
+
+
+class ResponseCache:
+    """소스 응답을 pickle 파일로 보관하는 디스크 캐시 (스레드 안전)."""
+
+    def __init__(self, directory, max_mb, ttl, live_ttl):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.ttl = ttl
+        self.live_ttl = live_ttl
+        self.enabled = max_mb > 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stored = 0
+        self.evicted = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, source, kind, name, start_date, end_date):
+        key = '|'.join(str(part) for part in (source, kind, name, start_date, end_date))
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.pkl")
+
+    def get(self, source, kind, name, start_date=None, end_date=None):
+        """저장된 응답을 반환합니다. 없거나 만료되었으면 None."""
+        if not self.enabled:
+            return None
+        path = self._path(source, kind, name, start_date, end_date)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            entry = None
+        except Exception as e:
+            logger.warning(f"응답 캐시 읽기 실패 ({path}): {e}")
+            self._remove(path)
+            entry = None
+
+        if entry is not None and entry['expires_at'] <= time.time():
+            self._remove(path)
+            with self._lock:
+                self.expired += 1
+            entry = None
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            logger.debug(f"응답 캐시 미적중: {source} {kind} {name} {start_date}~{end_date}")
+            return None
+
+        try:
+            # LRU 순서는 파일 수정 시각으로 관리
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        logger.debug(f"응답 캐시 적중: {source} {kind} {name} {start_date}~{end_date}")
+        return entry['value']
+
+    def put(self, source, kind, name, start_date, end_date, value):
+        if not self.enabled or value is None:
+            return
+        ttl = self.live_ttl if includes_today(end_date) else self.ttl
+        path = self._path(source, kind, name, start_date, end_date)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'expires_at': time.time() + ttl, 'value': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            written = os.path.getsize(path)
+        except Exception as e:
+            logger.warning(f"응답 캐시 저장 실패 ({path}): {e}")
+            self._remove(tmp_path)
+            return
+
+        with self._lock:
+            self.stored += 1
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += written - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # 잠금을 잡은 상태에서 호출. 최대 크기의 90% 가 될 때까지 오래 사용하지 않은 파일부터 삭제
+        target = self.max_bytes * 0.9
+        files = sorted(self._files(), key=lambda item: item[2])
+        size = sum(item[1] for item in files)
+        removed = 0
+        for path, file_size, _ in files:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+            removed += 1
+        self._size = size
+        self.evicted += removed
+        logger.info(f"응답 캐시 정리: {removed}개 파일 삭제 ({size / 1024 / 1024:.1f}MB)")
+
+    def log_stats(self):
+        with self._lock:
+            if not self.enabled or not (self.hits or self.misses):
+                return
+            total = self.hits + self.misses
+            logger.info(f"응답 캐시 - 적중: {self.hits}, 미적중: {self.misses} (만료 {self.expired}), "
+                        f"적중률: {self.hits / total:.1%}, 저장: {self.stored}, 정리: {self.evicted}")
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.expired = self.stored = self.evicted = 0
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_DIR, RESPONSE_CACHE_MB, RESPONSE_CACHE_TTL, RESPONSE_CACHE_LIVE_TTL)
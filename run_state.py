@@ -0,0 +1,182 @@
+# run_state.py - 장시간 작업(초기 구축)의 단계별 / 종목별 진행 상태 기록 및 재개
+#
+#   ingest_runs        : 실행 단위 (작업, 수집 기간, 상태)
+#   ingest_run_stages  : 단계별 상태 (symbols / prices / market_indices / market_stats)
+#   ingest_run_stocks  : 종목별 가격 저장 + 기술적 지표 계산 결과 (done / empty / failed)
+#
+# 재개 시 완료(done)된 단계와 종목은 건너뛰고, 실패했거나 기록이 없는 것만 다시 수행합니다.
+# 종목 결과는 모아서 한 번에 기록하므로, 중단 직전 기록되지 못한 종목은 재개 시 다시 처리됩니다.
+
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import update, func
+from sqlalchemy.dialects.postgresql import insert
+from models import Session, IngestRun, IngestRunStage, IngestRunStock
+
+logger = logging.getLogger(__name__)
+
+# 종목 결과를 모아서 기록할 건수
+STOCK_FLUSH_SIZE = 100
+
+
+class RunState:
+    """한 번의 실행에 대한 체크포인트 기록기 (스레드 안전)."""
+
+    def __init__(self, run_id, task, start_date, end_date):
+        self.run_id = run_id
+        self.task = task
+        self.start_date = start_date
+        self.end_date = end_date
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, task, start_date, end_date, resume=False):
+        """새 실행을 시작합니다. resume 이면 같은 작업의 마지막 미완료 실행을 이어서 사용합니다."""
+        session = Session()
+        try:
+            if resume:
+                run = (session.query(IngestRun)
+                       .filter(IngestRun.task == task, IngestRun.status != 'completed')
+                       .order_by(IngestRun.run_id.desc())
+                       .first())
+                if run is not None:
+                    run.status = 'running'
+                    session.commit()
+                    logger.info(f"이전 실행 재개 (run_id: {run.run_id}, 기간: {run.start_date} ~ {run.end_date})")
+                    return cls(run.run_id, task, run.start_date, run.end_date)
+                logger.info("재개할 미완료 실행이 없어 새로 시작합니다.")
+
+            run = IngestRun(task=task, start_date=start_date, end_date=end_date, status='running')
+            session.add(run)
+            session.commit()
+            logger.info(f"실행 시작 (run_id: {run.run_id})")
+            return cls(run.run_id, task, start_date, end_date)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # ---- 단계 ----
+
+    def stage_done(self, stage):
+        session = Session()
+        try:
+            status = session.query(IngestRunStage.status).filter_by(run_id=self.run_id, stage=stage).scalar()
+            return status == 'done'
+        finally:
+            session.close()
+
+    def _set_stage(self, stage, status):
+        now = datetime.now()
+        values = {'run_id': self.run_id, 'stage': stage, 'status': status}
+        if status == 'running':
+            values['started_at'] = now
+        else:
+            values['finished_at'] = now
+
+        session = Session()
+        try:
+            statement = insert(IngestRunStage).values(**values)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['run_id', 'stage'],
+                set_={key: statement.excluded[key] for key in values if key not in ('run_id', 'stage')}
+            ))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def run_stage(self, stage, func):
+        """stage 가 완료되지 않았으면 func 를 실행합니다. func 가 False 를 반환하거나 예외가 나면 실패로 기록합니다."""
+        if self.stage_done(stage):
+            logger.info(f"[재개] 완료된 단계 건너뜀: {stage}")
+            return True
+
+        self._set_stage(stage, 'running')
+        try:
+            result = func()
+        except Exception as e:
+            logger.error(f"단계 실패 ({stage}): {e}")
+            result = False
+        self._set_stage(stage, 'failed' if result is False else 'done')
+        return result is not False
+
+    # ---- 종목 ----
+
+    def completed_stocks(self):
+        session = Session()
+        try:
+            return {
+                stock_id for (stock_id,) in
+                session.query(IngestRunStock.stock_id).filter_by(run_id=self.run_id, status='done')
+            }
+        finally:
+            session.close()
+
+    def mark_stock(self, stock_id, status):
+        with self._lock:
+            self._pending[stock_id] = status
+            if len(self._pending) < STOCK_FLUSH_SIZE:
+                return
+            pending, self._pending = self._pending, {}
+        self._write_stocks(pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._write_stocks(pending)
+
+    def _write_stocks(self, pending):
+        session = Session()
+        try:
+            statement = insert(IngestRunStock).values([
+                {'run_id': self.run_id, 'stock_id': stock_id, 'status': status}
+                for stock_id, status in pending.items()
+            ])
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['run_id', 'stock_id'],
+                set_={'status': statement.excluded.status, 'updated_at': func.now()}
+            ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"종목 진행 상태 기록 오류: {e}")
+        finally:
+            session.close()
+
+    def stock_summary(self):
+        session = Session()
+        try:
+            return dict(
+                session.query(IngestRunStock.status, func.count())
+                .filter_by(run_id=self.run_id)
+                .group_by(IngestRunStock.status)
+                .all()
+            )
+        finally:
+            session.close()
+
+    # ---- 종료 ----
+
+    def finish(self, success):
+        self.flush()
+        session = Session()
+        try:
+            session.execute(
+                update(IngestRun)
+                .where(IngestRun.run_id == self.run_id)
+                .values(status='completed' if success else 'failed')
+            )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        logger.info(f"실행 {'완료' if success else '미완료 (--resume 으로 재개 가능)'} (run_id: {self.run_id})")
@@ -1,12 +1,19 @@
 # run_update.py - 데이터베이스 업데이트 실행 스크립트
 
-from models import Session, init_db
+from models import Session, init_db, engine, refresh_continuous_aggregates
 from data_importer import (
     build_initial_database, 
     update_daily_data, 
     update_full_technical_indicators,
-    update_market_stats
+    update_market_stats,
+    finish_backfill
 )
+from panel_indicators import rebuild_technical_indicators_panel
+from data_sources import get_data_source
+from archive import export_archive, mark_modified, ARCHIVE_DIR
+from response_cache import response_cache
+from metrics import metrics, install_db_timing, RUN_REPORT_PATH, PROMETHEUS_TEXTFILE
+import backfill
 import logging
 
 # 로깅 설정
@@ -14,54 +21,181 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 def run_task(task: str, **kwargs):
-    """DB 업데이트 작업을 실행합니다."""
+    """DB 업데이트 작업을 실행합니다. 실행 후 단계별 계측 보고서(JSON / Prometheus)를 저장합니다."""
+    install_db_timing(engine)
+    metrics.reset(task)
+    response_cache.reset_stats()
+    success = True
     db = Session()
     try:
         if task == "init":
             print("데이터베이스 초기화를 시작합니다...")
             init_db()  # 테이블 생성
-            build_initial_database(db, years=kwargs.get('years', 2), test_mode=kwargs.get('test_mode', False))  # 기본 2년으로 변경
-            print("초기화 완료.")
+            success = build_initial_database(db, years=kwargs.get('years', 2), test_mode=kwargs.get('test_mode', False),
+                                             use_async=kwargs.get('use_async', False), source=kwargs.get('source'),
+                                             resume=kwargs.get('resume', False))  # 기본 2년으로 변경
+            _finish_backfill(db)
+            mark_modified()  # 다시 구축한 전체 기간을 다음 보관에서 다시 씀
+            if success:
+                # 갱신 정책은 최근 구간만 다시 계산하므로 적재한 전체 기간의 주봉 / 월봉 / 등락 집계를 한 번 계산
+                with metrics.stage('continuous_aggregates'):
+                    refresh_continuous_aggregates()
+            print("초기화 완료." if success else "초기화 미완료. 'init --resume' 으로 이어서 수행하세요.")
         elif task == "test":
             print("테스트 모드로 데이터베이스 초기화를 시작합니다...")
             init_db()  # 테이블 생성
-            build_initial_database(db, years=kwargs.get('years', 1), test_mode=True)
-            print("테스트 초기화 완료.")
+            success = build_initial_database(db, years=kwargs.get('years', 1), test_mode=True,
+                                             use_async=kwargs.get('use_async', False), source=kwargs.get('source'),
+                                             resume=kwargs.get('resume', False))
+            _finish_backfill(db)
+            mark_modified()
+            if success:
+                with metrics.stage('continuous_aggregates'):
+                    refresh_continuous_aggregates()
+            print("테스트 초기화 완료." if success else "테스트 초기화 미완료. 'test --resume' 으로 이어서 수행하세요.")
         elif task == "update":
             print("일일 데이터 업데이트를 시작합니다...")
-            update_daily_data(db, days=kwargs.get('days', 2))
-            print("업데이트 완료. 기술적 지표를 전체 재계산합니다...")
-            update_full_technical_indicators(db)
+            since = update_daily_data(db, days=kwargs.get('days', 2), use_async=kwargs.get('use_async', False),
+                                      source=kwargs.get('source'))
+            since = min(filter(None, [since, _finish_backfill()]))
+            if kwargs.get('full_indicators', False):
+                print("업데이트 완료. 기술적 지표를 전체 재계산합니다...")
+                with metrics.stage('indicators_full'):
+                    _record_indicator_rows(update_full_technical_indicators(db, workers=kwargs.get('workers', 1)))
+                mark_modified(tables=['technical_indicators'])
+            else:
+                print("업데이트 완료. 기술적 지표는 새 날짜만 증분 계산되었습니다.")
             print("시장 통계를 재계산합니다...")
-            update_market_stats(db)
+            with metrics.stage('market_stats'):
+                update_market_stats(db, start_date=since)
+            # 누락 기간을 채운 경우 갱신 정책 기간보다 오래된 버킷도 바뀌므로 수집 시작일부터 다시 계산
+            with metrics.stage('continuous_aggregates'):
+                refresh_continuous_aggregates(start_date=since)
+            if ARCHIVE_DIR:
+                # 보존 정책이 청크를 지우기 전에 Parquet 로 증분 보관
+                print("Parquet 보관 파일을 갱신합니다...")
+                with metrics.stage('archive'):
+                    success = export_archive(since=since)
             print("모든 작업 완료.")
+        elif task == "indicators":
+            print("기술적 지표를 전체 재계산합니다...")
+            with metrics.stage('indicators_full'):
+                if kwargs.get('engine') == "panel":
+                    _record_indicator_rows([rebuild_technical_indicators_panel(memory_mb=kwargs.get('memory_mb'))])
+                else:
+                    _record_indicator_rows(update_full_technical_indicators(db, workers=kwargs.get('workers', 1)))
+            mark_modified(tables=['technical_indicators'])
+            _finish_backfill()
+            print("기술적 지표 재계산 완료.")
+        elif task == "archive":
+            print("Parquet 보관을 시작합니다...")
+            with metrics.stage('archive'):
+                success = export_archive(full=kwargs.get('full', False), archive_dir=kwargs.get('archive_dir'))
+            print("보관 완료." if success else "보관 중 오류가 발생했습니다. 로그를 확인하세요.")
         else:
-            print("잘못된 작업입니다. 'init' 또는 'update'를 사용하세요.")
+            print("잘못된 작업입니다. 'init', 'test', 'update', 'indicators', 'archive' 중 하나를 사용하세요.")
     except Exception as e:
+        success = False
         logger.error(f"작업 실행 중 오류 발생: {e}")
     finally:
         db.close()
+        response_cache.log_stats()
+        metrics.finish(success)
+        _write_reports(kwargs.get('report') or RUN_REPORT_PATH, kwargs.get('prom_file') or PROMETHEUS_TEXTFILE)
+
+def _finish_backfill(db=None):
+    """백필 모드(--backfill)면 모아 둔 과거 구간을 반영하고 청크를 다시 압축합니다. 반영한 가장 이른 날짜를 반환합니다.
+
+    db 를 주면 반영한 날짜부터 시장 통계를 다시 계산합니다 (시장 통계를 먼저 계산한 초기 구축용).
+    """
+    if backfill.BACKFILL_MODE == 'direct':
+        return None
+    with metrics.stage('backfill'):
+        since = finish_backfill()
+    if since is not None:
+        # 보관한 월보다 이전 구간이 바뀌었으면 다음 보관이 그 월부터 다시 씀
+        mark_modified(since)
+    if since is not None and db is not None:
+        with metrics.stage('market_stats'):
+            update_market_stats(db, start_date=since)
+    return since
+
+def _record_indicator_rows(results):
+    """지표 재계산 결과(추가/갱신 건수)를 현재 단계의 저장 행 수로 기록합니다."""
+    metrics.add_current('rows_written', sum(result['inserted'] + result['updated'] for result in results))
+
+def _write_reports(report_path, prom_path):
+    try:
+        if report_path:
+            metrics.write_json(report_path)
+        if prom_path:
+            metrics.write_prometheus(prom_path)
+    except Exception as e:
+        logger.error(f"실행 보고서 저장 오류: {e}")
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        task_name = sys.argv[1]
-        if task_name == "init":
-            years = int(sys.argv[2]) if len(sys.argv) > 2 else 2  # 기본값 2년으로 변경
-            run_task("init", years=years)
-        elif task_name == "test":
-            years = int(sys.argv[2]) if len(sys.argv) > 2 else 1
-            run_task("test", years=years)
-        elif task_name == "update":
-            days = int(sys.argv[2]) if len(sys.argv) > 2 else 2
-            run_task("update", days=days)
-        else:
-            print("사용법:")
-            print("  python run_update.py init [years]    # 데이터베이스 초기화 (기본: 2년)")
-            print("  python run_update.py test [years]    # 테스트 모드 (상위 20개 종목, 기본: 1년)")
-            print("  python run_update.py update [days]   # 데이터 업데이트 (기본: 2일)")
-    else:
-        print("사용법:")
-        print("  python run_update.py init [years]    # 데이터베이스 초기화 (기본: 2년)")
-        print("  python run_update.py test [years]    # 테스트 모드 (상위 20개 종목, 기본: 1년)")
-        print("  python run_update.py update [days]   # 데이터 업데이트 (기본: 2일)")
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="FinDB 데이터베이스 업데이트",
+        epilog="""사용법:
+  python run_update.py init [years]    # 데이터베이스 초기화 (기본: 2년)
+  python run_update.py init --resume   # 중단된 초기화를 이어서 수행 (완료된 단계/종목 건너뜀)
+  python run_update.py test [years]    # 테스트 모드 (상위 5개 종목, 기본: 1년)
+  python run_update.py update [days]   # 데이터 업데이트 (기본: 2일)
+  python run_update.py indicators --workers 16   # 기술적 지표 전체 재계산 (16 프로세스)
+  python run_update.py indicators --engine panel # 전종목 패널 엔진으로 재계산
+  python run_update.py indicators --engine panel --memory-mb 256   # 종목 묶음당 256MB 이내로 나누어 재계산
+  python run_update.py archive                 # Parquet 증분 보관 (ARCHIVE_DIR)
+  python run_update.py archive --full --archive-dir /data/findb-archive   # 전체 기간 다시 보관
+  python run_update.py init 5 --backfill decompress   # 압축된 과거 구간까지 기간을 늘려 재구축
+  python run_update.py test --record-dir fixtures/sample     # 수집 응답을 파일로 기록
+  python run_update.py test --source replay --replay-dir fixtures/sample   # 기록된 응답으로 오프라인 실행
+  python run_update.py update --report logs/run.json --prom-file /var/lib/node_exporter/findb.prom""",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("task", choices=["init", "test", "update", "indicators", "archive"], help="실행할 작업")
+    parser.add_argument("value", nargs="?", type=int, help="init/test: 수집 기간(년), update: 업데이트 기간(일)")
+    parser.add_argument("--full-indicators", action="store_true",
+                        help="update 후 기술적 지표를 전체 이력으로 재계산 (기본: 새 날짜만 증분 계산)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="기술적 지표 전체 재계산 프로세스 수 (기본: 1)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="init/test/update 가격 수집에 asyncio 엔진 사용 (ASYNC_CONCURRENCY 개 동시 요청)")
+    parser.add_argument("--engine", choices=["stock", "panel"], default="stock",
+                        help="indicators 작업의 계산 엔진: stock(종목별) 또는 panel(전종목 패널 벡터 연산)")
+    parser.add_argument("--memory-mb", type=int,
+                        help="panel 엔진이 한 번에 계산할 종목 묶음의 메모리 예산 (MB, 0 이면 전체 한 번에, 기본: STREAM_MEMORY_MB)")
+    parser.add_argument("--source", choices=["yfinance", "pykrx", "replay"], default="yfinance",
+                        help="init/test/update 데이터 소스 (기본: yfinance)")
+    parser.add_argument("--replay-dir", help="replay 소스가 읽을 기록 디렉터리 (symbols.csv, prices/, indices/)")
+    parser.add_argument("--record-dir", help="데이터 소스 응답을 replay 형식으로 기록할 디렉터리")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="데이터 소스 응답 디스크 캐시(RESPONSE_CACHE_DIR, --async 수집 포함)를 사용하지 않고 모두 새로 받음")
+    parser.add_argument("--resume", action="store_true",
+                        help="init/test: 마지막 미완료 실행을 이어서 수행 (완료된 단계와 종목은 건너뜀)")
+    parser.add_argument("--backfill", choices=backfill.BACKFILL_MODES, default=backfill.BACKFILL_MODE,
+                        help="압축된 과거 청크에 쓰는 방식: direct(그대로), decompress(청크를 풀고 쓴 뒤 재압축), "
+                             "staging(별도 테이블에 모았다가 마지막에 한 번에 반영) (기본: BACKFILL_MODE)")
+    parser.add_argument("--full", action="store_true",
+                        help="archive: 마지막 보관 월부터가 아니라 데이터베이스에 남은 전체 기간을 다시 보관")
+    parser.add_argument("--archive-dir", help="archive: Parquet 보관 디렉터리 (기본: ARCHIVE_DIR)")
+    parser.add_argument("--report", help="단계별 계측 JSON 보고서 경로 (기본: RUN_REPORT_PATH)")
+    parser.add_argument("--prom-file", help="Prometheus textfile 경로 (기본: PROMETHEUS_TEXTFILE)")
+    args = parser.parse_args()
+    reports = {'report': args.report, 'prom_file': args.prom_file}
+    backfill.set_backfill_mode(args.backfill)
+    source = get_data_source(args.source, replay_dir=args.replay_dir, record_dir=args.record_dir,
+                             use_cache=not args.no_cache)
+    
+    if args.task == "init":
+        run_task("init", years=args.value or 2, use_async=args.use_async, source=source, resume=args.resume, **reports)  # 기본값 2년으로 변경
+    elif args.task == "test":
+        run_task("test", years=args.value or 1, use_async=args.use_async, source=source, resume=args.resume, **reports)
+    elif args.task == "update":
+        run_task("update", days=args.value or 2, full_indicators=args.full_indicators, workers=args.workers,
+                 use_async=args.use_async, source=source, **reports)
+    elif args.task == "indicators":
+        run_task("indicators", workers=args.workers, engine=args.engine, memory_mb=args.memory_mb, **reports)
+    elif args.task == "archive":
+        run_task("archive", full=args.full, archive_dir=args.archive_dir, **reports)
@@ -0,0 +1,217 @@
+# screener.py - 기술적 지표 조건 검색 (조건 조합 -> SQL 한 번)
+#
+#   from screener import Field, signal, screen
+#
+#   condition = (Field('rsi') < 30) & (Field('volume_ratio') > 200) & signal('golden_cross', within=5)
+#   result = screen(condition, market='KOSPI')
+#
+# 조건은 &(AND), |(OR), ~(NOT) 로 조합하며, 기준일(기본값: 지표가 저장된 마지막 날짜) 하루의 행만 검사합니다.
+#   Field(name)                 : technical_indicators 또는 daily_prices 컬럼 (<, <=, >, >=, ==, !=, between)
+#   signal(name, within=1)      : 불리언 시그널 컬럼이 최근 within 거래일 안에 참이었던 종목
+# 기준일 조회는 (date, rsi) / (date, volume_ratio) 복합 인덱스, 기간 시그널은 시그널별 부분 인덱스를 사용합니다 (models.py).
+
+import time
+import logging
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import text
+from models import engine, Base
+
+logger = logging.getLogger(__name__)
+
+_INDICATOR_COLUMNS = Base.metadata.tables['technical_indicators'].columns
+_PRICE_COLUMNS = Base.metadata.tables['daily_prices'].columns
+_EXCLUDED_COLUMNS = ('stock_id', 'date', 'created_at', 'updated_at')
+
+SIGNALS = ('golden_cross', 'death_cross', 'bb_upper_touch', 'bb_lower_touch', 'is_doji', 'is_hammer')
+
+
+class _Context:
+    """조건을 SQL 로 바꾸는 동안 바인드 파라미터, 사용한 컬럼, 기간 시작일을 모읍니다."""
+
+    def __init__(self, conn, date):
+        self.conn = conn
+        self.params = {'date': date}
+        self.fields = []
+        self.needs_prices = False
+        self._window_starts = {}
+
+    def bind(self, value):
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def use(self, field):
+        if field.name not in self.fields:
+            self.fields.append(field.name)
+        if field.alias == 'p':
+            self.needs_prices = True
+
+    def window_start(self, days):
+        """기준일을 포함한 최근 days 거래일의 시작일."""
+        if days not in self._window_starts:
+            # 거래일 목록은 시장 통계(ALL) 날짜를 사용하고, 없으면 달력 기준
+            dates = self.conn.execute(text("""
+                SELECT date FROM market_stats
+                WHERE market = 'ALL' AND date <= :date
+                ORDER BY date DESC LIMIT :days
+            """), {'date': self.params['date'], 'days': days}).scalars().all()
+            if len(dates) < days:
+                dates = [self.params['date'] - timedelta(days=days - 1)]
+            self._window_starts[days] = self.bind(min(dates))
+        return self._window_starts[days]
+
+
+class Condition:
+    """조건 (&, |, ~ 로 조합)."""
+
+    def __and__(self, other):
+        return _Combined('AND', self, other)
+
+    def __or__(self, other):
+        return _Combined('OR', self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+    def compile(self, ctx):
+        raise NotImplementedError
+
+
+class _Combined(Condition):
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def compile(self, ctx):
+        return f"({self.left.compile(ctx)} {self.operator} {self.right.compile(ctx)})"
+
+
+class _Not(Condition):
+    def __init__(self, condition):
+        self.condition = condition
+
+    def compile(self, ctx):
+        return f"NOT ({self.condition.compile(ctx)})"
+
+
+class _Compare(Condition):
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def compile(self, ctx):
+        ctx.use(self.field)
+        return f"{self.field.sql} {self.operator} {ctx.bind(self.value)}"
+
+
+class _Between(Condition):
+    def __init__(self, field, low, high):
+        self.field = field
+        self.low = low
+        self.high = high
+
+    def compile(self, ctx):
+        ctx.use(self.field)
+        return f"{self.field.sql} BETWEEN {ctx.bind(self.low)} AND {ctx.bind(self.high)}"
+
+
+class _Signal(Condition):
+    def __init__(self, name, within):
+        self.field = Field(name)
+        self.within = within
+
+    def compile(self, ctx):
+        ctx.use(self.field)
+        if self.within <= 1:
+            return f"{self.field.sql} IS TRUE"
+        # 시그널별 부분 인덱스 (date, stock_id) WHERE <signal> 범위 조회
+        return (f"t.stock_id IN (SELECT stock_id FROM technical_indicators "
+                f"WHERE {self.field.name} AND date >= {ctx.window_start(self.within)} AND date <= :date)")
+
+
+class Field:
+    """technical_indicators (우선) 또는 daily_prices 컬럼."""
+
+    def __init__(self, name):
+        if name in _INDICATOR_COLUMNS and name not in _EXCLUDED_COLUMNS:
+            self.alias = 't'
+        elif name in _PRICE_COLUMNS and name not in _EXCLUDED_COLUMNS:
+            self.alias = 'p'
+        else:
+            raise ValueError(f"알 수 없는 컬럼: {name}")
+        self.name = name
+        self.sql = f"{self.alias}.{name}"
+
+    def __lt__(self, value):
+        return _Compare(self, '<', value)
+
+    def __le__(self, value):
+        return _Compare(self, '<=', value)
+
+    def __gt__(self, value):
+        return _Compare(self, '>', value)
+
+    def __ge__(self, value):
+        return _Compare(self, '>=', value)
+
+    def __eq__(self, value):
+        return _Compare(self, '=', value)
+
+    def __ne__(self, value):
+        return _Compare(self, '<>', value)
+
+    __hash__ = None
+
+    def between(self, low, high):
+        return _Between(self, low, high)
+
+
+def signal(name, within=1):
+    """시그널 컬럼(SIGNALS)이 기준일을 포함한 최근 within 거래일 안에 참이었던 종목."""
+    if name not in SIGNALS:
+        raise ValueError(f"알 수 없는 시그널: {name} (사용 가능: {SIGNALS})")
+    return _Signal(name, within)
+
+
+def screen(condition, market=None, sector=None, date=None, fields=None, limit=None):
+    """조건을 만족하는 종목을 DataFrame 으로 반환합니다.
+
+    market / sector 로 범위를 제한하며, 결과에는 종목 정보와 조건에 사용한 컬럼, fields 로 지정한 컬럼이 포함됩니다.
+    """
+    started_at = time.perf_counter()
+    with engine.connect() as conn:
+        if date is None:
+            date = conn.execute(text("SELECT max(date) FROM technical_indicators")).scalar()
+            if date is None:
+                return pd.DataFrame()
+        else:
+            date = pd.Timestamp(date).date()
+
+        ctx = _Context(conn, date)
+        conditions = ["t.date = :date", condition.compile(ctx)]
+        for name in fields or []:
+            ctx.use(Field(name))
+        if market is not None:
+            conditions.append(f"s.market = {ctx.bind(market)}")
+        if sector is not None:
+            conditions.append(f"s.sector = {ctx.bind(sector)}")
+
+        price_join = "JOIN daily_prices p ON p.stock_id = t.stock_id AND p.date = t.date" if ctx.needs_prices else ""
+        columns = ''.join(f", {Field(name).sql}" for name in ctx.fields)
+        query = f"""
+            SELECT s.symbol, s.name, s.market, s.sector, t.date{columns}
+            FROM technical_indicators t
+            JOIN stocks s ON s.stock_id = t.stock_id
+            {price_join}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY s.symbol
+            {f'LIMIT {int(limit)}' if limit else ''}
+        """
+        result = conn.execute(text(query), ctx.params)
+        frame = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    logger.info(f"스크리너 ({date}): {len(frame)}개 종목, {(time.perf_counter() - started_at) * 1000:.1f}ms")
+    return frame
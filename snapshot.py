@@ -0,0 +1,77 @@
+# snapshot.py - 종목별 최신 상태 테이블 (latest_snapshot) 유지
+#
+# 대시보드 / 스크리너의 "현재 시장 상태" 조회가 하이퍼테이블의 DISTINCT ON 대신 종목당 1행을 읽도록
+# 마지막 가격과 마지막 기술적 지표를 한 테이블에 둡니다.
+#   - copy_upsert 가 daily_prices / technical_indicators 에 쓰면, 같은 트랜잭션에서 방금 적재한 배치의
+#     종목별 마지막 행으로 갱신합니다 (하이퍼테이블을 다시 읽지 않음, 더 최근 날짜가 이미 있으면 유지)
+#   - rebuild_latest_snapshot() 은 하이퍼테이블에서 전체를 다시 만듭니다 (init_db 에서 비어 있을 때 한 번)
+
+import time
+import logging
+from sqlalchemy import text
+from models import engine, Base
+
+logger = logging.getLogger(__name__)
+
+# 원본 테이블 -> (최신 상태 테이블의 날짜 컬럼, 복사할 컬럼)
+_snapshot = Base.metadata.tables['latest_snapshot']
+SNAPSHOT_SOURCES = {
+    'daily_prices': ('price_date', [
+        'open_price', 'high_price', 'low_price', 'close_price', 'adjusted_close', 'volume', 'change', 'change_rate'
+    ]),
+    'technical_indicators': ('indicator_date', [
+        column.name for column in _snapshot.columns
+        if column.name in Base.metadata.tables['technical_indicators'].columns
+        and column.name not in ('stock_id', 'date', 'updated_at')
+    ]),
+}
+
+
+def _upsert_sql(table_name, source, columns, only_newer=True):
+    """source(종목별 마지막 행의 하위 쿼리)로 최신 상태를 갱신하는 SQL. only_newer 면 저장된 날짜 이후 행만 반영합니다."""
+    date_column, _ = SNAPSHOT_SOURCES[table_name]
+    set_clause = ', '.join(f"{c} = EXCLUDED.{c}" for c in [date_column] + columns)
+    condition = f"WHERE l.{date_column} IS NULL OR l.{date_column} <= EXCLUDED.{date_column}" if only_newer else ""
+    return f"""
+        INSERT INTO latest_snapshot AS l (stock_id, {date_column}, {', '.join(columns)}, updated_at)
+        SELECT stock_id, date, {', '.join(columns)}, now() FROM {source}
+        ON CONFLICT (stock_id) DO UPDATE SET {set_clause}, updated_at = now()
+        {condition}
+    """
+
+
+def update_from_stage(conn, table_name, stage, batch_columns):
+    """copy_upsert 의 임시 테이블(stage)에 적재된 배치로 최신 상태를 갱신합니다."""
+    if table_name not in SNAPSHOT_SOURCES:
+        return
+    columns = [c for c in SNAPSHOT_SOURCES[table_name][1] if c in batch_columns]
+    source = f"(SELECT DISTINCT ON (stock_id) * FROM {stage} ORDER BY stock_id, date DESC) latest"
+    conn.exec_driver_sql(_upsert_sql(table_name, source, columns))
+
+
+def rebuild_latest_snapshot():
+    """하이퍼테이블에서 종목별 마지막 행을 찾아 최신 상태 테이블을 다시 만듭니다."""
+    started_at = time.time()
+    with engine.begin() as conn:
+        for table_name, (_, columns) in SNAPSHOT_SOURCES.items():
+            # 종목별로 (stock_id, date) 기본키 인덱스를 역순으로 1행만 읽음
+            source = f"""(
+                SELECT s.stock_id, x.* FROM stocks s
+                CROSS JOIN LATERAL (
+                    SELECT date, {', '.join(columns)} FROM {table_name} t
+                    WHERE t.stock_id = s.stock_id
+                    ORDER BY date DESC LIMIT 1
+                ) x
+            ) latest"""
+            conn.execute(text(_upsert_sql(table_name, source, columns, only_newer=False)))
+        rows = conn.execute(text("SELECT count(*) FROM latest_snapshot")).scalar()
+    logger.info(f"최신 상태 테이블 재구성 완료 ({rows}개 종목, {time.time() - started_at:.1f}초)")
+
+
+def ensure_latest_snapshot():
+    """최신 상태 테이블이 비어 있고 가격 데이터가 있으면 (기존 데이터베이스에 처음 추가된 경우) 재구성합니다."""
+    with engine.connect() as conn:
+        empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM latest_snapshot)")).scalar()
+        has_prices = conn.execute(text("SELECT EXISTS (SELECT 1 FROM daily_prices)")).scalar()
+    if empty and has_prices:
+        rebuild_latest_snapshot()
@@ -0,0 +1,173 @@
+# symbol_master.py - 종목 마스터 (KRX 전종목 일괄 조회 + 거래일 단위 디스크 캐시 + stocks 테이블 동기화)
+
+import os
+import json
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pykrx.website import krx
+from sqlalchemy import insert, update
+from models import Session, Stock
+
+logger = logging.getLogger(__name__)
+
+# 종목 목록 캐시 디렉터리 (거래일별 JSON 파일)
+SYMBOL_CACHE_DIR = os.getenv('SYMBOL_CACHE_DIR', os.path.join('cache', 'symbols'))
+
+# 시장명 -> yfinance 심볼 접미사
+MARKET_SUFFIXES = {
+    'KOSPI': '.KS',
+    'KOSDAQ': '.KQ',
+}
+
+
+def _cache_path(trading_date):
+    return os.path.join(SYMBOL_CACHE_DIR, f"{trading_date}.json")
+
+
+def load_cached_symbols(trading_date):
+    """거래일 캐시가 있으면 종목 목록을 반환하고, 없으면 None 을 반환합니다."""
+    path = _cache_path(trading_date)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"종목 캐시 읽기 실패 ({path}): {e}")
+        return None
+
+
+def save_cached_symbols(trading_date, symbols):
+    os.makedirs(SYMBOL_CACHE_DIR, exist_ok=True)
+    path = _cache_path(trading_date)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(symbols, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def resolve_trading_date(trading_date=None):
+    """trading_date(YYYYMMDD, 기본값 오늘)와 같거나 가장 가까운 이전 KRX 영업일.
+
+    KRX 목록은 주말 / 휴장일 날짜로 요청하면 오류 없이 빈 목록을 돌려주므로 영업일로 바꾼 뒤 요청합니다.
+    KRX 영업일 조회가 실패하면 주말만 건너뛴 날짜를 사용합니다.
+    """
+    try:
+        return krx.get_nearest_business_day_in_a_week(trading_date, prev=True)
+    except Exception as e:
+        day = np.datetime64(datetime.strptime(trading_date, '%Y%m%d').date() if trading_date
+                            else datetime.now().date(), 'D')
+        resolved = pd.Timestamp(np.busday_offset(day, 0, roll='backward')).strftime('%Y%m%d')
+        logger.warning(f"KRX 영업일 조회 실패, 주말만 제외한 {resolved} 을 사용합니다: {e}")
+        return resolved
+
+
+def fetch_listing(trading_date):
+    """KRX 전종목 목록(티커 + 종목명)을 시장별 한 번의 요청으로 가져옵니다.
+
+    시장 목록이 비어 있으면 (영업일이 아닌 날짜 등) ValueError 를 발생시킵니다. 빈 목록을 그대로 반환하면
+    초기 구축에서 종목이 하나도 저장되지 않으므로, 호출자(get_korean_stock_symbols)가 대체 목록을 사용하게 합니다.
+    """
+    symbols = []
+    for market, suffix in MARKET_SUFFIXES.items():
+        listing = krx.get_market_ticker_and_name(trading_date, market)
+        if listing is None or len(listing) == 0:
+            raise ValueError(f"KRX 종목 목록이 비어 있습니다 ({market}, {trading_date})")
+        for ticker, name in listing.items():
+            symbols.append({
+                'symbol': f'{ticker}{suffix}',
+                'krx_code': ticker,
+                'name': name,
+                'market': market
+            })
+    return symbols
+
+
+def get_symbol_master(trading_date=None, use_cache=True):
+    """거래일 기준 KOSPI/KOSDAQ 종목 목록을 반환합니다 (같은 거래일은 디스크 캐시 사용).
+
+    trading_date(기본값 오늘)는 가장 가까운 이전 영업일로 바꾸며, 캐시도 그 영업일로 저장합니다.
+    """
+    trading_date = resolve_trading_date(trading_date)
+
+    if use_cache:
+        cached = load_cached_symbols(trading_date)
+        if cached is not None:
+            logger.info(f"종목 목록 캐시 사용 ({trading_date}): {len(cached)}개")
+            return cached
+
+    symbols = fetch_listing(trading_date)
+    if use_cache:
+        save_cached_symbols(trading_date, symbols)
+    return symbols
+
+
+def _profile_fields(info, fetch_profile):
+    """신규 종목의 섹터/업종/설명. fetch_profile 결과를 우선하고, 없으면 종목 목록에 포함된 값을 사용합니다."""
+    profile = fetch_profile(info['symbol']) if fetch_profile is not None else {}
+    return {
+        key: profile.get(key) or info.get(key) or ''
+        for key in ('sector', 'industry', 'description')
+    }
+
+
+def sync_stocks(symbols, fetch_profile=None):
+    """종목 목록을 stocks 테이블과 한 번의 조회로 비교하여 신규 종목은 추가, 변경된 종목은 갱신합니다.
+
+    fetch_profile(symbol) 은 신규 종목의 섹터/업종/설명을 반환하는 함수입니다 (예: DataSource.get_profile).
+
+    반환값은 inserted / updated / unchanged 건수입니다.
+    """
+    session = Session()
+    try:
+        existing = {
+            row.symbol: row
+            for row in session.query(Stock.stock_id, Stock.symbol, Stock.krx_code, Stock.name, Stock.market)
+        }
+
+        new_rows = []
+        changed_rows = []
+        for info in symbols:
+            current = existing.get(info['symbol'])
+            if current is None:
+                new_rows.append(info)
+            elif (current.krx_code, current.name, current.market) != (info['krx_code'], info['name'], info['market']):
+                changed_rows.append({
+                    'stock_id': current.stock_id,
+                    'krx_code': info['krx_code'],
+                    'name': info['name'],
+                    'market': info['market']
+                })
+
+        if new_rows:
+            session.execute(insert(Stock), [
+                {
+                    'symbol': info['symbol'],
+                    'krx_code': info['krx_code'],
+                    'name': info['name'],
+                    'market': info['market'],
+                    'is_active': True,
+                    **_profile_fields(info, fetch_profile)
+                }
+                for info in new_rows
+            ])
+
+        if changed_rows:
+            session.execute(update(Stock), changed_rows)
+
+        session.commit()
+
+        stats = {
+            'inserted': len(new_rows),
+            'updated': len(changed_rows),
+            'unchanged': len(symbols) - len(new_rows) - len(changed_rows)
+        }
+        logger.info(f"종목 정보 동기화 - 신규: {stats['inserted']}, 변경: {stats['updated']}, 유지: {stats['unchanged']}")
+        return stats
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,7 @@
+# 저장소 최상위 모듈(models, data_importer ...)을 가져올 수 있도록 경로 추가
+# models 는 import 시 엔진만 만들고 연결하지 않으므로, 아래 테스트는 데이터베이스 없이 실행됩니다.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+import datetime
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import archive
+from models import Base
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'findb.sqlite'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in ('stocks', 'daily_prices')])
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stocks (stock_id, symbol, name, market) VALUES "
+                          "(1, 'A.KS', 'A', 'KOSPI'), (2, 'B.KQ', 'B', 'KOSDAQ')"))
+    monkeypatch.setattr(archive, 'engine', engine)
+    return engine
+
+
+def _insert_prices(engine, start, periods, close=100.0):
+    rows = [{'stock_id': stock_id, 'date': day.date(), 'close_price': close + i, 'volume': 1000 + i}
+            for stock_id in (1, 2)
+            for i, day in enumerate(pd.bdate_range(start, periods=periods))]
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM daily_prices WHERE date >= :start"), {'start': rows[0]['date']})
+        conn.execute(text("INSERT INTO daily_prices (stock_id, date, close_price, volume) "
+                          "VALUES (:stock_id, :date, :close_price, :volume)"), rows)
+
+
+def _export(tmp_path, **kwargs):
+    return archive.export_archive(tables=['daily_prices'], archive_dir=str(tmp_path / 'archive'), **kwargs)
+
+
+def test_export_read_round_trip(db, tmp_path):
+    _insert_prices(db, '2024-01-29', 10)
+    assert _export(tmp_path)
+
+    frame = archive.read_archive('daily_prices', archive_dir=str(tmp_path / 'archive'))
+    assert len(frame) == 20
+    assert sorted(frame['symbol'].unique()) == ['A.KS', 'B.KQ']
+    assert str(frame['volume'].dtype) == 'Int64'
+
+    prices = archive.get_prices('A.KS', '2024-02-01', '2024-02-09', fields=['close_price'],
+                                archive_dir=str(tmp_path / 'archive'))
+    assert list(prices.index.get_level_values('date')) == list(pd.bdate_range('2024-02-01', '2024-02-09'))
+    assert prices['close_price'].tolist() == [103.0, 104.0, 105.0, 106.0, 107.0, 108.0, 109.0]
+
+    kosdaq = archive.read_archive('daily_prices', markets=['KOSDAQ'], archive_dir=str(tmp_path / 'archive'))
+    assert set(kosdaq['symbol']) == {'B.KQ'}
+
+
+def test_incremental_export_restarts_from_modified_date(db, tmp_path):
+    _insert_prices(db, '2024-01-01', 60)   # 2024-01 ~ 2024-03
+    assert _export(tmp_path)
+
+    # 보관 이후 1월 구간이 바뀜 (백필)
+    _insert_prices(db, '2024-01-15', 45, close=500.0)
+
+    # 마지막 보관 월(3월)부터만 다시 쓰면 1월 변경은 빠짐
+    assert _export(tmp_path)
+    january = archive.read_archive('daily_prices', '2024-01-15', '2024-01-15', symbols=['A.KS'],
+                                   archive_dir=str(tmp_path / 'archive'))
+    assert january['close_price'].tolist() == [110.0]
+
+    archive.mark_modified(datetime.date(2024, 1, 15), archive_dir=str(tmp_path / 'archive'))
+    assert _export(tmp_path)
+    january = archive.read_archive('daily_prices', '2024-01-15', '2024-01-15', symbols=['A.KS'],
+                                   archive_dir=str(tmp_path / 'archive'))
+    assert january['close_price'].tolist() == [500.0]
+    assert 'modified_since' not in archive._load_manifest(str(tmp_path / 'archive'))['daily_prices']
+
+
+def test_export_since_rewrites_earlier_months(db, tmp_path):
+    _insert_prices(db, '2024-01-01', 60)
+    assert _export(tmp_path)
+    _insert_prices(db, '2024-02-01', 30, close=700.0)
+
+    assert _export(tmp_path, since=datetime.date(2024, 2, 1))
+    february = archive.read_archive('daily_prices', '2024-02-01', '2024-02-01', symbols=['B.KQ'],
+                                    archive_dir=str(tmp_path / 'archive'))
+    assert february['close_price'].tolist() == [700.0]
+
+
+def test_mark_modified_without_archive_is_noop(tmp_path):
+    archive.mark_modified(archive_dir=str(tmp_path / 'missing'))
+    assert not (tmp_path / 'missing').exists()
@@ -0,0 +1,122 @@
+import time
+import threading
+from contextlib import contextmanager
+import pytest
+import backfill
+
+CHUNK = ('_timescaledb_internal._hyper_1_1_chunk', None, None)
+OTHER_CHUNK = ('_timescaledb_internal._hyper_1_2_chunk', None, None)
+
+
+class _Conn:
+    def __init__(self, calls):
+        self.calls = calls
+        self.info = {}
+
+    def execute(self, statement):
+        self.calls.append(str(statement))
+
+
+class _Engine:
+    """engine.begin() 만 흉내 내는 엔진 (블록에서 예외가 나면 롤백)."""
+
+    def __init__(self):
+        self.calls = []
+
+    @contextmanager
+    def begin(self):
+        yield _Conn(self.calls)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(backfill, '_decompressed', set())
+    monkeypatch.setattr(backfill, '_pending', {})
+    fake = _Engine()
+    monkeypatch.setattr(backfill, 'engine', fake)
+    return fake
+
+
+def _write(chunks, before_commit=None, fail=False):
+    with backfill.transaction() as conn:
+        backfill.decompress_chunks(conn, chunks)
+        if before_commit is not None:
+            before_commit.wait(5)
+        if fail:
+            raise RuntimeError('invalid input syntax for type double precision')
+
+
+def test_concurrent_writers_decompress_chunk_once(engine):
+    start = threading.Barrier(8)
+
+    def write():
+        start.wait()
+        _write([CHUNK, OTHER_CHUNK])
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(engine.calls) == 2
+    assert backfill.decompressed_chunks() == sorted(name for name, _, _ in (CHUNK, OTHER_CHUNK))
+
+
+def test_other_writers_wait_for_commit(engine):
+    commit = threading.Event()
+    first = threading.Thread(target=_write, args=([CHUNK], commit))
+    first.start()
+    while not engine.calls:
+        time.sleep(0.001)
+
+    second_done = threading.Event()
+    second = threading.Thread(target=lambda: (_write([CHUNK]), second_done.set()))
+    second.start()
+    # 첫 트랜잭션이 커밋되기 전에는 쓰지 않고, 기록도 되지 않음
+    assert not second_done.wait(0.2)
+    assert backfill.decompressed_chunks() == []
+
+    commit.set()
+    first.join()
+    second.join()
+    assert second_done.is_set()
+    assert len(engine.calls) == 1
+    assert backfill.decompressed_chunks() == [CHUNK[0]]
+
+
+def test_rolled_back_decompress_is_not_recorded(engine):
+    with pytest.raises(RuntimeError):
+        _write([CHUNK], fail=True)
+    assert backfill.decompressed_chunks() == []
+
+    # 롤백으로 다시 압축된 상태이므로 다음 쓰기가 다시 풂
+    _write([CHUNK])
+    assert len(engine.calls) == 2
+    assert backfill.decompressed_chunks() == [CHUNK[0]]
+
+
+def test_waiting_writer_decompresses_after_rollback(engine):
+    rollback = threading.Event()
+
+    def failing_write():
+        with pytest.raises(RuntimeError):
+            _write([CHUNK], rollback, fail=True)
+
+    first = threading.Thread(target=failing_write)
+    first.start()
+    while not engine.calls:
+        time.sleep(0.001)
+    second = threading.Thread(target=_write, args=([CHUNK],))
+    second.start()
+
+    rollback.set()
+    first.join()
+    second.join()
+    assert len(engine.calls) == 2
+    assert backfill.decompressed_chunks() == [CHUNK[0]]
+
+
+def test_decompress_requires_backfill_transaction(engine):
+    with pytest.raises(RuntimeError):
+        backfill.decompress_chunks(_Conn([]), [CHUNK])
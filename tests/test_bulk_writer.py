@@ -0,0 +1,70 @@
+import os
+import datetime
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import backfill
+import bulk_writer
+from models import Base
+
+# PostgreSQL 이 필요한 테스트 (COPY / ON CONFLICT). 전용 테스트 DB 를 지정했을 때만 실행합니다.
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+TABLES = ('stocks', 'daily_prices', 'latest_snapshot')
+# 기존 테이블과 섞이지 않도록 별도 스키마에 만들고 끝나면 삭제
+SCHEMA = 'findb_test_bulk_writer'
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL 미설정 (PostgreSQL 테스트)")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    with create_engine(TEST_DATABASE_URL).begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    engine = create_engine(TEST_DATABASE_URL, connect_args={'options': f'-csearch_path={SCHEMA}'})
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stocks (stock_id, symbol, name, market) VALUES "
+                          "(1, 'A.KS', 'A', 'KOSPI'), (2, 'B.KQ', 'B', 'KOSDAQ')"))
+    monkeypatch.setattr(bulk_writer, 'engine', engine)
+    monkeypatch.setattr(backfill, 'engine', engine)
+    monkeypatch.setattr(backfill, 'BACKFILL_MODE', 'direct')
+    yield engine
+    engine.dispose()
+    with create_engine(TEST_DATABASE_URL).begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+def _prices(close=100.0):
+    days = pd.bdate_range('2024-01-02', periods=5)
+    return pd.DataFrame([
+        {'stock_id': stock_id, 'date': day.date(), 'open_price': close, 'high_price': close + 1,
+         'low_price': close - 1, 'close_price': close + i, 'volume': 1000 + i}
+        for stock_id in (1, 2) for i, day in enumerate(days)
+    ])
+
+
+def test_repeated_upsert_skips_unchanged_rows(db):
+    frame = _prices()
+    assert bulk_writer.copy_upsert('daily_prices', frame, ['stock_id', 'date']) == \
+        {'inserted': 10, 'updated': 0, 'skipped': 0}
+    # 같은 프레임을 다시 넣으면 모두 건너뜀 (updated_at 도 그대로)
+    with db.connect() as conn:
+        updated_at = conn.execute(text("SELECT max(updated_at) FROM daily_prices")).scalar()
+    assert bulk_writer.copy_upsert('daily_prices', frame, ['stock_id', 'date']) == \
+        {'inserted': 0, 'updated': 0, 'skipped': 10}
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT max(updated_at) FROM daily_prices")).scalar() == updated_at
+        assert conn.execute(text("SELECT count(*) FROM daily_prices")).scalar() == 10
+
+
+def test_changed_rows_are_updated(db):
+    bulk_writer.copy_upsert('daily_prices', _prices(), ['stock_id', 'date'])
+    changed = _prices()
+    changed.loc[changed['date'] == datetime.date(2024, 1, 8), 'close_price'] = 500.0
+    assert bulk_writer.copy_upsert('daily_prices', changed, ['stock_id', 'date']) == \
+        {'inserted': 0, 'updated': 2, 'skipped': 8}
+    with db.connect() as conn:
+        latest = conn.execute(text("SELECT close_price FROM latest_snapshot ORDER BY stock_id")).scalars().all()
+    assert latest == [500.0, 500.0]
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import pandas as pd
+import pytest
+import data_importer
+import data_sources
+from data_sources import ReplaySource, RecordingSource, YFinanceSource, PykrxSource, get_data_source
+from response_cache import response_cache
+
+
+def _ohlcv(start, periods, tz=None):
+    index = pd.date_range(start, periods=periods, freq='B', tz=tz, name='Date')
+    close = [100.0 + i for i in range(periods)]
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Adj Close': close,
+                         'Volume': [1000.0] * periods}, index=index)
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    root = tmp_path / 'replay'
+    (root / 'prices').mkdir(parents=True)
+    (root / 'indices').mkdir()
+    pd.DataFrame([{'symbol': 'A.KS', 'krx_code': 'A', 'name': '가', 'market': 'KOSPI'},
+                  {'symbol': 'B.KQ', 'krx_code': 'B', 'name': '나', 'market': 'KOSDAQ'}]
+                 ).to_csv(root / 'symbols.csv', index=False)
+    _ohlcv('2024-01-01', 20, tz='Asia/Seoul').to_csv(root / 'prices' / 'A.KS.csv')
+    _ohlcv('2024-01-01', 20).drop(columns=['Adj Close']).to_csv(root / 'indices' / 'KOSPI.csv')
+    return root
+
+
+def test_replay_slices_range_start_inclusive_end_exclusive(replay_dir):
+    source = ReplaySource(str(replay_dir))
+    frames = source.get_price_history(['A.KS', 'B.KQ'], '2024-01-03', '2024-01-10')
+
+    assert list(frames['A.KS'].index.strftime('%Y-%m-%d')) == \
+        ['2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08', '2024-01-09']
+    assert frames['B.KQ'].empty   # 기록되지 않은 종목은 데이터 없음
+    assert len(source.get_index_history('KOSPI', '2024-01-01', '2024-01-08')) == 5
+    assert source.get_index_history('KOSDAQ', '2024-01-01', '2024-01-08').empty
+    assert [s['symbol'] for s in source.get_symbols()] == ['A.KS', 'B.KQ']
+
+
+def test_replay_prefers_parquet(replay_dir):
+    _ohlcv('2024-01-01', 3).assign(Close=1.0).to_parquet(replay_dir / 'prices' / 'A.KS.parquet')
+    frame = ReplaySource(str(replay_dir)).get_price_history(['A.KS'], '2024-01-01', '2024-02-01')['A.KS']
+    assert frame['Close'].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_recording_round_trips_through_replay(replay_dir, tmp_path):
+    record_dir = tmp_path / 'record'
+    recorder = RecordingSource(ReplaySource(str(replay_dir)), str(record_dir))
+    symbols = recorder.get_symbols()
+    prices = recorder.get_price_history(['A.KS', 'B.KQ'], '2024-01-03', '2024-01-20')
+    index = recorder.get_index_history('KOSPI', '2024-01-01', '2024-01-20')
+
+    replay = ReplaySource(str(record_dir))
+    assert replay.get_symbols() == symbols
+    replayed = replay.get_price_history(['A.KS', 'B.KQ'], '2024-01-03', '2024-01-20')
+    pd.testing.assert_frame_equal(replayed['A.KS'], prices['A.KS'], check_freq=False)
+    assert replayed['B.KQ'].empty and not (record_dir / 'prices' / 'B.KQ.csv').exists()
+    pd.testing.assert_frame_equal(replay.get_index_history('KOSPI', '2024-01-01', '2024-01-20'), index,
+                                  check_freq=False)
+
+
+def test_get_data_source_selection(tmp_path):
+    source = get_data_source('yfinance')
+    assert isinstance(source, YFinanceSource) and source.cache is response_cache
+    assert get_data_source('yfinance', use_cache=False).cache is None
+    assert isinstance(get_data_source('pykrx'), PykrxSource)
+
+    replay = get_data_source('replay', replay_dir=str(tmp_path))
+    assert isinstance(replay, ReplaySource) and replay.cache is None
+    with pytest.raises(ValueError):
+        get_data_source('replay')
+    with pytest.raises(ValueError):
+        get_data_source('bloomberg')
+
+    recorder = get_data_source('yfinance', record_dir=str(tmp_path / 'record'))
+    assert isinstance(recorder, RecordingSource) and isinstance(recorder.inner, YFinanceSource)
+    # 감싼 소스의 수집 방식 / 캐시를 그대로 사용
+    assert recorder.supports_threads and recorder.supports_async and recorder.cache is response_cache
+    assert not get_data_source('pykrx', record_dir=str(tmp_path / 'record')).supports_async
+
+
+def test_recording_source_keeps_async_and_threaded_paths(tmp_path, monkeypatch):
+    import async_ingest
+
+    recorder = get_data_source('yfinance', record_dir=str(tmp_path), use_cache=False)
+    calls = {}
+    monkeypatch.setattr(async_ingest, 'fetch_stock_data_async', lambda *args, **kwargs: calls.update(kwargs))
+    data_importer._fetch_prices('2024-01-01', '2024-02-01', use_async=True, source=recorder, jobs=[])
+    assert calls['record'] == recorder.record_price_history and calls['cache'] is None
+
+    requested = []
+    monkeypatch.setattr(YFinanceSource, '_fetch_price_history',
+                        lambda self, symbols, start, end, threads=True: requested.append(threads) or
+                        {symbol: pd.DataFrame() for symbol in symbols})
+    data_importer.fetch_stock_prices_batch([(1, 'A.KS'), (2, 'B.KS')], '2024-01-01', '2024-02-01', threads=7,
+                                           source=recorder)
+    assert requested == [7]
+
+
+def test_async_ingest_records_yfinance_frames(tmp_path, monkeypatch):
+    import async_ingest
+
+    timestamps = [int(pd.Timestamp(day, tz='Asia/Seoul').timestamp()) for day in ('2024-01-02', '2024-01-03')]
+    content = json.dumps({'chart': {'result': [{
+        'timestamp': timestamps,
+        'meta': {'exchangeTimezoneName': 'Asia/Seoul'},
+        'indicators': {'quote': [{'open': [1.0, 2.0], 'high': [1.0, 2.0], 'low': [1.0, 2.0],
+                                  'close': [1.0, 2.0], 'volume': [10, 20]}],
+                       'adjclose': [{'adjclose': [1.0, 2.0]}]},
+    }]}}).encode()
+
+    async def fake_fetch(session, limiter, semaphore, stock_id, symbol, start_date, end_date):
+        return content
+
+    class Pipeline:
+        def put(self, *item):
+            self.item = item
+
+    monkeypatch.setattr(async_ingest, '_fetch_one', fake_fetch)
+    recorder = RecordingSource(data_sources.YFinanceSource(), str(tmp_path))
+    pipeline = Pipeline()
+    asyncio.run(async_ingest._ingest([(1, 'A.KS', 'A', '2024-01-01', '2024-01-05')], pipeline, 4,
+                                     record=recorder.record_price_history))
+
+    assert len(pipeline.item[3]) == 2
+    replayed = ReplaySource(str(tmp_path)).get_price_history(['A.KS'], '2024-01-01', '2024-01-05')['A.KS']
+    assert replayed['Close'].tolist() == [1.0, 2.0]
+    assert list(replayed.columns) == data_sources.OHLCV_COLUMNS
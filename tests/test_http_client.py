@@ -0,0 +1,47 @@
+import pandas as pd
+import data_sources
+from http_client import AdaptiveConcurrency
+
+
+def _evaluate(concurrency, latency):
+    for _ in range(concurrency.window):
+        concurrency.record(latency, 200)
+
+
+def test_latency_baseline_recovers_after_level_shift():
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8, window=5, baseline_windows=3)
+    _evaluate(concurrency, 0.1)
+    # 지연시간이 전반적으로 늘면 기준의 2배를 넘으므로 동시성을 줄임
+    _evaluate(concurrency, 0.5)
+    _evaluate(concurrency, 0.5)
+    assert concurrency.limit == 6
+
+    # 빠른 구간이 기준 창(3회)을 벗어나면 기준도 따라 올라가 다시 늘림
+    _evaluate(concurrency, 0.5)
+    _evaluate(concurrency, 0.5)
+    assert concurrency.limit == 8
+
+
+def test_throttling_halves_limit():
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8, window=5)
+    for _ in range(4):
+        concurrency.record(0.1, 200)
+    concurrency.record(0.1, 429)
+    assert concurrency.limit == 4
+
+
+def test_batch_download_takes_concurrency_slot(monkeypatch):
+    concurrency = AdaptiveConcurrency(max_limit=2)
+    active = []
+
+    def fake_download(symbols, **kwargs):
+        active.append(concurrency._active)
+        return pd.DataFrame()
+
+    monkeypatch.setattr(data_sources, 'concurrency', concurrency)
+    monkeypatch.setattr(data_sources.yf, 'download', fake_download)
+    result = data_sources.YFinanceSource()._fetch_price_history(['A.KS', 'B.KS'], '2024-01-01', '2024-02-01')
+
+    assert active == [1]
+    assert concurrency._active == 0
+    assert result['A.KS'].empty and result['B.KS'].empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_importer import (compute_technical_indicators, INDICATOR_WARMUP_BARS, INDICATOR_FLOAT_COLUMNS,
+                           INDICATOR_BOOL_COLUMNS)
+
+
+def _prices(seed, periods=900, level=50000):
+    rng = np.random.default_rng(seed)
+    close = level * np.exp(np.cumsum(rng.normal(0, 0.025, periods)))
+    open_ = close * (1 + rng.normal(0, 0.01, periods))
+    return pd.DataFrame({
+        'date': pd.bdate_range('2021-01-04', periods=periods),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, periods)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, periods)),
+        'close': close,
+        'volume': rng.integers(10_000, 5_000_000, periods).astype(float),
+    })
+
+
+def _tail(frame, since, warmup_bars):
+    # load_indicator_inputs(since=...) 와 같은 범위: since 이전 warmup_bars 개 봉부터
+    first = max(0, int(np.searchsorted(frame['date'], pd.Timestamp(since))) - warmup_bars)
+    return frame.iloc[first:].reset_index(drop=True)
+
+
+def _relative_errors(frame, since, warmup_bars):
+    full = compute_technical_indicators(frame.copy())
+    tail = compute_technical_indicators(_tail(frame, since, warmup_bars))
+    full = full[full['date'] >= since].reset_index(drop=True)
+    tail = tail[tail['date'] >= since].reset_index(drop=True)
+    assert (full['date'] == tail['date']).all() and len(full) > 0
+
+    errors = {}
+    for column in INDICATOR_FLOAT_COLUMNS:
+        expected = full[column].to_numpy()
+        errors[column] = np.max(np.abs(tail[column].to_numpy() - expected) / np.maximum(1.0, np.abs(expected)))
+    return errors, full, tail
+
+
+@pytest.mark.parametrize('level', [50000, 1000000])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('new_bars', [1, 5, 40])
+def test_warmup_tail_matches_full_recompute(seed, new_bars, level):
+    # MACD 오차는 가격 수준에 비례하므로 고가 종목(약 100만원)도 확인
+    frame = _prices(seed, level=level)
+    since = frame['date'].iloc[-new_bars]
+    errors, full, tail = _relative_errors(frame, since, INDICATOR_WARMUP_BARS)
+
+    # data_importer.INDICATOR_WARMUP_BARS 주석: |Δ| <= 1e-6 * max(1, |값|)
+    assert max(errors.values()) <= 1e-6, errors
+    for column in INDICATOR_BOOL_COLUMNS:
+        assert (tail[column] == full[column]).all(), column
+
+
+def test_short_warmup_exceeds_tolerance():
+    # 워밍업이 짧으면 EMA 시작점 차이가 남아 허용 오차를 넘음 (위 테스트가 차이를 잡아낼 수 있는지 확인)
+    frame = _prices(1)
+    errors, _, _ = _relative_errors(frame, frame['date'].iloc[-5], 130)
+    assert max(errors['rsi'], errors['macd_hist']) > 1e-6
+
+    # 이전 기본값 250봉도 고가 종목에서는 허용 오차를 넘음 (seed 7, 새 봉 40개)
+    frame = _prices(7, level=1000000)
+    errors, _, _ = _relative_errors(frame, frame['date'].iloc[-40], 250)
+    assert max(errors.values()) > 1e-6
@@ -0,0 +1,53 @@
+import datetime
+import pytest
+import data_importer
+
+
+@pytest.fixture
+def stocks(monkeypatch):
+    def build_jobs(start_date, end_date, exclude=None):
+        return [(stock_id, f"{stock_id:06d}.KS", f"종목{stock_id}", start_date, end_date) for stock_id in (1, 2, 3, 4)]
+
+    monkeypatch.setattr(data_importer, '_build_jobs', build_jobs)
+
+    def use(watermarks):
+        monkeypatch.setattr(data_importer, 'get_price_watermarks', lambda: watermarks)
+    return use
+
+
+def test_jobs_start_at_watermark_or_fallback(stocks):
+    watermarks = {
+        1: datetime.date(2024, 6, 5),    # 수요일 -> 수요일부터 다시 받음 (변동값 계산용)
+        2: datetime.date(2024, 5, 31),
+    }
+    stocks(watermarks)
+    jobs, returned = data_importer._build_incremental_jobs('2024-06-10', '2023-06-10')
+
+    assert returned == watermarks
+    assert jobs == [
+        (1, '000001.KS', '종목1', '2024-06-05', '2024-06-10'),
+        (2, '000002.KS', '종목2', '2024-05-31', '2024-06-10'),
+        (3, '000003.KS', '종목3', '2023-06-10', '2024-06-10'),
+        (4, '000004.KS', '종목4', '2023-06-10', '2024-06-10'),
+    ]
+
+
+def test_up_to_date_when_next_business_day_reaches_end(stocks):
+    # 종료일(미포함) 2024-06-10 은 월요일: 금요일까지 저장된 종목은 받을 영업일이 없음
+    stocks({1: datetime.date(2024, 6, 7), 2: datetime.date(2024, 6, 6), 3: datetime.date(2024, 6, 9)})
+    jobs, _ = data_importer._build_incremental_jobs('2024-06-10', '2023-06-10')
+
+    assert [job[0] for job in jobs] == [2, 4]
+    assert jobs[0][3] == '2024-06-06'
+
+
+def test_weekend_end_date_skips_friday_watermark(stocks):
+    # 토요일 종료일: 금요일까지 저장되었으면 최신, 목요일까지면 금요일을 받아야 함
+    stocks({1: datetime.date(2024, 6, 7), 2: datetime.date(2024, 6, 6), 3: datetime.date(2024, 6, 7),
+            4: datetime.date(2024, 6, 7)})
+    jobs, _ = data_importer._build_incremental_jobs('2024-06-08', '2023-06-08')
+    assert [job[0] for job in jobs] == [2]
+
+    # 화요일 종료일이면 월요일 봉이 필요
+    jobs, _ = data_importer._build_incremental_jobs('2024-06-11', '2023-06-11')
+    assert [job[0] for job in jobs] == [1, 2, 3, 4]
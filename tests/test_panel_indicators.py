@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_importer import compute_technical_indicators, INDICATOR_FLOAT_COLUMNS, INDICATOR_BOOL_COLUMNS
+from panel_indicators import PricePanel, compute_indicator_frame
+
+
+def _prices(seed, periods):
+    rng = np.random.default_rng(seed)
+    close = 10000 * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+    open_ = close * (1 + rng.normal(0, 0.01, periods))
+    return pd.DataFrame({
+        'date': pd.bdate_range('2023-01-02', periods=periods),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, periods)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, periods)),
+        'close': close,
+        'volume': rng.integers(1_000, 100_000, periods).astype(float),
+    })
+
+
+def _panel(frames):
+    """종목별 가격 DataFrame 으로 PricePanel 을 만듭니다 (종목마다 날짜가 달라도 됨)."""
+    dates = np.unique(np.concatenate([f['date'].to_numpy(dtype='datetime64[D]') for f in frames.values()]))
+    shape = (len(dates), len(frames))
+    values = {name: np.full(shape, np.nan) for name in ('open', 'high', 'low', 'close', 'volume')}
+    mask = np.zeros(shape, dtype=bool)
+    for column, frame in enumerate(frames.values()):
+        rows = np.searchsorted(dates, frame['date'].to_numpy(dtype='datetime64[D]'))
+        mask[rows, column] = True
+        for name in values:
+            values[name][rows, column] = frame[name].to_numpy()
+    return PricePanel(dates, np.array(list(frames), dtype=np.int64), values['open'], values['high'],
+                      values['low'], values['close'], values['volume'], mask)
+
+
+def _assert_matches_per_stock(frames):
+    result = compute_indicator_frame(_panel(frames))
+    for stock_id, frame in frames.items():
+        expected = compute_technical_indicators(frame.copy())
+        actual = result[result['stock_id'] == stock_id].reset_index(drop=True)
+        assert (actual['date'].to_numpy() == expected['date'].to_numpy()).all()
+        for column in INDICATOR_FLOAT_COLUMNS:
+            np.testing.assert_allclose(actual[column], expected[column], rtol=1e-6, atol=1e-6, err_msg=column)
+        for column in INDICATOR_BOOL_COLUMNS:
+            assert (actual[column].to_numpy() == expected[column].to_numpy(dtype=bool)).all(), column
+
+
+def test_panel_matches_per_stock_engine():
+    # 상장일이 다르고 (짧은 이력 포함) 중간 봉이 빠진 종목
+    gapped = _prices(3, 200).drop(index=range(50, 55)).reset_index(drop=True)
+    _assert_matches_per_stock({1: _prices(1, 200), 2: _prices(2, 200).iloc[80:].reset_index(drop=True),
+                               3: gapped, 4: _prices(4, 30)})
+
+
+@pytest.mark.parametrize('column', ['close', 'volume'])
+def test_nan_value_does_not_poison_later_rows(column):
+    # NULL 가격 / 거래량 봉이 있어도 그 봉이 포함된 창 이후에는 종목별 계산과 같은 값으로 회복
+    frame = _prices(5, 200)
+    frame.loc[[0, 40, 41, 120], column] = np.nan
+    _assert_matches_per_stock({1: frame, 2: _prices(6, 200)})
+
+    result = compute_indicator_frame(_panel({1: frame}))
+    assert result['ma5'].iloc[-1] != 0 and result['volume_ma20'].iloc[-1] != 0
@@ -0,0 +1,85 @@
+import datetime
+import pandas as pd
+import pytest
+import pipeline
+from pipeline import IngestPipeline
+
+
+def _frame(start, periods):
+    days = pd.bdate_range(start, periods=periods)
+    return pd.DataFrame({
+        'date': [day.date() for day in days],
+        'open_price': 100.0, 'high_price': 101.0, 'low_price': 99.0, 'close_price': 100.0,
+        'adjusted_close': 100.0, 'volume': 1000, 'change': 0.0, 'change_rate': 0.0,
+    })
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """copy_upsert / 지표 계산을 가로채 저장 묶음과 지표 요청을 기록."""
+    calls = {'writes': [], 'indicators': [], 'fail': False}
+
+    def copy_upsert(table_name, df, key_columns, batch_size=None):
+        if calls['fail']:
+            raise RuntimeError('connection reset')
+        calls['writes'].append(df)
+        return {'inserted': len(df), 'updated': 0, 'skipped': 0}
+
+    def indicators(stock_id, batch_size=None, since=None):
+        calls['indicators'].append((stock_id, since))
+        return {'inserted': 1, 'updated': 0, 'skipped': 0}
+
+    monkeypatch.setattr(pipeline, 'copy_upsert', copy_upsert)
+    monkeypatch.setattr(pipeline, 'calculate_and_save_technical_indicators', indicators)
+    # 시간 기준 묶음 저장은 끄고 행 수 / 종료로만 저장
+    monkeypatch.setattr(pipeline, 'WRITE_FLUSH_INTERVAL', 5.0)
+    return calls
+
+
+def _run(items, **kwargs):
+    results = {}
+    ingest = IngestPipeline(write_workers=1, indicator_workers=1,
+                            on_result=lambda stock_id, status: results.__setitem__(stock_id, status),
+                            **kwargs).start()
+    for item in items:
+        ingest.put(*item)
+    return ingest.close(), results
+
+
+def test_watermark_trims_stored_rows(writes):
+    watermarks = {1: datetime.date(2024, 1, 3), 2: datetime.date(2024, 1, 5)}
+    stats, results = _run([(1, 'A.KS', 'A', _frame('2024-01-02', 4)),
+                           (2, 'B.KS', 'B', _frame('2024-01-02', 4))],
+                          incremental=True, watermarks=watermarks)
+
+    # 1: 워터마크(1/3) 이하 행은 버리고 1/4, 1/5 만 저장. 2: 새 행이 없어 저장 없이 완료
+    written = pd.concat(writes['writes'])
+    assert set(written['stock_id']) == {1}
+    assert written['date'].tolist() == [datetime.date(2024, 1, 4), datetime.date(2024, 1, 5)]
+    assert writes['indicators'] == [(1, datetime.date(2024, 1, 4))]
+    assert stats['up_to_date'] == 1 and stats['rows_written'] == 2
+    assert results == {1: 'done', 2: 'done'}
+
+
+def test_writer_coalesces_frames_to_row_threshold(writes, monkeypatch):
+    monkeypatch.setattr(pipeline, 'WRITE_COALESCE_ROWS', 10)
+    items = [(stock_id, f"{stock_id}.KS", str(stock_id), _frame('2024-01-02', 4)) for stock_id in range(1, 6)]
+    stats, results = _run(items)
+
+    # 4행씩 5종목: 10행 이상 모인 3종목(12행)을 한 번에, 남은 2종목(8행)은 종료 시 저장
+    assert [len(df) for df in writes['writes']] == [12, 8]
+    assert stats['write_batches'] == 2 and stats['rows_written'] == 20
+    assert sorted(stock_id for stock_id, _ in writes['indicators']) == [1, 2, 3, 4, 5]
+    assert set(results.values()) == {'done'}
+
+
+def test_failed_write_marks_every_pending_stock_failed(writes):
+    writes['fail'] = True
+    items = [(stock_id, f"{stock_id}.KS", str(stock_id), _frame('2024-01-02', 3)) for stock_id in (1, 2, 3)]
+    stats, results = _run(items + [(4, '4.KS', '4', None)])
+
+    assert results == {1: 'failed', 2: 'failed', 3: 'failed', 4: 'failed'}
+    assert stats['write_failures'] == 3 and stats['fetch_failures'] == 1
+    assert stats['rows_written'] == 0
+    # 저장하지 못한 종목은 지표를 계산하지 않음
+    assert writes['indicators'] == []
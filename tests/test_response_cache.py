@@ -0,0 +1,207 @@
+import os
+import time
+import pandas as pd
+import pytest
+import response_cache
+from response_cache import ResponseCache, includes_today
+from data_sources import DataSource, get_data_source
+
+
+def _today():
+    return pd.Timestamp.now(tz=response_cache.EXCHANGE_TIMEZONE).normalize().tz_localize(None)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path), max_mb=1, ttl=3600, live_ttl=60)
+
+
+def _expires_at(cache, *key):
+    import pickle
+    with open(cache._path(*key), 'rb') as f:
+        return pickle.load(f)['expires_at']
+
+
+def test_includes_today_boundary():
+    today = _today()
+    # init / update 는 종료일(미포함)을 오늘로 요청
+    assert includes_today(today.strftime('%Y-%m-%d'))
+    assert includes_today((today + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+    assert not includes_today((today - pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+    assert not includes_today(None)
+
+
+def test_ttl_depends_on_range_end(cache):
+    today = _today().strftime('%Y-%m-%d')
+    past = (_today() - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+    cache.put('yfinance', 'prices', 'A', '2020-01-01', today, 'live')
+    cache.put('yfinance', 'prices', 'A', '2020-01-01', past, 'closed')
+
+    now = time.time()
+    assert _expires_at(cache, 'yfinance', 'prices', 'A', '2020-01-01', today) - now <= 60
+    assert _expires_at(cache, 'yfinance', 'prices', 'A', '2020-01-01', past) - now > 3000
+
+
+def test_hit_miss_and_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_mb=1, ttl=0, live_ttl=0)
+    assert cache.get('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01') is None
+    cache.put('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01', pd.DataFrame({'Close': [1.0]}))
+    # TTL 0 이면 바로 만료되어 파일도 삭제
+    assert cache.get('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01') is None
+    assert cache.expired == 1 and cache.misses == 2
+    assert not os.path.exists(cache._path('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01'))
+
+
+def test_round_trip_and_failures_not_stored(cache):
+    frame = pd.DataFrame({'Close': [1.0, 2.0]},
+                         index=pd.date_range('2020-01-01', periods=2, tz='Asia/Seoul', name='Date'))
+    cache.put('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01', frame)
+    cache.put('yfinance', 'prices', 'B', '2020-01-01', '2021-01-01', None)
+
+    pd.testing.assert_frame_equal(cache.get('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01'), frame)
+    assert cache.get('yfinance', 'prices', 'B', '2020-01-01', '2021-01-01') is None
+    # 소스가 다르면 다른 키
+    assert cache.get('pykrx', 'prices', 'A', '2020-01-01', '2021-01-01') is None
+    assert (cache.hits, cache.misses, cache.stored) == (1, 2, 1)
+
+
+def test_lru_eviction_keeps_recently_used(cache):
+    payload = b'x' * (200 * 1024)
+    for name in ('A', 'B', 'C', 'D'):
+        cache.put('yfinance', 'prices', name, '2020-01-01', '2021-01-01', payload)
+        time.sleep(0.01)
+
+    # A 를 사용하면 가장 최근 사용으로 바뀜
+    os.utime(cache._path('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01'),
+             (time.time() + 10, time.time() + 10))
+    cache.put('yfinance', 'prices', 'E', '2020-01-01', '2021-01-01', payload)
+    cache.put('yfinance', 'prices', 'F', '2020-01-01', '2021-01-01', payload)
+
+    assert cache.evicted > 0
+    assert cache._scan_size() <= cache.max_bytes
+    assert cache.get('yfinance', 'prices', 'A', '2020-01-01', '2021-01-01') == payload
+    assert cache.get('yfinance', 'prices', 'B', '2020-01-01', '2021-01-01') is None
+
+
+def test_async_ingest_reuses_cached_response(cache, monkeypatch):
+    import asyncio
+    import async_ingest
+
+    requested = []
+
+    async def fake_fetch(session, limiter, semaphore, stock_id, symbol, start_date, end_date):
+        requested.append(symbol)
+        return b''   # 404 (데이터 없음) 응답
+
+    class Pipeline:
+        def __init__(self):
+            self.items = []
+
+        def put(self, *item):
+            self.items.append(item)
+
+    monkeypatch.setattr(async_ingest, '_fetch_one', fake_fetch)
+    jobs = [(1, 'A.KS', 'A', '2020-01-01', '2021-01-01')]
+    for _ in range(2):
+        pipeline = Pipeline()
+        asyncio.run(async_ingest._ingest(jobs, pipeline, 4, cache))
+        assert pipeline.items[0][3].empty
+
+    assert requested == ['A.KS']
+
+
+class _StubSource(DataSource):
+    """네트워크 대신 요청 인자를 기록하는 DataSource."""
+
+    name = 'stub'
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.requested = []
+
+    def _fetch_price_history(self, symbols, start_date, end_date, **kwargs):
+        self.requested.append((tuple(symbols), start_date, end_date))
+        return {symbol: pd.DataFrame({'Close': [1.0]}) for symbol in symbols}
+
+
+class _KeyRecorder:
+    """get / put 에 쓰인 키를 기록하며 실제 캐시로 넘기는 래퍼."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.keys = []
+
+    def get(self, *key):
+        self.keys.append(('get',) + key)
+        return self.cache.get(*key)
+
+    def put(self, *args):
+        self.keys.append(('put',) + args[:-1])
+        return self.cache.put(*args)
+
+
+def test_data_source_reads_through_cache(cache):
+    source = _StubSource(cache)
+    first = source.get_price_history(['A', 'B'], '2020-01-01', '2021-01-01')
+    second = source.get_price_history(['A', 'B', 'C'], '2020-01-01', '2021-01-01')
+
+    # 두 번째 요청은 저장되지 않은 종목만 받음
+    assert source.requested == [(('A', 'B'), '2020-01-01', '2021-01-01'), (('C',), '2020-01-01', '2021-01-01')]
+    pd.testing.assert_frame_equal(second['A'], first['A'])
+    # 키: (소스 이름, 'prices', 종목, 시작일, 종료일)
+    pd.testing.assert_frame_equal(cache.get('stub', 'prices', 'A', '2020-01-01', '2021-01-01'), first['A'])
+
+    # 기간이 다르면 다시 받음
+    source.get_price_history(['A'], '2020-01-01', '2021-01-02')
+    assert source.requested[-1] == (('A',), '2020-01-01', '2021-01-02')
+
+
+def test_no_cache_bypasses_response_cache(tmp_path):
+    # --no-cache: get_data_source(use_cache=False) 는 캐시를 붙이지 않음
+    assert get_data_source('yfinance', use_cache=False).cache is None
+    assert get_data_source('yfinance', record_dir=str(tmp_path / 'rec'), use_cache=False).cache is None
+    assert get_data_source('yfinance').cache is response_cache.response_cache
+
+    source = _StubSource()
+    for _ in range(2):
+        source.get_price_history(['A'], '2020-01-01', '2021-01-01')
+    assert len(source.requested) == 2
+
+
+def test_data_source_uses_live_ttl_for_today(cache):
+    source = _StubSource(cache)
+    today = _today().strftime('%Y-%m-%d')
+    past = (_today() - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+    source.get_price_history(['A'], '2020-01-01', today)
+    source.get_price_history(['A'], '2020-01-01', past)
+
+    now = time.time()
+    assert _expires_at(cache, 'stub', 'prices', 'A', '2020-01-01', today) - now <= cache.live_ttl
+    assert _expires_at(cache, 'stub', 'prices', 'A', '2020-01-01', past) - now > cache.live_ttl
+
+
+def test_sync_and_async_paths_share_key_format(cache, monkeypatch):
+    import asyncio
+    import async_ingest
+
+    async def fake_fetch(session, limiter, semaphore, stock_id, symbol, start_date, end_date):
+        return b''
+
+    class Pipeline:
+        def put(self, *item):
+            pass
+
+    monkeypatch.setattr(async_ingest, '_fetch_one', fake_fetch)
+    recorder = _KeyRecorder(cache)
+    asyncio.run(async_ingest._ingest([(1, 'A.KS', 'A', '2020-01-01', '2021-01-01')], Pipeline(), 4, recorder))
+    async_keys = recorder.keys
+
+    recorder = _KeyRecorder(cache)
+    _StubSource(recorder).get_price_history(['A.KS'], '2020-01-01', '2021-01-01')
+    sync_keys = recorder.keys
+
+    # 소스 이름만 다르고 (종류, 종목, 시작일, 종료일) 는 같음
+    assert async_keys == [('get', 'yahoo_chart', 'prices', 'A.KS', '2020-01-01', '2021-01-01'),
+                          ('put', 'yahoo_chart', 'prices', 'A.KS', '2020-01-01', '2021-01-01')]
+    assert sync_keys == [('get', 'stub', 'prices', 'A.KS', '2020-01-01', '2021-01-01'),
+                         ('put', 'stub', 'prices', 'A.KS', '2020-01-01', '2021-01-01')]
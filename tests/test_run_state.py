@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import data_importer
+import run_state
+from models import Base
+
+TABLES = ('stocks', 'ingest_runs', 'ingest_run_stages', 'ingest_run_stocks')
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'findb.sqlite'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stocks (stock_id, symbol, name, market) VALUES "
+                          "(1, 'A.KS', 'A', 'KOSPI'), (2, 'B.KS', 'B', 'KOSPI'), (3, 'C.KQ', 'C', 'KOSDAQ')"))
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(run_state, 'Session', Session)
+    monkeypatch.setattr(data_importer, 'Session', Session)
+    return engine
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """네트워크 / 저장 단계를 가로채 호출을 기록. statuses 로 종목별 가격 수집 결과를 지정."""
+    calls = {'symbols': 0, 'jobs': [], 'indices': 0, 'stats': 0, 'statuses': {}}
+
+    def save_symbols(symbols, source):
+        calls['symbols'] += 1
+        return True
+
+    def fetch_prices(start_date, end_date, use_async=False, source=None, jobs=None, on_result=None):
+        calls['jobs'].append([job[0] for job in jobs])
+        for stock_id, *_ in jobs:
+            on_result(stock_id, calls['statuses'].get(stock_id, 'done'))
+
+    def market_indices(db, start_date, end_date, source):
+        calls['indices'] += 1
+
+    def market_stats(db):
+        calls['stats'] += 1
+
+    monkeypatch.setattr(data_importer, 'get_korean_stock_symbols', lambda source: [])
+    monkeypatch.setattr(data_importer, 'save_stock_info', save_symbols)
+    monkeypatch.setattr(data_importer, '_fetch_prices', fetch_prices)
+    monkeypatch.setattr(data_importer, 'fetch_and_save_market_indices', market_indices)
+    monkeypatch.setattr(data_importer, 'calculate_market_stats', market_stats)
+    return calls
+
+
+def _statuses(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT stock_id, status FROM ingest_run_stocks")).all())
+
+
+def test_resume_skips_done_stocks_and_retries_failed(db, steps):
+    steps['statuses'] = {2: 'failed'}
+    assert data_importer.build_initial_database(None) is False
+    # 실패한 종목이 있으면 prices 단계에서 멈춤
+    assert steps['jobs'] == [[1, 2, 3]]
+    assert (steps['indices'], steps['stats']) == (0, 0)
+    assert _statuses(db) == {1: 'done', 2: 'failed', 3: 'done'}
+
+    steps['statuses'] = {}
+    assert data_importer.build_initial_database(None, resume=True) is True
+    # 같은 실행을 이어서: 완료된 symbols 단계와 종목 1, 3 은 건너뛰고 실패한 종목 2 만 다시 수집
+    assert steps['symbols'] == 1
+    assert steps['jobs'] == [[1, 2, 3], [2]]
+    assert (steps['indices'], steps['stats']) == (1, 1)
+    assert _statuses(db) == {1: 'done', 2: 'done', 3: 'done'}
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT run_id, status FROM ingest_runs")).all() == [(1, 'completed')]
+
+
+def test_resume_after_completed_run_starts_new_run(db, steps):
+    assert data_importer.build_initial_database(None) is True
+    assert data_importer.build_initial_database(None, resume=True) is True
+    # 완료된 실행은 재개하지 않으므로 모든 단계와 종목을 다시 수행
+    assert steps['symbols'] == 2
+    assert steps['jobs'] == [[1, 2, 3], [1, 2, 3]]
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT run_id, status FROM ingest_runs ORDER BY run_id")).all() == \
+            [(1, 'completed'), (2, 'completed')]
+
+
+def test_failed_stage_is_retried_on_resume(db, steps, monkeypatch):
+    def broken_indices(db, start_date, end_date, source):
+        raise RuntimeError('index download failed')
+
+    monkeypatch.setattr(data_importer, 'fetch_and_save_market_indices', broken_indices)
+    assert data_importer.build_initial_database(None) is False
+
+    monkeypatch.setattr(data_importer, 'fetch_and_save_market_indices',
+                        lambda db, start_date, end_date, source: steps.__setitem__('indices', steps['indices'] + 1))
+    assert data_importer.build_initial_database(None, resume=True) is True
+    # 완료된 prices 단계는 건너뛰고 실패한 market_indices 부터 다시
+    assert steps['jobs'] == [[1, 2, 3]]
+    assert (steps['indices'], steps['stats']) == (1, 1)
@@ -0,0 +1,75 @@
+import datetime
+import pytest
+from screener import Field, signal, _Context
+
+DATE = datetime.date(2024, 6, 10)
+
+
+class _Result:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.values
+
+
+class _Conn:
+    """market_stats 거래일 조회만 응답하는 연결."""
+
+    def __init__(self, trading_days):
+        self.trading_days = trading_days
+        self.queries = 0
+
+    def execute(self, statement, params):
+        self.queries += 1
+        days = [d for d in self.trading_days if d <= params['date']]
+        return _Result(sorted(days, reverse=True)[:params['days']])
+
+
+def _compile(condition, trading_days=()):
+    ctx = _Context(_Conn(list(trading_days)), DATE)
+    return condition.compile(ctx), ctx
+
+
+def test_compare_and_combine():
+    sql, ctx = _compile((Field('rsi') < 30) & ((Field('volume_ratio') >= 200) | ~(Field('close_price') == 0)))
+
+    assert sql == "(t.rsi < :p1 AND (t.volume_ratio >= :p2 OR NOT (p.close_price = :p3)))"
+    assert ctx.params == {'date': DATE, 'p1': 30, 'p2': 200, 'p3': 0}
+    assert ctx.fields == ['rsi', 'volume_ratio', 'close_price']
+    assert ctx.needs_prices
+
+
+def test_between_uses_indicator_columns_first():
+    sql, ctx = _compile(Field('ma20').between(100, 200))
+    assert sql == "t.ma20 BETWEEN :p1 AND :p2"
+    assert ctx.params['p1'] == 100 and ctx.params['p2'] == 200
+    assert not ctx.needs_prices
+
+
+def test_signal_window_uses_trading_days():
+    trading_days = [datetime.date(2024, 6, day) for day in (3, 4, 5, 6, 7, 10)]
+    sql, ctx = _compile(signal('golden_cross') | signal('golden_cross', within=3) | signal('bb_lower_touch', within=3),
+                        trading_days)
+
+    assert sql.startswith("((t.golden_cross IS TRUE OR t.stock_id IN (SELECT stock_id FROM technical_indicators "
+                          "WHERE golden_cross AND date >= :p1 AND date <= :date))")
+    assert "WHERE bb_lower_touch AND date >= :p1 AND date <= :date" in sql
+    # 같은 기간은 한 번만 조회 / 바인드
+    assert ctx.params == {'date': DATE, 'p1': datetime.date(2024, 6, 6)}
+    assert ctx.conn.queries == 1
+
+
+def test_signal_window_falls_back_to_calendar_days():
+    _, ctx = _compile(signal('death_cross', within=5))
+    assert ctx.params['p1'] == DATE - datetime.timedelta(days=4)
+
+
+def test_unknown_names_are_rejected():
+    with pytest.raises(ValueError):
+        Field('stock_id')
+    with pytest.raises(ValueError):
+        signal('rsi')
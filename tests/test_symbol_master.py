@@ -0,0 +1,65 @@
+import os
+import pandas as pd
+import pytest
+import symbol_master
+from symbol_master import get_symbol_master
+
+LISTINGS = {
+    ('20240607', 'KOSPI'): pd.Series({'005930': '삼성전자', '000660': 'SK하이닉스'}),
+    ('20240607', 'KOSDAQ'): pd.Series({'247540': '에코프로비엠'}),
+}
+
+
+@pytest.fixture
+def krx(tmp_path, monkeypatch):
+    requests = []
+
+    def get_market_ticker_and_name(date, market):
+        requests.append((date, market))
+        # 주말 / 휴장일은 오류 없이 빈 목록
+        return LISTINGS.get((date, market), pd.Series(dtype=object))
+
+    monkeypatch.setattr(symbol_master, 'SYMBOL_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(symbol_master.krx, 'get_market_ticker_and_name', get_market_ticker_and_name)
+    monkeypatch.setattr(symbol_master.krx, 'get_nearest_business_day_in_a_week',
+                        lambda date=None, prev=True: '20240607')
+    return requests
+
+
+def test_weekend_date_resolves_to_previous_business_day(krx, tmp_path):
+    symbols = get_symbol_master('20240608')
+
+    assert krx == [('20240607', 'KOSPI'), ('20240607', 'KOSDAQ')]
+    assert [s['symbol'] for s in symbols] == ['005930.KS', '000660.KS', '247540.KQ']
+    assert os.listdir(tmp_path) == ['20240607.json']
+
+    # 같은 영업일로 바뀌는 날짜는 캐시 사용
+    assert get_symbol_master('20240609') == symbols
+    assert len(krx) == 2
+
+
+def test_empty_listing_raises_and_is_not_cached(krx, tmp_path, monkeypatch):
+    monkeypatch.setattr(symbol_master.krx, 'get_nearest_business_day_in_a_week',
+                        lambda date=None, prev=True: '20240608')
+    with pytest.raises(ValueError):
+        get_symbol_master('20240608')
+    assert os.listdir(tmp_path) == []
+
+
+def test_empty_listing_falls_back_to_sample_symbols(krx, monkeypatch):
+    import data_importer
+    from data_sources import YFinanceSource
+
+    monkeypatch.setattr(symbol_master.krx, 'get_nearest_business_day_in_a_week',
+                        lambda date=None, prev=True: '20240608')
+    symbols = data_importer.get_korean_stock_symbols(YFinanceSource())
+    assert [s['symbol'] for s in symbols] == ['005930.KS', '000660.KS', '035420.KS']
+
+
+def test_weekend_is_skipped_when_krx_calendar_is_unavailable(krx, monkeypatch):
+    def unavailable(date=None, prev=True):
+        raise ConnectionError('KRX 응답 없음')
+
+    monkeypatch.setattr(symbol_master.krx, 'get_nearest_business_day_in_a_week', unavailable)
+    assert symbol_master.resolve_trading_date('20240609') == '20240607'
+    assert symbol_master.resolve_trading_date('20240605') == '20240605'